@@ -2,22 +2,14 @@
 OGRe Twitter Interface
 
 :func:`twitter` : method for fetching data from Twitter
+
+:func:`iter_twitter` : generator of data from Twitter
 """
 
-import base64
-import hashlib
-import logging
-import sys
-import time
-from datetime import datetime
-from twython import Twython
+from ogre.paging import _geocode
+from ogre.streaming import _stream
 from ogre.validation import sanitize
-from ogre.exceptions import OGReError, OGReLimitError
-from snowflake2time.snowflake import snowflake2utc, utc2snowflake
-
-from future.standard_library import hooks
-with hooks():
-    from urllib.request import urlopen  # pylint: disable=import-error
+from snowflake2time.snowflake import utc2snowflake
 
 
 def sanitize_twitter(
@@ -38,6 +30,7 @@ def sanitize_twitter(
     :type keys: dict
     :param keys: Specify Twitter API keys.
                  Twitter **requires** a "consumer_key" and "access_token".
+                 A list of such dicts may be specified to pool several keys.
 
     :type media: tuple
     :param media: Specify content mediums to make lowercase and deduplicate.
@@ -64,24 +57,12 @@ def sanitize_twitter(
     :returns: Each passed parameter is returned (in order) in the proper format.
     """
 
-    clean_keys = {}
-    for key, value in keys.items():
-        key = key.lower()
-        if key not in (
-                "consumer_key",
-                "access_token"
-        ):
-            raise ValueError(
-                'Valid Twitter keys are "consumer_key" and "access_token".'
-            )
-        if not value:
+    if isinstance(keys, dict):
+        clean_keys = _sanitize_keys(keys)
+    else:
+        clean_keys = [_sanitize_keys(keychain) for keychain in keys]
+        if not clean_keys:
             raise ValueError("Twitter API keys are required.")
-        clean_keys[key] = value
-    if "consumer_key" not in clean_keys.keys() or \
-       "access_token" not in clean_keys.keys():
-        raise ValueError(
-            'Twitter API keys must include a "consumer_key" and "access_token".'
-        )
 
     clean_media, clean_keyword, clean_quantity, clean_location, clean_interval = \
         sanitize(
@@ -108,10 +89,7 @@ def sanitize_twitter(
 
     geocode = None
     if location is not None and clean_location[2] > 0:
-        geocode = \
-            str(clean_location[0]) + "," +\
-            str(clean_location[1]) + "," +\
-            str(clean_location[2])+clean_location[3]
+        geocode = _geocode(*clean_location)
 
     period_id = (None, None)
     if interval is not None:
@@ -133,6 +111,73 @@ def sanitize_twitter(
     )
 
 
+def _sanitize_keys(keys):
+    """Validate and prepare a set of Twitter API keys."""
+    clean_keys = {}
+    for key, value in keys.items():
+        key = key.lower()
+        if key not in (
+                "consumer_key",
+                "access_token"
+        ):
+            raise ValueError(
+                'Valid Twitter keys are "consumer_key" and "access_token".'
+            )
+        if not value:
+            raise ValueError("Twitter API keys are required.")
+        clean_keys[key] = value
+    if "consumer_key" not in clean_keys.keys() or \
+       "access_token" not in clean_keys.keys():
+        raise ValueError(
+            'Twitter API keys must include a "consumer_key" and "access_token".'
+        )
+    return clean_keys
+
+
+def iter_twitter(
+        keys,
+        media=("image", "text"),
+        keyword="",
+        quantity=15,
+        location=None,
+        interval=None,
+        **kwargs
+):  # pylint: disable=too-many-arguments
+
+    """
+    Fetch Tweets from the Twitter API one GeoJSON Feature at a time.
+
+    Every parameter corresponds directly in :meth:`twitter`,
+    and the same Features are generated in the same order,
+    but each page of results is generated as soon as it is packaged
+    (instead of once every page has been).
+    Parameters are checked immediately,
+    but nothing is requested until the first Feature is.
+    Closing the generator stops the request before its next query.
+
+    .. note:: When `shards` or `tile_radius` apply,
+              sub-requests are merged before any Feature is generated.
+
+    :raises: OGReError, OGReLimitError, TwythonError, ValueError
+
+    :rtype: generator
+    :returns: GeoJSON Feature(s)
+    """
+
+    return _stream(
+        sanitize_twitter(
+            keys=keys,
+            media=media,
+            keyword=keyword,
+            quantity=quantity,
+            location=location,
+            interval=interval
+        ),
+        media,
+        kwargs
+    )
+
+
 def twitter(
         keys,
         media=("image", "text"),
@@ -141,7 +186,7 @@ def twitter(
         location=None,
         interval=None,
         **kwargs
-):  # pylint: disable=too-many-arguments,too-many-locals,too-many-branches,too-many-statements
+):  # pylint: disable=too-many-arguments
 
     """
     Fetch Tweets from the Twitter API.
@@ -151,6 +196,9 @@ def twitter(
 
     :type keys: dict
     :param keys: Specify an API key and access token.
+                 A list of such dicts may be specified to pool several keys;
+                 each query is then made with whichever key has the most
+                 budget left, so the `query_limit` of each key adds up.
 
     :type media: tuple
     :param media: Specify content mediums to fetch.
@@ -208,6 +256,168 @@ def twitter(
     :type secure: bool
     :param secure: Specify whether to prefer HTTPS or not (defaults to True).
 
+    :type query_limit: int
+    :param query_limit: Specify the most queries to make (defaults to 450).
+
+    :type rate_limit: :class:`ogre.limits.RateLimit`
+    :param rate_limit: Specify a budget of queries to share with other
+                       requests (defaults to a budget of this request alone).
+                       The budget of each key is requested from Twitter
+                       only if it is not already known or has reset since;
+                       otherwise, it is kept up to date with the rate limit
+                       headers of each response.
+
+    :type deadline: float
+    :param deadline: Specify when (in seconds since the epoch) to stop
+                     making queries (defaults to None, i.e. never).
+                     Results found by then are still returned.
+
+    :type shards: int
+    :param shards: Specify how many sub-ranges of `interval` to page through
+                   in parallel (defaults to 1).
+                   Their results are merged by Tweet ID,
+                   so a long `interval` finishes in a fraction of the time.
+                   This is ignored if `interval` is not specified.
+
+    :type cache: :class:`ogre.cache.SearchCache`
+    :param cache: Specify where to look up the responses of searches
+                  before making them (defaults to None, i.e. no cache).
+                  Searches answered by the cache make no queries.
+
+    :type range_cache: :class:`ogre.cache.RangeCache`
+    :param range_cache: Specify where to look up the results of ranges of
+                        Tweet IDs that were already fully fetched
+                        (defaults to None, i.e. no cache).
+                        Requests with an `interval` are then served from
+                        the cached parts of it, and only the gaps are
+                        searched (newest first), so overlapping windows
+                        cost as much as the new Tweets in them.
+                        `shards` is ignored when the cache applies.
+
+    :type compact: bool
+    :param compact: Specify whether to return compact Features
+                    (:class:`ogre.feature.Feature`) instead of dicts
+                    (defaults to False).
+                    They compare equal to the dicts but take several times
+                    less memory; :meth:`ogre.feature.Feature.to_geojson`
+                    builds the dict of one, and its `tweet_id` keeps the
+                    ID of its Tweet.
+
+    :type state: dict
+    :param state: Specify a dict to resume from and record progress in
+                  (defaults to None).
+                  Only Tweets newer than its "since_id" are requested,
+                  and as the request runs it records the highest Tweet ID
+                  seen ("since_id") as well as the "remaining" queries and
+                  the "reset" time of the keys used.
+                  :meth:`ogre.api.OGRe.follow` uses this to poll for
+                  new Tweets.
+
+    :type checkpoint: str
+    :param checkpoint: Specify a file to save the progress of the request in
+                       after each page (defaults to None).
+                       If the request fails (or is stopped) partway through,
+                       making it again with the same `checkpoint`
+                       generates the Features already saved and resumes
+                       paging after them, so no query is repeated.
+                       The file is deleted once the request finishes.
+                       This is ignored when `shards`, `range_cache` or
+                       `tile_radius` apply.
+
+    :type seen: :class:`ogre.seen.SeenIds`
+    :param seen: Specify the Tweets produced before (defaults to None).
+                 Tweets it holds are skipped before they are packaged
+                 (so none of their media is retrieved),
+                 and the Tweet of each Feature produced is added to it.
+                 Features answered by the `range_cache` are skipped
+                 (and added) the same way,
+                 but Features restored from a `checkpoint` are not skipped,
+                 since they were added when this request first produced them.
+
+    :type tile_radius: float
+    :param tile_radius: Specify the radius (in the unit of `location`) of
+                        smaller circles to cover `location` with
+                        (defaults to None, i.e. no tiling).
+                        Smaller circles are searched in parallel,
+                        and their results are deduplicated by Tweet ID
+                        and limited to `location`.
+                        Since Twitter returns fewer geotagged results for
+                        larger radii, this improves the yield of searches
+                        over large areas.
+                        `shards` is ignored when tiling.
+
+    :type tile_depth: int
+    :param tile_depth: Specify how many times a tile with more results than
+                       fit in a page may be split into 7 tiles of half its
+                       radius (defaults to 1).
+
+    :type tile_workers: int
+    :param tile_workers: Specify how many tiles may be searched at once
+                         (defaults to 8).
+
+    :type prefetch: bool
+    :param prefetch: Specify whether to request the next page of results
+                     while the media of the current one is retrieved
+                     (defaults to False).
+                     A page is only requested if the pages before it
+                     are known to fall short of `quantity`,
+                     so no more queries are made than otherwise.
+
+    :type image_workers: int
+    :param image_workers: Specify how many images on a page may be downloaded
+                          at once (defaults to 8).
+
+    :type host_connections: int
+    :param host_connections: Specify how many images may be downloaded from
+                             the same host at once (defaults to 4).
+
+    :type image_max_bytes: int
+    :param image_max_bytes: Specify the most bytes an image may have
+                            (defaults to None, i.e. no limit).
+                            Images are downloaded in chunks and
+                            base64-encoded as they arrive,
+                            so larger images are abandoned before they are
+                            fully downloaded.
+
+    :type query_max_bytes: int
+    :param query_max_bytes: Specify the most bytes of images the request may
+                            download altogether (defaults to None).
+
+    :type image_timeout: float
+    :param image_timeout: Specify the most seconds an image may take to
+                          download (defaults to None, i.e. forever).
+                          It is also passed to `network` as `timeout`.
+
+    :type image_store: :class:`ogre.media.ImageStore`
+    :param image_store: Specify where to keep retrieved images
+                        (defaults to None, i.e. nowhere).
+                        Images already in the store are not downloaded
+                        again, and the same image posted at several URLs
+                        is only stored once.
+
+    :type image_mode: str
+    :param image_mode: Specify what the "image" of each Feature holds
+                       (defaults to "base64").
+                       "url" holds the URL of the image
+                       (and nothing is downloaded),
+                       "file" holds the path of a file in `image_directory`
+                       that the raw image is written to,
+                       "bytes" holds the raw image
+                       (as a :class:`ogre.media.RawImage`,
+                       whose `data` is the bytes),
+                       and "base64" holds the base64 encoding of the image.
+
+    :type image_directory: str
+    :param image_directory: Specify where to write images if `image_mode`
+                            is "file" (required then).
+                            Files are named by the SHA-256 hash of the image
+                            (and keep the extension of its URL),
+                            so each image is only written once.
+
+    .. note:: Images that exceed `image_max_bytes`, `query_max_bytes`
+              or `image_timeout` are left out of their Features
+              (or raise an OGReLimitError if `fail_hard`).
+
     :type test: bool
     :param test: Specify whether a the current request is a trial run.
                  This affects what gets logged and should be accompanied by
@@ -234,193 +444,12 @@ def twitter(
                  https://dev.twitter.com/docs/api/1.1/get/search/tweets.
     """
 
-    keychain, kinds, keywords, remaining, geocode, (since_id, max_id) = \
-        sanitize_twitter(
-            keys=keys,
-            media=media,
-            keyword=keyword,
-            quantity=quantity,
-            location=location,
-            interval=interval
-        )
-
-    modifiers = {
-        "api": Twython,
-        "fail_hard": False,
-        "network": urlopen,
-        "query_limit": 450,  # Twitter allows 450 queries every 15 minutes.
-        "secure": True,
-        "strict_media": False
-    }
-    for modifier in modifiers:
-        if kwargs.get(modifier) is not None:
-            modifiers[modifier] = kwargs[modifier]
-
-    qid = hashlib.md5(
-        (
-            str(time.time()) +
-            str(keywords) +
-            str(remaining) +
-            str(geocode) +
-            str(since_id) +
-            str(max_id) +
-            str(kwargs)
-        ).encode('utf-8')
-    ).hexdigest()
-
-    log = logging.getLogger(__name__)
-    log.info(qid+" Request: Twitter")
-    log.debug(
-        qid+" Status:" +
-        " media("+str(media)+")" +
-        " keyword("+str(keywords)+")" +
-        " quantity("+str(remaining)+")" +
-        " location("+str(geocode)+")" +
-        " interval("+str(since_id)+","+str(max_id)+")" +
-        " kwargs("+str(kwargs)+")"
-    )
-
-    if not kinds or remaining < 1 or modifiers["query_limit"] < 1:
-        log.info(qid+" Success: No results were requested.")
-        return []
-
-    api = modifiers["api"](
-        keychain["consumer_key"],
-        access_token=keychain["access_token"]
-    )
-
-    limits = api.get_application_rate_limit_status()
-    try:
-        limit = int(
-            limits["resources"]["search"]["/search/tweets"]["remaining"]
-        )
-        reset = int(
-            limits["resources"]["search"]["/search/tweets"]["reset"]
-        )
-        if limit < 1:
-            message = "Queries are being limited."
-            log.info(qid+" Failure: "+message)
-            if modifiers["fail_hard"]:
-                raise OGReLimitError(
-                    source="Twitter",
-                    message=message,
-                    reset=reset
-                )
-        else:
-            log.debug(qid+" Status: "+str(limit)+" queries remain.")
-        if limit < modifiers["query_limit"]:
-            modifiers["query_limit"] = limit
-    except KeyError:
-        log.warning(qid+" Unobtainable Rate Limit")
-        raise
-    total = remaining
-
-    collection = []
-    for query in range(modifiers["query_limit"]):  # pylint: disable=too-many-nested-blocks
-        count = min(remaining, 100)  # Twitter accepts a max count of 100.
-        try:
-            results = api.search(
-                q=keywords,
-                count=count,
-                geocode=geocode,
-                since_id=since_id,
-                max_id=max_id
-            )
-        except Exception:
-            log.info(
-                qid+" Failure: " +
-                str(query+1)+" queries produced " +
-                str(len(collection))+" results. " +
-                str(sys.exc_info()[1])
-            )
-            raise
-        if results.get("statuses") is None:
-            message = "The request is too complex."
-            log.info(
-                qid+" Failure: " +
-                str(query+1)+" queries produced " +
-                str(len(collection))+" results. " +
-                message
-            )
-            if modifiers["fail_hard"]:
-                raise OGReError(source="Twitter", message=message)
-            break
-        for tweet in results["statuses"]:
-            if tweet.get("coordinates") is None or tweet.get("id") is None:
-                # Tweets must be geotagged and timestamped.
-                continue
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [
-                        tweet["coordinates"]["coordinates"][0],
-                        tweet["coordinates"]["coordinates"][1]
-                    ]
-                },
-                "properties": {
-                    "source": "Twitter",
-                    "time": datetime.utcfromtimestamp(
-                        snowflake2utc(tweet["id"])
-                    ).isoformat()+"Z"
-                }
-            }
-            if "text" in kinds:
-                if tweet.get("text") is not None:
-                    feature["properties"]["text"] = tweet["text"]
-            if "image" in kinds:
-                if not modifiers["strict_media"]:
-                    if tweet.get("text") is not None:
-                        feature["properties"]["text"] = tweet["text"]
-                if tweet.get("entities", {}).get("media") is not None:
-                    for entity in tweet["entities"]["media"]:
-                        if entity.get("type") is not None:
-                            if entity["type"].lower() == "photo":
-                                media_url = "media_url_https"
-                                if not modifiers["secure"]:
-                                    media_url = "media_url"
-                                if entity.get(media_url) is not None:
-                                    feature["properties"]["image"] =\
-                                        base64.b64encode(
-                                            modifiers["network"](
-                                                entity[media_url]
-                                            ).read().encode('utf-8')
-                                        )
-            if len(feature["properties"]) > 2:
-                collection.append(feature)
-        remained = remaining
-        remaining = total-len(collection)
-        log.debug(
-            qid+" Status:" +
-            " 1 query produced "+str(remained-remaining)+" results."
-        )
-        if remaining <= 0:
-            log.info(
-                qid+" Success: " +
-                str(query+1)+" queries produced " +
-                str(len(collection))+" results."
-            )
-            break
-        if results.get("search_metadata", {}).get("next_results") is None:
-            outcome = "Success" if collection else "Failure"
-            log.info(
-                qid+" "+outcome+": " +
-                str(query+1)+" queries produced " +
-                str(len(collection))+" results. " +
-                "No retrievable results remain."
-            )
-            break
-        max_id = int(
-            results["search_metadata"]["next_results"]
-            .split("max_id=")[1]
-            .split("&")[0]
-        )
-        if query+1 >= modifiers["query_limit"]:
-            outcome = "Success" if collection else "Failure"
-            log.info(
-                qid+" "+outcome+": " +
-                str(query+1)+" queries produced " +
-                str(len(collection))+" results. " +
-                "No remaining results are retrievable."
-            )
-    return collection
+    return list(iter_twitter(
+        keys=keys,
+        media=media,
+        keyword=keyword,
+        quantity=quantity,
+        location=location,
+        interval=interval,
+        **kwargs
+    ))
@@ -3,8 +3,38 @@ OpenFusion GeoJSON Retriever
 
 `ogre.test` -- subpackage for testing OGRe
 
+:mod:`ogre.aio` -- module for getting data from public APIs with asyncio
+
 :mod:`ogre.api` -- module for getting data from public APIs
 
+:mod:`ogre.cache` -- module for caching search responses
+
+:mod:`ogre.checkpoint` -- module for resuming interrupted requests
+
+:mod:`ogre.columnar` -- module for holding results in NumPy arrays
+
+:mod:`ogre.connections` -- module for pooling connections
+
+:mod:`ogre.feature` -- module for compact Features
+
+:mod:`ogre.flight` -- module for coalescing identical requests
+
+:mod:`ogre.geography` -- module for geographic calculations
+
+:mod:`ogre.limits` -- module for tracking rate limits
+
+:mod:`ogre.media` -- module for retrieving media
+
+:mod:`ogre.output` -- module for writing results
+
+:mod:`ogre.paging` -- module for paging through Twitter searches
+
+:mod:`ogre.query` -- module for preparing queries
+
+:mod:`ogre.seen` -- module for remembering the results already produced
+
+:mod:`ogre.streaming` -- module for sharding, tiling and resuming Twitter requests
+
 :mod:`ogre.Twitter` -- module for getting data from Twitter
 
 :mod:`ogre.validation` -- module for parameter validation and sanitation
@@ -0,0 +1,513 @@
+"""
+OGRe asyncio Interface
+
+:func:`coalesce` -- coroutine for sharing identical concurrent coroutines
+
+:func:`twitter_async` -- coroutine for fetching data from Twitter
+
+:func:`fetch_async` -- coroutine for fetching data from public APIs
+
+.. note:: This module requires Python 3.5 or later.
+"""
+
+import asyncio
+import copy
+import functools
+import inspect
+import logging
+import socket
+import sys
+from contextlib import closing
+
+from twython import TwythonRateLimitError
+
+from ogre.exceptions import OGReError, OGReLimitError
+from ogre.media import CHUNK_SIZE, ImageEncoder, _recall, retrieve_image
+from ogre.paging import (
+    _Pager,
+    _Quota,
+    _attach,
+    _cached,
+    _clients,
+    _cursor,
+    _image_urls,
+    _limits,
+    _modifiers,
+    _qid,
+    _query_limit,
+    _searched,
+    _since_id,
+)
+from ogre.streaming import _checkpoint, _settle
+from ogre.Twitter import sanitize_twitter
+
+
+async def _call(executor, func, *args, **kwargs):
+
+    """
+    Call a function without blocking the event loop.
+
+    Coroutine functions are awaited directly.
+    Anything else is assumed to block and is run in `executor`
+    (the default executor of the loop if `executor` is None).
+    """
+
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(func, *args, **kwargs)
+    )
+
+
+async def coalesce(flights, key, func, *args, **kwargs):
+
+    """
+    Await a coroutine, sharing it with identical concurrent callers.
+
+    This is the asyncio counterpart of :meth:`ogre.flight.SingleFlight.call`:
+    while a coroutine is in flight on an event loop, identical calls await it
+    instead of starting it again, and every caller gets the same result
+    (a deep copy of it for those that awaited another).
+    Cancelling a caller only cancels the coroutine if no other caller
+    is still awaiting it.
+
+    :type flights: :class:`ogre.flight.SingleFlight`
+    :param flights: Specify where coroutines in flight are tracked.
+
+    :type key: tuple
+    :param key: Specify what identifies the call
+                (see :meth:`ogre.flight.SingleFlight.key`).
+
+    :type func: callable
+    :param func: Specify a coroutine function to call
+                 (with any other parameters).
+
+    :returns: whatever the coroutine returns
+    """
+
+    key = (asyncio.get_event_loop(), key)
+    with flights.lock:
+        flight = flights.tasks.get(key)
+        leader = flight is None
+        if leader:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            flight = flights.tasks[key] = [task, 0]
+
+            def land(_):
+                """Let the next identical call start anew."""
+                with flights.lock:
+                    if flights.tasks.get(key) is flight:
+                        del flights.tasks[key]
+
+            task.add_done_callback(land)
+        else:
+            flights.coalesced += 1
+        flight[1] += 1
+    try:
+        result = await asyncio.shield(flight[0])
+        return result if leader else copy.deepcopy(result)
+    except asyncio.CancelledError:
+        with flights.lock:
+            if flight[1] == 1:
+                flight[0].cancel()
+        raise
+    finally:
+        with flights.lock:
+            flight[1] -= 1
+
+
+async def _chunk(response):
+    """Read the next chunk of an image (from a blocking or asyncio response)."""
+    chunk = response.read(CHUNK_SIZE)
+    if inspect.isawaitable(chunk):
+        chunk = await chunk
+    if chunk and not isinstance(chunk, bytes):
+        chunk = chunk.encode("utf-8")
+    return chunk
+
+
+async def _download(modifiers, url):
+    """Download and encode an image with an asyncio `network`."""
+    network = modifiers["network"]
+    encoder = ImageEncoder(modifiers, "Twitter", url)
+    if modifiers["image_timeout"] is None:
+        response = await network(url)
+    else:
+        response = await network(url, timeout=modifiers["image_timeout"])
+    writer = None
+    if modifiers["image_store"] is not None:
+        writer = modifiers["image_store"].writer(url)
+    try:
+        with closing(response):
+            chunk = await _chunk(response)
+            while chunk:
+                encoder.feed(chunk)
+                if writer is not None:
+                    writer.write(chunk)
+                chunk = await _chunk(response)
+    except BaseException:
+        encoder.discard()
+        if writer is not None:
+            writer.discard()
+        raise
+    if writer is not None:
+        writer.commit()
+    return encoder.finish()
+
+
+async def _retrieve(modifiers, url):
+
+    """
+    Download and encode an image without blocking the event loop.
+
+    :rtype: bytes
+    :returns: the base64 encoding of the image (or None if it was abandoned)
+              or whatever its `image_mode` asks for instead
+    """
+
+    if modifiers["image_mode"] == "url":
+        return url
+    try:
+        if not asyncio.iscoroutinefunction(modifiers["network"]):
+            return await _call(
+                modifiers["executor"],
+                retrieve_image,
+                url,
+                modifiers,
+                "Twitter"
+            )
+        recalled = await _call(
+            modifiers["executor"],
+            _recall,
+            url,
+            modifiers,
+            "Twitter"
+        )
+        if recalled is not None:
+            return recalled
+        return await _download(modifiers, url)
+    except (OGReLimitError, socket.timeout) as error:
+        if isinstance(error, socket.timeout):
+            error = OGReLimitError(
+                source="Twitter",
+                message="An image took over " +
+                str(modifiers["image_timeout"])+" seconds."
+            )
+        if modifiers["fail_hard"]:
+            raise error
+        logging.getLogger(__name__).warning(str(error)+" "+url)
+        return None
+
+
+async def _images(packages, modifiers):
+    """Retrieve the images of packaged Features concurrently."""
+    return await asyncio.gather(*[
+        _retrieve(modifiers, url) for url in _image_urls(packages)
+    ])
+
+
+async def _pages(pager, checkpoint=None):
+
+    """
+    Page through the results of a Twitter search without blocking the event loop.
+
+    This is the asyncio counterpart of :func:`ogre.paging._pages`
+    (and shares its :class:`ogre.paging._Pager`).
+
+    :type pager: :class:`ogre.paging._Pager`
+    :param pager: Specify the search to page through.
+
+    :type checkpoint: :class:`ogre.checkpoint.Checkpoint`
+    :param checkpoint: Specify where to save each page (if anywhere).
+
+    :raises: OGReError, TwythonError
+
+    :rtype: list
+    :returns: GeoJSON Feature(s)
+    """
+
+    modifiers = pager.modifiers
+    collection = []
+    try:
+        while pager.needed > 0:
+            params = pager.params()
+            results = _cached(modifiers, params)
+            if results is None:
+                client = pager.quota.take()
+                if client is None:
+                    pager.report(
+                        "Success" if pager.produced else "Failure",
+                        "No remaining results are retrievable."
+                    )
+                    break
+                pager.count(client)
+                try:
+                    results = _searched(client, modifiers, params, await _call(
+                        modifiers["executor"],
+                        client[0].search,
+                        **params
+                    ))
+                except TwythonRateLimitError as error:
+                    if not pager.limited(client, error):
+                        raise
+                    continue
+                except asyncio.CancelledError:
+                    pager.report("Cancelled")
+                    raise
+                except Exception:
+                    pager.report("Failure", str(sys.exc_info()[1]))
+                    raise
+            packages = pager.receive(results)
+            if packages is None:
+                break
+            features = _attach(packages, modifiers, await _images(packages, modifiers))
+            ids = pager.produce(packages, features, results)
+            if checkpoint is not None:
+                checkpoint.save(features, _cursor(results), ids)
+            collection.extend(features)
+            if not pager.advance(results):
+                break
+    finally:
+        pager.finish()
+    return collection
+
+
+def _async_modifiers(kwargs):
+
+    """
+    Merge runtime modifiers passed to an asyncio Twitter request with defaults.
+
+    :raises: ValueError
+    """
+
+    unsupported = [
+        modifier for modifier in ("prefetch", "range_cache", "tile_radius")
+        if kwargs.get(modifier)
+    ]
+    if (kwargs.get("shards") or 1) > 1:
+        unsupported.append("shards")
+    if unsupported:
+        raise ValueError(
+            "asyncio requests do not support " +
+            ", ".join(sorted(unsupported))+"."
+        )
+    modifiers = _modifiers(kwargs)
+    modifiers["executor"] = kwargs.get("executor")
+    return modifiers
+
+
+async def twitter_async(
+        keys,
+        media=("image", "text"),
+        keyword="",
+        quantity=15,
+        location=None,
+        interval=None,
+        **kwargs
+):  # pylint: disable=too-many-arguments,too-many-locals
+
+    """
+    Fetch Tweets from the Twitter API without blocking the event loop.
+
+    This is the asyncio counterpart of :meth:`ogre.Twitter.twitter`,
+    and it pages through results the same way
+    (so it returns the same GeoJSON Features).
+    Images on each page are retrieved concurrently,
+    and cancelling the task stops the request at its next network access.
+    Blocking API and network accesses run in `executor`,
+    so the event loop is never tied up while a request waits.
+
+    :type api: callable
+    :param api: Specify API access point (for dependency injection).
+                If the methods of the object it returns are coroutine
+                functions, they are awaited directly; otherwise, they are
+                run in `executor`
+                (defaults to :class:`twython.Twython`).
+
+    :type network: callable
+    :param network: Specify a network access point (for dependency injection).
+                    Coroutine functions are awaited directly
+                    (as is the `read` method of their responses);
+                    anything else is run in `executor`
+                    (defaults to :func:`urllib.request.urlopen`).
+
+    :type executor: concurrent.futures.Executor
+    :param executor: Specify where blocking API and network accesses run
+                     (defaults to the default executor of the event loop).
+
+    :raises: OGReError, OGReLimitError, TwythonError, ValueError
+
+    :rtype: list
+    :returns: GeoJSON Feature(s)
+
+    .. seealso:: :meth:`ogre.Twitter.twitter` describes the other parameters.
+
+    .. note:: `shards`, `tile_radius`, `range_cache` and `prefetch`
+              are not supported (a ValueError is raised if they are given).
+    """
+
+    keychain, kinds, keywords, remaining, geocode, (since_id, max_id) = \
+        sanitize_twitter(
+            keys=keys,
+            media=media,
+            keyword=keyword,
+            quantity=quantity,
+            location=location,
+            interval=interval
+        )
+
+    modifiers = _async_modifiers(kwargs)
+    since_id = _since_id(since_id, modifiers)
+
+    qid = _qid(keywords, remaining, geocode, since_id, max_id, kwargs)
+
+    log = logging.getLogger(__name__)
+    log.info(qid+" Request: Twitter (asyncio)")
+
+    if not kinds or remaining < 1 or modifiers["query_limit"] < 1:
+        log.info(qid+" Success: No results were requested.")
+        return []
+
+    clients = _clients(keychain, modifiers)
+    for api, budget in clients:
+        if budget.remaining is None or budget.stale:
+            try:
+                budget.update(*_limits(
+                    await _call(
+                        modifiers["executor"],
+                        api.get_application_rate_limit_status
+                    )
+                ))
+            except KeyError:
+                log.warning(qid+" Unobtainable Rate Limit")
+                raise
+    modifiers["query_limit"] = _query_limit(
+        [budget for _, budget in clients],
+        modifiers,
+        log,
+        qid
+    )
+
+    checkpoint = _checkpoint(
+        modifiers, kinds, keywords, remaining, geocode, (since_id, max_id)
+    )
+    collection = []
+    if checkpoint is not None and checkpoint.pages:
+        log.info(
+            qid+" Status: Resuming after " +
+            str(checkpoint.pages)+" saved pages of " +
+            str(len(checkpoint.features))+" results."
+        )
+        collection.extend(checkpoint.features)
+        max_id = checkpoint.cursor
+    try:
+        if checkpoint is None or (len(collection) < remaining and not checkpoint.finished):
+            collection.extend(await _pages(
+                _Pager(
+                    _Quota(modifiers["query_limit"], clients, modifiers["deadline"]),
+                    (kinds, keywords, remaining-len(collection), geocode, (since_id, max_id)),
+                    modifiers,
+                    log,
+                    qid
+                ),
+                checkpoint
+            ))
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    if checkpoint is not None:
+        _settle(checkpoint, len(collection) >= remaining, log, qid)
+    return collection
+
+
+async def _request(source, call, timeout, fail_hard):
+    """Query a source without exceeding the timeout."""
+    try:
+        return await asyncio.wait_for(call(), timeout)
+    except asyncio.TimeoutError:
+        message = "The request timed out."
+        logging.getLogger(__name__).warning(source+": "+message)
+        if fail_hard:
+            raise OGReError(source=source, message=message)
+        return []
+
+
+async def _collect(requests):
+    """Merge the Features of concurrent requests as each one finishes."""
+    collection = []
+    try:
+        for features in asyncio.as_completed(requests):
+            collection.extend(await features)
+    finally:
+        for pending in requests:
+            pending.cancel()
+    return collection
+
+
+async def fetch_async(
+        retriever,
+        sources,
+        media=("image", "sound", "text", "video"),
+        keyword="",
+        quantity=15,
+        location=None,
+        interval=None,
+        **kwargs
+):  # pylint: disable=too-many-arguments
+
+    """
+    Get geotagged data from public APIs without blocking the event loop.
+
+    Sources are queried concurrently,
+    and requests identical to ones in flight await them
+    (unless the retriever does not coalesce requests; see :func:`coalesce`).
+
+    .. seealso:: :meth:`ogre.api.OGRe.fetch` describes each parameter.
+
+    :type retriever: :class:`ogre.api.OGRe`
+    :param retriever: Specify the retriever holding the API keys to use.
+
+    :raises: OGReError, ValueError
+
+    :rtype: dict
+    :returns: GeoJSON FeatureCollection
+    """
+
+    source_map = {"twitter": twitter_async}
+
+    feature_collection = {
+        "type": "FeatureCollection",
+        "features": []
+    }
+    if media and quantity > 0:
+        sources = [source.lower() for source in sources]
+        for source in sources:
+            if source not in source_map.keys():
+                raise ValueError('Source may be "Twitter".')
+        timeout = kwargs.pop("source_timeout", None)
+        query = {
+            "media": media,
+            "keyword": keyword,
+            "quantity": quantity,
+            "location": location,
+            "interval": interval
+        }
+        requests = [
+            asyncio.ensure_future(_request(
+                source,
+                retriever._request(  # pylint: disable=protected-access
+                    source_map[source],
+                    source,
+                    query,
+                    kwargs,
+                    functools.partial(coalesce, retriever.flights)
+                ),
+                timeout,
+                kwargs.get("fail_hard")
+            ))
+            for source in sources
+        ]
+        feature_collection["features"].extend(await _collect(requests))
+    return feature_collection
@@ -5,10 +5,59 @@ OGRe Query Handler
 
 :meth:`OGRe.fetch` -- method for making a retriever fetch data
 
+:meth:`OGRe.fetch_async` -- coroutine for making a retriever fetch data
+
+:meth:`OGRe.fetch_many` -- method for making a retriever fetch batches of data
+
+:meth:`OGRe.iter_features` -- generator of the data a retriever fetches
+
+:meth:`OGRe.follow` -- generator of new data as a retriever polls for it
+
+:meth:`OGRe.prepare` -- method for compiling a query to make repeatedly
+
+:meth:`OGRe.close` -- method for closing the connections of a retriever
+
 :meth:`OGRe.get` -- alias of :meth:`OGRe.fetch`
 """
 
-from ogre.Twitter import twitter
+import functools
+import logging
+import sys
+import time
+from concurrent import futures
+
+from ogre.columnar import ColumnarCollection, require_numpy
+from ogre.connections import ConnectionPool
+from ogre.exceptions import OGReError
+from ogre.flight import SingleFlight
+from ogre.limits import RateLimit
+from ogre.query import TwitterQuery
+from ogre.Twitter import iter_twitter, twitter
+
+
+def _pace(state):
+    """Find how long to wait so the remaining queries last until the reset."""
+    if state.get("remaining") is None or state.get("reset") is None:
+        return 0
+    return max(state["reset"]-time.time(), 0)/(max(state["remaining"], 0)+1)
+
+
+def _collect(requests, timeout, fail_hard):
+    """Merge the Features of concurrent requests as each one finishes."""
+    features = []
+    try:
+        for request in futures.as_completed(requests, timeout=timeout):
+            features.extend(request.result())
+    except futures.TimeoutError:
+        for request, source in requests.items():
+            if request.done():
+                continue
+            request.cancel()
+            message = "The request timed out."
+            logging.getLogger(__name__).warning(source+": "+message)
+            if fail_hard:
+                raise OGReError(source=source, message=message)
+    return features
 
 
 class OGRe(object):
@@ -26,15 +75,65 @@ class OGRe(object):
 
     :meth:`fetch` -- method for retrieving data from a public source
 
+    :meth:`fetch_async` -- coroutine for retrieving data from a public source
+
+    :meth:`fetch_many` -- method for retrieving batches of data that share a
+    rate limit
+
+    :meth:`iter_features` -- generator of data from a public source
+
+    :meth:`follow` -- generator of new data from a public source
+
+    :meth:`prepare` -- method for compiling a query to make repeatedly
+
+    :meth:`close` -- method for closing the connections of the retriever
+
     :meth:`get` -- backwards-compatible alias of :meth:`fetch`
+
+    .. note:: A retriever may be used as a context manager
+              that closes its connections on exit.
     """
 
-    def __init__(self, keys):
+    def __init__(self, keys, rate_limit=None, coalesce=True, pool=None):
         """
         Instantiate an OGRe.
 
         :type keys: dict
         :param keys: Specify dictionaries containing API keys for sources.
+                     A list of dictionaries may be specified for a source
+                     to pool several API keys (e.g. to multiply the number of
+                     queries Twitter allows).
+
+        :type rate_limit: :class:`ogre.limits.RateLimit`
+        :param rate_limit: Specify the budget of queries to start from
+                           (e.g. one loaded with
+                           :meth:`ogre.limits.RateLimit.load`).
+                           The budget is kept up to date in the
+                           :attr:`rate_limit` attribute and shared by every
+                           request the retriever makes (unless a request
+                           specifies its own), so sources are only asked for
+                           their rate limits when the budget is unknown or
+                           has reset.
+
+        :type coalesce: bool
+        :param coalesce: Specify whether identical concurrent requests
+                         (i.e. those with the same sanitized parameters and
+                         runtime modifiers) should be made only once
+                         (defaults to True).
+                         Every caller then gets the same result
+                         (callers that waited get a deep copy of it),
+                         and the requests in flight are tracked in the
+                         :attr:`flights` attribute
+                         (a :class:`ogre.flight.SingleFlight`).
+
+        :type pool: :class:`ogre.connections.ConnectionPool`
+        :param pool: Specify the connections to make requests through
+                     (defaults to a pool with default sizes and no timeout).
+                     The pool is kept in the :attr:`pool` attribute,
+                     and its API clients and image downloads are used by
+                     every request the retriever makes (unless a request
+                     specifies its own `api` or `network`), so connections
+                     are kept alive between requests until :meth:`close`.
 
         Keys that a retriever object is instantiated with may be accessed later
         through the :attr:`keychain` attribute.
@@ -53,6 +152,60 @@ class OGRe(object):
                 raise ValueError('Keys may include "Twitter" only.')
             self.keyring[key.lower()] = key
         self.keychain = keys
+        self.rate_limit = RateLimit() if rate_limit is None else rate_limit
+        self.flights = SingleFlight() if coalesce else None
+        self.pool = ConnectionPool() if pool is None else pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _defaults(self, kwargs):
+        """Default the runtime modifiers of a request to those of the retriever."""
+        kwargs.setdefault("rate_limit", self.rate_limit)
+        kwargs.setdefault("api", self.pool.api)
+        kwargs.setdefault("network", self.pool.network)
+
+    def _flight_key(self, source, query, kwargs):
+        """Identify a request to a source by its sanitized parameters."""
+        query_map = {"twitter": TwitterQuery}
+        return self.flights.key(
+            source,
+            query_map[source](
+                keys=self.keychain[self.keyring[source]],
+                **query
+            ).identity,
+            # A deadline bounds how long a request pages, not what it finds.
+            **dict(
+                (name, value) for name, value in kwargs.items()
+                if name != "deadline"
+            )
+        )
+
+    def _request(self, func, source, query, kwargs, coalesce=None):
+        """Prepare a request to a source (coalesced unless the retriever is not)."""
+        request = functools.partial(
+            func,
+            keys=self.keychain[self.keyring[source]],
+            **dict(query, **kwargs)
+        )
+        if self.flights is not None:
+            request = functools.partial(
+                self.flights.call if coalesce is None else coalesce,
+                self._flight_key(source, query, kwargs),
+                request
+            )
+        return request
+
+    def _columnar(self, sources, query, kwargs):
+        """Fetch compact Features (which keep their Tweet IDs) into columns."""
+        require_numpy()
+        kwargs["compact"] = True
+        return ColumnarCollection.from_features(
+            self.fetch(sources, **dict(query, **kwargs))["features"]
+        )
 
     def fetch(
             self,
@@ -96,17 +249,50 @@ class OGRe(object):
         :type interval: tuple
         :param interval: Specify a period of time (earliest, latest) to search.
 
-        :raises: ValueError
+        :type source_timeout: float
+        :param source_timeout: Specify how many seconds to wait for each
+                               source (defaults to None, i.e. forever).
+                               Sources that take longer contribute nothing
+                               (or raise an OGReError if `fail_hard`),
+                               and they stop querying at the timeout
+                               (see the `deadline` of
+                               :meth:`ogre.Twitter.twitter`)
+                               so they do not keep spending the shared
+                               rate limit.
+
+        :type columnar: bool
+        :param columnar: Specify whether to return a
+                         :class:`ogre.columnar.ColumnarCollection`
+                         (backed by NumPy arrays) instead of a dict
+                         (defaults to False).
+
+        :raises: ImportError, OGReError, ValueError
 
         :rtype: dict
         :returns: GeoJSON FeatureCollection
 
+        .. note:: Sources are queried concurrently,
+                  and their results are merged as each one finishes.
+                  Unless the retriever was instantiated with
+                  `coalesce=False`, a request identical to one in flight
+                  waits for it and shares its Features.
+
         .. note:: Additional runtime modifiers may be specified to change
                   the way results are retrieved.
                   Runtime modifiers are relayed to each source module,
                   and that is where they are documented.
         """
 
+        query = {
+            "media": media,
+            "keyword": keyword,
+            "quantity": quantity,
+            "location": location,
+            "interval": interval
+        }
+        if kwargs.pop("columnar", False):
+            return self._columnar(sources, query, kwargs)
+
         source_map = {"twitter": twitter}
 
         feature_collection = {
@@ -114,21 +300,312 @@ class OGRe(object):
             "features": []
         }
         if media and quantity > 0:
+            sources = [source.lower() for source in sources]
             for source in sources:
-                source = source.lower()
                 if source not in source_map.keys():
                     raise ValueError('Source may be "Twitter".')
-                for features in source_map[source](
+            if not sources:
+                return feature_collection
+            timeout = kwargs.pop("source_timeout", None)
+            if timeout is not None:
+                kwargs["deadline"] = time.time()+timeout
+            self._defaults(kwargs)
+            executor = futures.ThreadPoolExecutor(max_workers=len(sources))
+            try:
+                requests = {
+                    executor.submit(
+                        self._request(source_map[source], source, query, kwargs)
+                    ): source
+                    for source in sources
+                }
+                feature_collection["features"].extend(
+                    _collect(requests, timeout, kwargs.get("fail_hard"))
+                )
+            finally:
+                executor.shutdown(wait=False)
+        return feature_collection
+
+    def fetch_async(
+            self,
+            sources,
+            media=("image", "sound", "text", "video"),
+            keyword="",
+            quantity=15,
+            location=None,
+            interval=None,
+            **kwargs
+    ):  # pylint: disable=too-many-arguments
+
+        """
+        Get geotagged data from public APIs without blocking the event loop.
+
+        Every parameter corresponds directly in :meth:`fetch`,
+        and the awaited result is the same GeoJSON FeatureCollection.
+        Sources are queried concurrently,
+        and cancelling the awaiting task cancels every pending request.
+
+        .. seealso:: :meth:`ogre.aio.twitter_async` describes the
+                     runtime modifiers specific to asyncio
+                     (and those it does not support).
+
+        .. note:: Requests are made through the :attr:`pool` of the retriever
+                  (unless an `api` or `network` is specified)
+                  in the `executor` given (or the default one of the event loop).
+
+        :raises: NotImplementedError, ValueError
+
+        :rtype: coroutine
+        :returns: an awaitable GeoJSON FeatureCollection
+
+        .. note:: :meth:`fetch_async` requires Python 3.5 or later.
+        """
+
+        if sys.version_info < (3, 5):
+            raise NotImplementedError("asyncio requires Python 3.5 or later.")
+        from ogre.aio import fetch_async
+        self._defaults(kwargs)
+        return fetch_async(
+            self,
+            sources=sources,
+            media=media,
+            keyword=keyword,
+            quantity=quantity,
+            location=location,
+            interval=interval,
+            **kwargs
+        )
+
+    def fetch_many(self, queries, concurrency=4, **kwargs):
+
+        """
+        Get geotagged data for many queries that share a rate limit.
+
+        Queries run concurrently and draw from one budget,
+        which is only requested from each source once.
+
+        :type queries: list
+        :param queries: Specify the parameters of :meth:`fetch` for each query
+                        (as dicts).
+
+        :type concurrency: int
+        :param concurrency: Specify how many queries may run at once.
+
+        :raises: OGReError, ValueError
+
+        :rtype: list
+        :returns: a GeoJSON FeatureCollection and the number of queries made
+                  to get it (for each query, in order)
+
+        .. note:: Any additional runtime modifiers apply to every query
+                  (unless a query specifies its own).
+                  A :class:`ogre.limits.RateLimit` may be passed as
+                  `rate_limit` to share a budget across batches.
+        """
+
+        rate_limit = kwargs.pop("rate_limit", None)
+        if rate_limit is None:
+            rate_limit = self.rate_limit
+
+        def run(query):
+            """Fetch data for a query and count the queries it made."""
+            meter = rate_limit.share()
+            parameters = dict(kwargs)
+            parameters.update(query)
+            parameters["rate_limit"] = meter
+            return self.fetch(**parameters), meter.used
+
+        with futures.ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            return list(executor.map(run, queries))
+
+    def iter_features(
+            self,
+            sources,
+            media=("image", "sound", "text", "video"),
+            keyword="",
+            quantity=15,
+            location=None,
+            interval=None,
+            **kwargs
+    ):  # pylint: disable=too-many-arguments
+
+        """
+        Generate geotagged data from public APIs as it arrives.
+
+        Every parameter corresponds directly in :meth:`fetch`,
+        but GeoJSON Features are generated as soon as each page of results
+        is packaged, so the first one arrives early and memory use does not
+        grow with `quantity`.
+        Sources are queried one after another (in the order given),
+        and closing the generator stops any further queries.
+
+        :raises: OGReError, ValueError
+
+        :rtype: generator
+        :returns: GeoJSON Feature(s)
+        """
+
+        source_map = {"twitter": iter_twitter}
+
+        sources = [source.lower() for source in sources]
+        for source in sources:
+            if source not in source_map.keys():
+                raise ValueError('Source may be "Twitter".')
+        kwargs.pop("source_timeout", None)
+        self._defaults(kwargs)
+
+        def features():
+            """Generate the Features of each source in turn."""
+            if not media or quantity < 1:
+                return
+            for source in sources:
+                stream = source_map[source](
+                    keys=self.keychain[self.keyring[source]],
+                    media=media,
+                    keyword=keyword,
+                    quantity=quantity,
+                    location=location,
+                    interval=interval,
+                    **kwargs
+                )
+                try:
+                    for feature in stream:
+                        yield feature
+                finally:
+                    stream.close()
+
+        return features()
+
+    def follow(
+            self,
+            sources,
+            media=("image", "sound", "text", "video"),
+            keyword="",
+            quantity=15,
+            location=None,
+            poll_interval=60,
+            polls=None,
+            **kwargs
+    ):  # pylint: disable=too-many-arguments
+
+        """
+        Generate geotagged data from public APIs as it is posted.
+
+        Each source is polled for up to `quantity` results newer than
+        any it has produced before, so no Feature is generated twice.
+        Polls are spread out so that the queries remaining for each source
+        last until its rate limit resets.
+
+        .. seealso:: :meth:`fetch` describes the other parameters.
+
+        :type poll_interval: float
+        :param poll_interval: Specify the fewest seconds between polls.
+
+        :type polls: int
+        :param polls: Specify how many times to poll
+                      (defaults to None, i.e. until the generator is closed).
+
+        :raises: OGReError, ValueError
+
+        :rtype: generator
+        :returns: GeoJSON Feature(s)
+
+        .. note:: If more than `quantity` results are posted between polls,
+                  only the newest `quantity` are generated.
+        """
+
+        source_map = {"twitter": iter_twitter}
+
+        sources = [source.lower() for source in sources]
+        for source in sources:
+            if source not in source_map.keys():
+                raise ValueError('Source may be "Twitter".')
+        kwargs.pop("source_timeout", None)
+        self._defaults(kwargs)
+        states = dict((source, {}) for source in sources)
+
+        def features():
+            """Poll each source in turn for new Features."""
+            if not media or quantity < 1:
+                return
+            poll = 0
+            while polls is None or poll < polls:
+                if poll:
+                    time.sleep(max(
+                        [poll_interval] +
+                        [_pace(state) for state in states.values()]
+                    ))
+                poll += 1
+                for source in sources:
+                    stream = source_map[source](
                         keys=self.keychain[self.keyring[source]],
                         media=media,
                         keyword=keyword,
                         quantity=quantity,
                         location=location,
-                        interval=interval,
+                        state=states[source],
                         **kwargs
-                ):
-                    feature_collection["features"].append(features)
-        return feature_collection
+                    )
+                    try:
+                        for feature in stream:
+                            yield feature
+                    finally:
+                        stream.close()
+
+        return features()
+
+    def prepare(
+            self,
+            source,
+            media=("image", "sound", "text", "video"),
+            keyword="",
+            quantity=15,
+            location=None,
+            interval=None
+    ):  # pylint: disable=too-many-arguments
+
+        """
+        Compile a query so it may be made repeatedly.
+
+        Parameters are validated once (here),
+        and the query may then be called with runtime modifiers
+        and `interval`, `since_id` or `max_id` overrides.
+
+        .. seealso:: :meth:`fetch` describes the other parameters.
+
+        :type source: str
+        :param source: Specify a public API to get content from.
+                       "Twitter" is currently the only supported source.
+
+        :raises: ValueError
+
+        :rtype: :class:`ogre.query.TwitterQuery`
+        :returns: a prepared query
+
+        .. note:: Like :meth:`fetch`, a prepared query uses the
+                  :attr:`rate_limit` and :attr:`pool` of the retriever
+                  unless it is made with its own `rate_limit`, `api` or
+                  `network` modifiers.
+        """
+
+        query_map = {"twitter": TwitterQuery}
+
+        if source.lower() not in query_map.keys():
+            raise ValueError('Source may be "Twitter".')
+        defaults = {}
+        self._defaults(defaults)
+        return query_map[source.lower()](
+            keys=self.keychain[self.keyring[source.lower()]],
+            media=media,
+            keyword=keyword,
+            quantity=quantity,
+            location=location,
+            interval=interval,
+            defaults=defaults
+        )
+
+    def close(self):
+        """Close the connections of the retriever (see :attr:`pool`)."""
+        self.pool.close()
 
     def get(
             self,
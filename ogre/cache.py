@@ -0,0 +1,361 @@
+"""
+OGRe Search Cache
+
+:class:`SearchCache` -- two-tier cache of search responses
+
+:class:`RangeCache` -- cache of the results in ranges of Tweet IDs
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from ogre.feature import serializable
+from ogre.media import _restore
+
+
+class SearchCache(object):  # pylint: disable=too-many-instance-attributes
+
+    """
+    Cache the responses of searches so identical ones are not repeated.
+
+    Responses are kept in memory and (optionally) in a SQLite database,
+    so they may be shared between processes and outlive them.
+    Each tier holds a limited number of responses
+    and evicts the least recently used one first.
+    A :class:`SearchCache` may be passed to requests as the `cache` modifier
+    (see :meth:`ogre.Twitter.twitter`).
+
+    :attr:`hits` -- the number of searches answered by the cache
+
+    :attr:`misses` -- the number of searches the cache could not answer
+
+    :meth:`get` -- look up the response to a search
+
+    :meth:`put` -- remember the response to a search
+
+    :meth:`clear` -- forget every response
+    """
+
+    def __init__(self, path=None, ttl=300, capacity=256, disk_capacity=65536):
+        """
+        Instantiate a SearchCache.
+
+        :type path: str
+        :param path: Specify a SQLite database to keep responses in
+                     (defaults to None, i.e. memory only).
+
+        :type ttl: float
+        :param ttl: Specify how many seconds a response stays fresh.
+
+        :type capacity: int
+        :param capacity: Specify how many responses to keep in memory.
+
+        :type disk_capacity: int
+        :param disk_capacity: Specify how many responses to keep on disk.
+        """
+        self.ttl = ttl
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.database = None
+        if path is not None:
+            self.database = sqlite3.connect(path, check_same_thread=False)
+            with self.database:
+                self.database.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, "
+                    "expires REAL, "
+                    "used REAL, "
+                    "response TEXT)"
+                )
+
+    @staticmethod
+    def key(params):
+        """Normalize the parameters of a search."""
+        return json.dumps(params, sort_keys=True)
+
+    def get(self, params):
+
+        """
+        Look up the response to a search.
+
+        :type params: dict
+        :param params: Specify the parameters of the search.
+
+        :rtype: dict
+        :returns: the response (or None if there is no fresh one)
+        """
+
+        key = self.key(params)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.pop(key, None)
+            if entry is not None and entry[0] <= now:
+                entry = None
+            if entry is None and self.database is not None:
+                row = self.database.execute(
+                    "SELECT expires, response FROM responses "
+                    "WHERE key = ? AND expires > ?",
+                    (key, now)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    with self.database:
+                        self.database.execute(
+                            "UPDATE responses SET used = ? WHERE key = ?",
+                            (now, key)
+                        )
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry)
+        return json.loads(entry[1])
+
+    def put(self, params, response):
+
+        """
+        Remember the response to a search.
+
+        :type params: dict
+        :param params: Specify the parameters of the search.
+
+        :type response: dict
+        :param response: Specify the response to the search.
+        """
+
+        key = self.key(params)
+        now = time.time()
+        entry = (now+self.ttl, json.dumps(response))
+        with self.lock:
+            self.memory.pop(key, None)
+            self._remember(key, entry)
+            if self.database is not None:
+                with self.database:
+                    self.database.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                        (key, entry[0], now, entry[1])
+                    )
+                    self.database.execute(
+                        "DELETE FROM responses WHERE expires <= ? OR key IN ("
+                        "SELECT key FROM responses ORDER BY used DESC "
+                        "LIMIT -1 OFFSET ?)",
+                        (now, self.disk_capacity)
+                    )
+
+    def _remember(self, key, entry):
+        """Keep an entry in memory (evicting the least recently used)."""
+        self.memory[key] = entry
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def clear(self):
+        """Forget every response."""
+        with self.lock:
+            self.memory.clear()
+            if self.database is not None:
+                with self.database:
+                    self.database.execute("DELETE FROM responses")
+
+
+class RangeCache(object):
+
+    """
+    Cache the results of searches by the range of IDs they were found in.
+
+    The cache records which (since_id, max_id] ranges of a search it has
+    fully fetched, along with the Features found in them,
+    so a search over an overlapping range only has to fetch the gaps.
+    Since Tweet IDs grow with time,
+    overlapping windows of time (e.g. the last hour and the last 6 hours)
+    then cost as much as the new Tweets in them rather than the whole window.
+    Ranges are kept in memory unless a SQLite database is specified.
+    A :class:`RangeCache` may be passed to requests with an `interval`
+    as the `range_cache` modifier (see :meth:`ogre.Twitter.twitter`).
+
+    :attr:`hits` -- the number of ranges answered by the cache
+
+    :attr:`misses` -- the number of ranges the cache could not answer
+
+    :meth:`segments` -- split a range into cached ranges and gaps
+
+    :meth:`features` -- look up the Features in a cached range
+
+    :meth:`put` -- remember the Features in a fully fetched range
+
+    :meth:`clear` -- forget every range
+    """
+
+    def __init__(self, path=None):
+        """
+        Instantiate a RangeCache.
+
+        :type path: str
+        :param path: Specify a SQLite database to keep ranges in
+                     (defaults to None, i.e. memory only).
+        """
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.database = sqlite3.connect(
+            ":memory:" if path is None else path,
+            check_same_thread=False
+        )
+        with self.database:
+            self.database.execute(
+                "CREATE TABLE IF NOT EXISTS ranges ("
+                "key TEXT, "
+                "since_id INTEGER, "
+                "max_id INTEGER)"
+            )
+            self.database.execute(
+                "CREATE INDEX IF NOT EXISTS ranges_by_key "
+                "ON ranges (key, max_id)"
+            )
+            self.database.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT, "
+                "id INTEGER, "
+                "feature TEXT, "
+                "PRIMARY KEY (key, id))"
+            )
+
+    @staticmethod
+    def key(params):
+        """Normalize the parameters of a search (other than its range)."""
+        return json.dumps(params, sort_keys=True)
+
+    def segments(self, params, since_id, max_id):
+
+        """
+        Split a range into cached ranges and gaps.
+
+        :type params: dict
+        :param params: Specify the parameters of the search.
+
+        :type since_id: int
+        :param since_id: Specify the ID the range starts after.
+
+        :type max_id: int
+        :param max_id: Specify the last ID in the range.
+
+        :rtype: list
+        :returns: the (since_id, max_id, cached) of each part of the range
+                  (newest first)
+        """
+
+        with self.lock:
+            rows = self.database.execute(
+                "SELECT since_id, max_id FROM ranges "
+                "WHERE key = ? AND max_id > ? AND since_id < ? "
+                "ORDER BY max_id DESC",
+                (self.key(params), since_id, max_id)
+            ).fetchall()
+            segments = []
+            upper = max_id
+            for lower, cached in rows:
+                cached = min(cached, max_id)
+                if cached < upper:
+                    segments.append((cached, upper, False))
+                upper = max(lower, since_id)
+                segments.append((upper, cached, True))
+            if upper > since_id:
+                segments.append((since_id, upper, False))
+            self.hits += sum(1 for segment in segments if segment[2])
+            self.misses += sum(1 for segment in segments if not segment[2])
+        return segments
+
+    def features(self, params, since_id, max_id, limit=None):
+
+        """
+        Look up the Features in a cached range.
+
+        :type params: dict
+        :param params: Specify the parameters of the search.
+
+        :type since_id: int
+        :param since_id: Specify the ID the range starts after.
+
+        :type max_id: int
+        :param max_id: Specify the last ID in the range.
+
+        :type limit: int
+        :param limit: Specify the most Features to look up
+                      (defaults to None, i.e. all of them).
+
+        :rtype: list
+        :returns: the (Tweet ID, GeoJSON Feature) of each Feature
+                  (newest first)
+        """
+
+        with self.lock:
+            rows = self.database.execute(
+                "SELECT id, feature FROM features "
+                "WHERE key = ? AND id > ? AND id <= ? "
+                "ORDER BY id DESC LIMIT ?",
+                (self.key(params), since_id, max_id, -1 if limit is None else limit)
+            ).fetchall()
+        return [(row[0], _restore(json.loads(row[1]))) for row in rows]
+
+    def put(self, params, since_id, max_id, features):
+
+        """
+        Remember the Features in a fully fetched range.
+
+        The range is merged with any cached ranges it overlaps or touches.
+
+        :type params: dict
+        :param params: Specify the parameters of the search.
+
+        :type since_id: int
+        :param since_id: Specify the ID the range starts after.
+
+        :type max_id: int
+        :param max_id: Specify the last ID in the range.
+
+        :type features: iterable
+        :param features: Specify the (Tweet ID, Feature) of every Feature
+                         found in the range.
+        """
+
+        key = self.key(params)
+        with self.lock:
+            with self.database:
+                self.database.executemany(
+                    "INSERT OR REPLACE INTO features VALUES (?, ?, ?)",
+                    [
+                        (key, tweet_id, json.dumps(feature, default=serializable))
+                        for tweet_id, feature in features
+                    ]
+                )
+                rows = self.database.execute(
+                    "SELECT since_id, max_id FROM ranges "
+                    "WHERE key = ? AND max_id >= ? AND since_id <= ?",
+                    (key, since_id, max_id)
+                ).fetchall()
+                self.database.execute(
+                    "DELETE FROM ranges "
+                    "WHERE key = ? AND max_id >= ? AND since_id <= ?",
+                    (key, since_id, max_id)
+                )
+                self.database.execute(
+                    "INSERT INTO ranges VALUES (?, ?, ?)",
+                    (
+                        key,
+                        min([since_id]+[row[0] for row in rows]),
+                        max([max_id]+[row[1] for row in rows])
+                    )
+                )
+
+    def clear(self):
+        """Forget every range."""
+        with self.lock:
+            with self.database:
+                self.database.execute("DELETE FROM ranges")
+                self.database.execute("DELETE FROM features")
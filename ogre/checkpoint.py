@@ -0,0 +1,139 @@
+"""
+OGRe Checkpoints
+
+:class:`Checkpoint` -- on-disk record of the progress of a paginated request
+"""
+
+import io
+import json
+import os
+
+from ogre.feature import serializable
+from ogre.media import _restore
+
+
+class Checkpoint(object):
+
+    """
+    Save the progress of a paginated request so it may be resumed.
+
+    The file holds the query it belongs to followed by one line per page:
+    the GeoJSON Features the page produced (and their Tweet IDs)
+    and the cursor (`max_id`) of the page after it.
+    Pages are appended (and synced) as they are saved,
+    so saving a page does not rewrite the pages before it.
+    A page cut off while it was being saved is forgotten.
+    If the file belongs to a different query, it is started over.
+    A :class:`Checkpoint` is made for requests given the `checkpoint`
+    modifier (see :meth:`ogre.Twitter.twitter`).
+
+    :attr:`features` -- the Features of the pages saved before
+
+    :attr:`ids` -- the Tweet ID of each of the :attr:`features`
+
+    :attr:`cursor` -- the cursor to resume from (None if the request finished)
+
+    :attr:`pages` -- the number of pages saved (before and since)
+
+    :meth:`save` -- save a page
+
+    :meth:`close` -- stop saving pages (keeping the file to resume from)
+
+    :meth:`discard` -- stop saving pages and delete the file
+    """
+
+    def __init__(self, path, query):
+        """
+        Instantiate a Checkpoint.
+
+        :type path: str
+        :param path: Specify a file to save progress in.
+
+        :type query: list
+        :param query: Specify (JSON-serializable) parameters
+                      that identify the request.
+        """
+        self.path = path
+        self.query = json.loads(json.dumps(query))
+        self.features = []
+        self.ids = []
+        self.cursor = None
+        self.pages = 0
+        self.file = None
+        valid = 0
+        if os.path.exists(path):
+            with io.open(path, "rb") as checkpoint_file:
+                header = None
+                for line in checkpoint_file:
+                    try:
+                        record = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        break  # The page was cut off while it was saved.
+                    if not line.endswith(b"\n"):
+                        break
+                    if header is None:
+                        header = record
+                        if header.get("query") != self.query:
+                            break
+                    else:
+                        self.features.extend(
+                            _restore(feature) for feature in record["features"]
+                        )
+                        self.ids.extend(
+                            record.get("ids") or [None]*len(record["features"])
+                        )
+                        self.cursor = record["max_id"]
+                        self.pages += 1
+                    valid += len(line)
+        if valid:
+            with io.open(path, "r+b") as checkpoint_file:
+                checkpoint_file.truncate(valid)
+            self.file = io.open(path, "a", encoding="utf-8")
+        else:
+            self.file = io.open(path, "w", encoding="utf-8")
+            self._append({"query": self.query})
+
+    @property
+    def finished(self):
+        """Check whether the request finished paging before it was saved."""
+        return self.pages > 0 and self.cursor is None
+
+    def _append(self, record):
+        """Append a record to the file and make sure it reaches the disk."""
+        self.file.write(
+            json.dumps(record, separators=(",", ":"), default=serializable)+u"\n"
+        )
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def save(self, features, cursor, ids=None):
+
+        """
+        Save a page.
+
+        :type features: list
+        :param features: Specify the GeoJSON Features the page produced.
+
+        :type cursor: int
+        :param cursor: Specify the cursor of the next page
+                       (None if there are no more pages).
+
+        :type ids: list
+        :param ids: Specify the Tweet ID of each Feature (if known).
+        """
+
+        self._append({"max_id": cursor, "features": features, "ids": ids})
+        self.cursor = cursor
+        self.pages += 1
+
+    def close(self):
+        """Stop saving pages (keeping the file to resume from)."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        """Stop saving pages and delete the file."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -5,12 +5,19 @@ See https://ogre.readthedocs.org/en/latest/ for more information.
 """
 
 import argparse
+import gzip
+import io
 import json
 import logging
 import os
 import sys
 
 from ogre import OGRe
+from ogre.connections import ConnectionPool
+from ogre.limits import RateLimit
+from ogre.media import IMAGE_MODES
+from ogre.output import write_collection, write_sequence
+from ogre.seen import SeenIds
 
 
 def cli(parser=None):
@@ -61,6 +68,51 @@ def cli(parser=None):
         default=None,
         nargs=2,
     )
+    parser.add_argument(
+        "-f", "--format",
+        help="Specify an output format." +
+        " 'json' writes a FeatureCollection," +
+        " 'ndjson' writes one Feature per line, and" +
+        " 'seq' writes a GeoJSON Text Sequence (RFC 8142)." +
+        " Results are written as they arrive.",
+        choices=("json", "ndjson", "seq"),
+        default="json",
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Specify a file to write to (defaults to stdout)." +
+        " Files ending in '.gz' are compressed.",
+        default=None,
+    )
+    parser.add_argument(
+        "--follow",
+        help="Keep polling for new results (every --poll seconds at most)." +
+        " Requires --format ndjson or seq.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--poll",
+        help="Specify the fewest seconds between polls when following.",
+        type=float,
+        default=60,
+    )
+    parser.add_argument(
+        "--image-mode",
+        help="Specify what to write for each image." +
+        " 'url' writes its URL (without downloading it)," +
+        " 'file' writes the path of a file in --image-directory it is saved to," +
+        " 'bytes' keeps it raw in memory (it is still written as base64), and" +
+        " 'base64' writes its base64 encoding.",
+        choices=IMAGE_MODES,
+        default="base64",
+    )
+    parser.add_argument(
+        "--image-directory",
+        help="Specify a directory to save images in." +
+        " Requires --image-mode file.",
+        default=None,
+    )
     parser.add_argument(
         "--hard",
         help="Fail hard (Raise exceptions instead of returning empty).",
@@ -78,6 +130,30 @@ def cli(parser=None):
         help="Specify a query limit.",
         default=None,
     )
+    parser.add_argument(
+        "--timeout",
+        help="Specify the most seconds to wait for a server.",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--rate-limits",
+        help="Specify a file to keep rate limits in between runs" +
+        " (so they are only requested when unknown or reset).",
+        default=None,
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Specify a file to save progress in after each page" +
+        " (so an interrupted query resumes where it stopped when rerun).",
+        default=None,
+    )
+    parser.add_argument(
+        "--seen",
+        help="Specify a file to keep the IDs of results in between runs" +
+        " (so results written by an earlier run are skipped).",
+        default=None,
+    )
     parser.add_argument(
         "--log",
         help="Specify a log level.",
@@ -92,13 +168,26 @@ def cli(parser=None):
     return parser
 
 
-def main(argv=None):
-    """Process arguments and invoke OGRe to fetch some data."""
+def _open_output(path):
+    """Open a file to write results to (compressing it if it ends in .gz)."""
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "wb"), encoding="utf-8")
+    return io.open(path, "w", encoding="utf-8")
+
 
-    if argv is None:
-        argv = sys.argv[1:]
-    args = cli().parse_args(argv)
+def _parse(argv):
+    """Parse (and check) command line arguments."""
+    parser = cli()
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if args.follow and args.format == "json":
+        parser.error("--follow requires --format ndjson or seq.")
+    if (args.image_mode == "file") != (args.image_directory is not None):
+        parser.error("--image-mode file requires --image-directory (and vice versa).")
+    return _convert(args)
 
+
+def _convert(args):
+    """Convert parsed arguments to the types OGRe expects."""
     if args.keys is not None:
         args.keys = json.loads(args.keys)
     else:
@@ -123,6 +212,49 @@ def main(argv=None):
         args.log = getattr(logging, args.log.upper())
     else:
         args.log = logging.WARN
+    return args
+
+
+def _query(args):
+    """Translate arguments into the parameters and runtime modifiers of a query."""
+    query = {
+        "sources": args.sources,
+        "media": args.media,
+        "keyword": args.keyword,
+        "quantity": args.quantity,
+        "location": args.location,
+        "checkpoint": args.checkpoint,
+        "seen": None if args.seen is None else SeenIds(args.seen),
+        "fail_hard": args.hard,
+        "image_mode": args.image_mode,
+        "image_directory": args.image_directory,
+        "query_limit": args.limit,
+        "secure": args.insecure,
+        "strict_media": args.strict,
+    }
+    if not args.follow:
+        query["interval"] = args.interval
+    return query
+
+
+def _write(features, style, path):
+    """Write results to a file (or stdout) as they arrive."""
+    stream = sys.stdout if path in (None, "-") else _open_output(path)
+    try:
+        if style == "json":
+            write_collection(features, stream)
+            stream.write(u"\n")
+        else:
+            write_sequence(features, stream, style=style)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
+def main(argv=None):
+    """Process arguments and invoke OGRe to fetch some data."""
+
+    args = _parse(argv)
 
     logging.basicConfig(
         level=args.log,
@@ -130,21 +262,22 @@ def main(argv=None):
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 
-    print(
-        json.dumps(
-            OGRe(args.keys).fetch(
-                sources=args.sources,
-                media=args.media,
-                keyword=args.keyword,
-                quantity=args.quantity,
-                location=args.location,
-                interval=args.interval,
-                fail_hard=args.hard,
-                query_limit=args.limit,
-                secure=args.insecure,
-                strict_media=args.strict,
-            ),
-            indent=4,
-            separators=(",", ": "),
-        ),
+    retriever = OGRe(
+        args.keys,
+        rate_limit=None if args.rate_limits is None else
+        RateLimit.load(args.rate_limits),
+        pool=ConnectionPool(timeout=args.timeout),
     )
+    query = _query(args)
+    try:
+        if args.follow:
+            features = retriever.follow(poll_interval=args.poll, **query)
+        else:
+            features = retriever.iter_features(**query)
+        _write(features, args.format, args.output)
+    finally:
+        if args.rate_limits is not None:
+            retriever.rate_limit.save(args.rate_limits)
+        if query["seen"] is not None:
+            query["seen"].close()
+        retriever.close()
@@ -0,0 +1,279 @@
+"""
+OGRe Columnar Collections
+
+:class:`ColumnarCollection` -- FeatureCollection held in NumPy arrays
+
+.. note:: This module requires NumPy (``pip install OGRe[columnar]``).
+"""
+
+import calendar
+import time
+from datetime import datetime
+
+from ogre.feature import Feature
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def require_numpy():
+    """Make sure NumPy is installed (or raise an ImportError that says how)."""
+    if numpy is None:
+        raise ImportError(
+            "Columnar collections require NumPy (pip install OGRe[columnar])."
+        )
+
+
+def _epoch_ms(stamp):
+    """Convert an ISO 8601 time made by OGRe to milliseconds since the epoch."""
+    whole, _, fraction = stamp.rstrip("Z").partition(".")
+    seconds = calendar.timegm(time.strptime(whole, "%Y-%m-%dT%H:%M:%S"))
+    return seconds*1000+(int(round(float("0."+fraction)*1000)) if fraction else 0)
+
+
+def _objects(values):
+    """Hold values (e.g. str, bytes or None) in a NumPy object array."""
+    values = list(values)
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class ColumnarCollection(object):
+
+    """
+    Hold a FeatureCollection in NumPy arrays (one per property).
+
+    Coordinates and times are kept in numeric arrays,
+    so they can be analyzed without walking any dicts,
+    while text and images are kept in object arrays alongside them.
+    :meth:`ogre.api.OGRe.fetch` returns one if `columnar` is specified.
+
+    Indexing with an integer builds the GeoJSON Feature at that index,
+    while indexing with a slice, an array of indices or a boolean mask
+    selects another ColumnarCollection
+    (e.g. ``collection[collection.longitudes < 0]``).
+    Collections may be concatenated with ``+`` (or :meth:`concatenate`).
+
+    :attr:`longitudes` -- float64 longitude of each Feature
+
+    :attr:`latitudes` -- float64 latitude of each Feature
+
+    :attr:`ids` -- int64 Tweet ID of each Feature (or 0 if it is unknown)
+
+    :attr:`times` -- int64 milliseconds since the epoch of each Feature
+
+    :attr:`sources` -- source of each Feature (e.g. "Twitter")
+
+    :attr:`texts` -- text of each Feature (or None)
+
+    :attr:`images` -- image of each Feature as its `image_mode` holds it (or None)
+
+    :meth:`from_features` -- hold GeoJSON (or compact) Features in columns
+
+    :meth:`concatenate` -- join collections end to end
+
+    :meth:`to_geojson` -- build the GeoJSON FeatureCollection
+
+    .. note:: GeoJSON Features do not carry Tweet IDs,
+              so only compact Features (:attr:`ogre.feature.Feature.tweet_id`)
+              fill :attr:`ids`.
+    """
+
+    def __init__(
+            self,
+            longitudes,
+            latitudes,
+            times,
+            sources,
+            texts,
+            images,
+            ids=None
+    ):  # pylint: disable=too-many-arguments
+        """
+        Instantiate a ColumnarCollection.
+
+        Every column must have the same length.
+
+        :type longitudes: numpy.ndarray
+        :param longitudes: Specify the longitude of each Feature.
+
+        :type latitudes: numpy.ndarray
+        :param latitudes: Specify the latitude of each Feature.
+
+        :type times: numpy.ndarray
+        :param times: Specify the milliseconds since the epoch of each Feature.
+
+        :type sources: numpy.ndarray
+        :param sources: Specify the source of each Feature.
+
+        :type texts: numpy.ndarray
+        :param texts: Specify the text of each Feature (or None).
+
+        :type images: numpy.ndarray
+        :param images: Specify the base64-encoded image of each Feature (or None).
+
+        :type ids: numpy.ndarray
+        :param ids: Specify the Tweet ID of each Feature
+                    (defaults to None, i.e. 0 for every Feature).
+
+        :raises: ImportError, ValueError
+        """
+        require_numpy()
+        self.longitudes = numpy.asarray(longitudes, dtype=numpy.float64)
+        self.latitudes = numpy.asarray(latitudes, dtype=numpy.float64)
+        self.times = numpy.asarray(times, dtype=numpy.int64)
+        self.ids = (
+            numpy.zeros(len(self.times), dtype=numpy.int64) if ids is None
+            else numpy.asarray(ids, dtype=numpy.int64)
+        )
+        self.sources = numpy.asarray(sources, dtype=object)
+        self.texts = numpy.asarray(texts, dtype=object)
+        self.images = numpy.asarray(images, dtype=object)
+        if len(set(len(column) for column in self._columns())) > 1:
+            raise ValueError("Every column must have the same length.")
+
+    def _columns(self):
+        """Get every column (in the order they are instantiated with)."""
+        return (
+            self.longitudes,
+            self.latitudes,
+            self.times,
+            self.sources,
+            self.texts,
+            self.images,
+            self.ids
+        )
+
+    @classmethod
+    def from_features(cls, features):
+
+        """
+        Hold GeoJSON (or compact) Features in columns.
+
+        :type features: list
+        :param features: Specify GeoJSON Features made by OGRe
+                         (or :class:`ogre.feature.Feature` objects).
+
+        :raises: ImportError, ValueError
+
+        :rtype: :class:`ColumnarCollection`
+        :returns: the Features in columns
+        """
+
+        require_numpy()
+        features = [
+            feature if isinstance(feature, Feature) else Feature.from_geojson(feature)
+            for feature in features
+        ]
+        return cls(
+            numpy.fromiter(
+                (feature.longitude for feature in features),
+                dtype=numpy.float64,
+                count=len(features)
+            ),
+            numpy.fromiter(
+                (feature.latitude for feature in features),
+                dtype=numpy.float64,
+                count=len(features)
+            ),
+            numpy.fromiter(
+                (_epoch_ms(feature.time) for feature in features),
+                dtype=numpy.int64,
+                count=len(features)
+            ),
+            _objects(feature.source for feature in features),
+            _objects(feature.text for feature in features),
+            _objects(feature.image for feature in features),
+            numpy.fromiter(
+                (feature.tweet_id or 0 for feature in features),
+                dtype=numpy.int64,
+                count=len(features)
+            )
+        )
+
+    @classmethod
+    def concatenate(cls, collections):
+
+        """
+        Join collections end to end (e.g. the pages or sources of a request).
+
+        :type collections: list
+        :param collections: Specify the ColumnarCollections to join.
+
+        :raises: ImportError
+
+        :rtype: :class:`ColumnarCollection`
+        :returns: every Feature of each collection (in order)
+        """
+
+        require_numpy()
+        collections = list(collections)
+        if not collections:
+            return cls.from_features([])
+        return cls(*[
+            numpy.concatenate(columns)
+            for columns in zip(*[
+                collection._columns()  # pylint: disable=protected-access
+                for collection in collections
+            ])
+        ])
+
+    def feature(self, index):
+
+        """
+        Build the GeoJSON Feature at an index.
+
+        :type index: int
+        :param index: Specify the position of the Feature.
+
+        :raises: IndexError
+
+        :rtype: dict
+        :returns: GeoJSON Feature
+        """
+
+        return Feature(
+            float(self.longitudes[index]),
+            float(self.latitudes[index]),
+            self.sources[index],
+            datetime.utcfromtimestamp(self.times[index]/1000.0).isoformat()+"Z",
+            self.texts[index],
+            self.images[index]
+        ).to_geojson()
+
+    def to_geojson(self):
+
+        """
+        Build the GeoJSON FeatureCollection.
+
+        :rtype: dict
+        :returns: GeoJSON FeatureCollection
+        """
+
+        return {
+            "type": "FeatureCollection",
+            "features": [self.feature(index) for index in range(len(self))]
+        }
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.feature(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, numpy.integer)):
+            return self.feature(index)
+        return ColumnarCollection(*[column[index] for column in self._columns()])
+
+    def __add__(self, other):
+        if not isinstance(other, ColumnarCollection):
+            return NotImplemented
+        return ColumnarCollection.concatenate([self, other])
+
+    def __repr__(self):
+        return "ColumnarCollection("+str(len(self))+" Features)"
@@ -0,0 +1,189 @@
+"""
+OGRe Connection Pooling
+
+:class:`ConnectionPool` -- keep-alive connections shared by requests
+"""
+
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import ReadTimeoutError  # pylint: disable=import-error
+from twython import Twython
+
+from ogre.media import CHUNK_SIZE
+
+
+class _Download(object):
+
+    """Read a streamed response in chunks (and release its connection)."""
+
+    def __init__(self, response):
+        self.response = response
+        self.chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+
+    def read(self, _=None):
+        """Read the next chunk of the response (or b"" once it is exhausted)."""
+        try:
+            chunk = next(self.chunks, b"")
+        except requests.exceptions.ConnectionError as error:
+            self.close()
+            if error.args and isinstance(error.args[0], ReadTimeoutError):
+                raise socket.timeout(str(error))
+            raise
+        if not chunk:
+            self.close()
+        return chunk
+
+    def close(self):
+        """Release the connection of the response to its pool."""
+        self.response.close()
+
+
+class ConnectionPool(object):  # pylint: disable=too-many-instance-attributes
+
+    """
+    Share keep-alive connections among the requests of a retriever.
+
+    :meth:`api` and :meth:`network` may be passed to requests as the
+    `api` and `network` modifiers (see :meth:`ogre.Twitter.twitter`);
+    :class:`ogre.api.OGRe` does so unless a request specifies its own.
+    Each API key gets one session (and connection pool) shared by every
+    thread, while each thread gets its own API client on top of it
+    (since clients remember the headers of their last response).
+    Images are downloaded through a separate session.
+
+    :meth:`api` -- get an API client that reuses pooled connections
+
+    :meth:`network` -- open an image through pooled connections
+
+    :meth:`close` -- close every pooled connection
+    """
+
+    def __init__(self, api=Twython, connections=10, image_connections=10, timeout=None):
+        """
+        Instantiate a ConnectionPool.
+
+        :type api: callable
+        :param api: Specify how to create API clients
+                    (a :class:`twython.Twython` or something like it).
+
+        :type connections: int
+        :param connections: Specify how many connections to keep alive
+                            for each API key.
+
+        :type image_connections: int
+        :param image_connections: Specify how many connections to keep alive
+                                  to each image host.
+
+        :type timeout: float
+        :param timeout: Specify the most seconds to wait for a server
+                        (defaults to None, i.e. forever).
+        """
+        self.factory = api
+        self.connections = connections
+        self.image_connections = image_connections
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.sessions = {}
+        self.image_session = None
+
+    @staticmethod
+    def _mount(session, connections):
+        """Size the connection pools of a session."""
+        adapter = HTTPAdapter(pool_connections=connections, pool_maxsize=connections)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def api(self, app_key=None, access_token=None):
+
+        """
+        Get an API client that reuses pooled connections.
+
+        :type app_key: str
+        :param app_key: Specify an API key.
+
+        :type access_token: str
+        :param access_token: Specify an access token.
+
+        :rtype: :class:`twython.Twython`
+        :returns: the API client of the calling thread for the key
+        """
+
+        identity = (app_key, access_token)
+        clients = self.local.__dict__.setdefault("clients", {})
+        client = clients.get(identity)
+        if client is not None:
+            return client
+        client_args = {}
+        if self.timeout is not None:
+            client_args["timeout"] = self.timeout
+        client = self.factory(
+            app_key,
+            access_token=access_token,
+            client_args=client_args
+        )
+        with self.lock:
+            session = self.sessions.get(identity)
+            if session is None:
+                self.sessions[identity] = self._mount(client.client, self.connections)
+            else:
+                client.client.close()
+                client.client = session
+        clients[identity] = client
+        return client
+
+    def network(self, url, timeout=None):
+
+        """
+        Open an image through pooled connections.
+
+        :type url: str
+        :param url: Specify the URL of the image.
+
+        :type timeout: float
+        :param timeout: Specify the most seconds to wait for the server
+                        (defaults to the timeout of the pool).
+
+        :raises: requests.exceptions.RequestException, socket.timeout
+
+        :rtype: file
+        :returns: the image (read in chunks as it arrives)
+        """
+
+        with self.lock:
+            if self.image_session is None:
+                self.image_session = self._mount(
+                    requests.Session(),
+                    self.image_connections
+                )
+            session = self.image_session
+        try:
+            response = session.get(
+                url,
+                stream=True,
+                timeout=self.timeout if timeout is None else timeout
+            )
+        except requests.exceptions.Timeout as error:
+            raise socket.timeout(str(error))
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError:
+            response.close()
+            raise
+        return _Download(response)
+
+    def close(self):
+        """Close every pooled connection (new ones are opened if needed)."""
+        with self.lock:
+            sessions = list(self.sessions.values())
+            if self.image_session is not None:
+                sessions.append(self.image_session)
+            self.sessions = {}
+            self.image_session = None
+            self.local = threading.local()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,166 @@
+"""
+OGRe Compact Features
+
+:class:`Feature` -- compact GeoJSON Feature
+
+:func:`serializable` -- JSON encoder hook for compact Features
+"""
+
+from ogre.media import _text
+
+
+class Feature(object):
+
+    """
+    Hold a GeoJSON Feature compactly.
+
+    The point, time, text and image of a result are kept in slots
+    instead of three nested dicts and a list,
+    so a Feature takes several times less memory.
+    The Tweet ID of the result is kept too (if it is known),
+    although it is not part of the GeoJSON.
+    The GeoJSON dict is only built when it is asked for
+    (with :meth:`to_geojson`), and a Feature compares equal to it
+    (so Features are compared by their GeoJSON, regardless of Tweet IDs).
+    Requests return Features instead of dicts if the `compact` modifier is
+    specified (see :meth:`ogre.Twitter.twitter`).
+
+    :meth:`from_geojson` -- compact a GeoJSON Feature
+
+    :meth:`to_geojson` -- build the GeoJSON Feature
+
+    .. note:: Compact Features are not serializable by `json.dumps` alone;
+              pass :func:`serializable` as its `default`
+              (:mod:`ogre.output` does so).
+    """
+
+    __slots__ = ("longitude", "latitude", "source", "time", "text", "image", "tweet_id")
+
+    def __init__(
+            self, longitude, latitude, source, time, text=None, image=None, tweet_id=None
+    ):  # pylint: disable=too-many-arguments
+        """
+        Instantiate a Feature.
+
+        :type longitude: float
+        :param longitude: Specify the longitude of the point.
+
+        :type latitude: float
+        :param latitude: Specify the latitude of the point.
+
+        :type source: str
+        :param source: Specify the source of the result (e.g. "Twitter").
+
+        :type time: str
+        :param time: Specify when the result was posted (ISO 8601).
+
+        :type text: str
+        :param text: Specify the text of the result (if any).
+
+        :type image: bytes
+        :param image: Specify the image of the result (if any),
+                      as its `image_mode` holds it (base64 by default).
+
+        :type tweet_id: int
+        :param tweet_id: Specify the ID of the Tweet of the result (if known).
+        """
+        self.longitude = longitude
+        self.latitude = latitude
+        self.source = source
+        self.time = time
+        self.text = text
+        self.image = image
+        self.tweet_id = tweet_id
+
+    @classmethod
+    def from_geojson(cls, feature, tweet_id=None):
+
+        """
+        Compact a GeoJSON Feature.
+
+        :type feature: dict
+        :param feature: Specify a GeoJSON Feature made by OGRe.
+
+        :type tweet_id: int
+        :param tweet_id: Specify the ID of the Tweet of the Feature (if known).
+
+        :raises: ValueError
+
+        :rtype: :class:`Feature`
+        :returns: the compact Feature
+        """
+
+        properties = feature["properties"]
+        if set(properties) - set(("source", "time", "text", "image")):
+            raise ValueError("Features may only have a source, time, text and image.")
+        longitude, latitude = feature["geometry"]["coordinates"]
+        return cls(
+            longitude,
+            latitude,
+            properties["source"],
+            properties["time"],
+            properties.get("text"),
+            properties.get("image"),
+            tweet_id
+        )
+
+    def to_geojson(self):
+
+        """
+        Build the GeoJSON Feature.
+
+        :rtype: dict
+        :returns: GeoJSON Feature
+        """
+
+        properties = {"source": self.source, "time": self.time}
+        if self.text is not None:
+            properties["text"] = self.text
+        if self.image is not None:
+            properties["image"] = self.image
+        return {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [self.longitude, self.latitude]
+            },
+            "properties": properties
+        }
+
+    def _values(self):
+        """Get the value of each slot of the GeoJSON."""
+        return tuple(getattr(self, slot) for slot in self.__slots__[:-1])
+
+    def __eq__(self, other):
+        if isinstance(other, Feature):
+            return self._values() == other._values()  # pylint: disable=protected-access
+        if isinstance(other, dict):
+            return self.to_geojson() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Feature"+repr(self._values()+(self.tweet_id,))
+
+
+def serializable(value):
+
+    """
+    Make compact Features (and base64-encoded images) JSON serializable.
+
+    This may be passed to `json.dumps` as its `default`,
+    e.g. `json.dumps(retriever.fetch(..., compact=True), default=serializable)`.
+
+    :raises: TypeError
+
+    :returns: a JSON-serializable equivalent of `value`
+    """
+
+    if isinstance(value, Feature):
+        return value.to_geojson()
+    return _text(value)
@@ -0,0 +1,124 @@
+"""
+OGRe Request Coalescing
+
+:class:`SingleFlight` -- coalescer of identical concurrent calls
+"""
+
+import copy
+import threading
+
+
+class _Flight(object):
+
+    """Hold the outcome of a call that others are waiting for."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self, func, *args, **kwargs):
+        """Make the call, holding its outcome for those waiting for it."""
+        try:
+            self.result = func(*args, **kwargs)
+        except BaseException as error:
+            self.error = error
+            raise
+        return self.result
+
+    def wait(self):
+        """Wait for the call to finish and share its outcome."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight(object):
+
+    """
+    Make identical concurrent calls once.
+
+    While a call is in flight, identical calls (i.e. those with the same key)
+    wait for it instead of being made again,
+    and every caller gets the same result (or exception).
+    Callers that waited get a deep copy of the result,
+    so changing one result does not change the others.
+    Once the call finishes, the next identical call is made anew.
+    :func:`ogre.aio.coalesce` does the same for coroutines.
+
+    :attr:`coalesced` -- the number of calls that waited for another
+
+    :meth:`key` -- identify a call by its parameters
+
+    :meth:`call` -- make a call (unless an identical one is in flight)
+    """
+
+    def __init__(self):
+        """Instantiate a SingleFlight."""
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.tasks = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def key(*args, **kwargs):
+
+        """
+        Identify a call by its parameters.
+
+        Unhashable parameters (e.g. a `state` dict) are identified by
+        the object itself rather than its contents,
+        so only calls sharing the very same object are identical.
+
+        :rtype: tuple
+        :returns: a hashable key
+        """
+
+        def token(value):
+            """Make a parameter hashable."""
+            try:
+                hash(value)
+            except TypeError:
+                return ("id", id(value))
+            return value
+
+        return (
+            tuple(token(value) for value in args),
+            tuple(sorted(
+                (name, token(value)) for name, value in kwargs.items()
+            ))
+        )
+
+    def call(self, key, func, *args, **kwargs):
+
+        """
+        Make a call (unless an identical one is in flight).
+
+        :type key: tuple
+        :param key: Specify what identifies the call (see :meth:`key`).
+
+        :type func: callable
+        :param func: Specify what to call (with any other parameters).
+
+        :returns: whatever the call returns
+        """
+
+        leader = False
+        with self.lock:
+            flight = self.calls.get(key)
+            if flight is None:
+                flight = self.calls[key] = _Flight()
+                leader = True
+            else:
+                self.coalesced += 1
+        if not leader:
+            return copy.deepcopy(flight.wait())
+        try:
+            return flight.run(func, *args, **kwargs)
+        finally:
+            with self.lock:
+                del self.calls[key]
+            flight.done.set()
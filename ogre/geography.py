@@ -0,0 +1,106 @@
+"""
+OGRe Geography Helpers
+
+:func:`distance` -- find the great-circle distance between two places
+
+:func:`cover` -- cover a circle with smaller circles
+
+:func:`subdivide` -- cover a circle with 7 circles of half its radius
+"""
+
+import math
+
+EARTH_RADIUS = {"km": 6371.0088, "mi": 3958.7613}
+
+
+def distance(latitude1, longitude1, latitude2, longitude2, unit="km"):
+
+    """
+    Find the great-circle distance between two places.
+
+    :type unit: str
+    :param unit: Specify the unit of the result ("km" or "mi").
+
+    :rtype: float
+    :returns: the haversine distance between the two places
+    """
+
+    phi1 = math.radians(latitude1)
+    phi2 = math.radians(latitude2)
+    delta_phi = math.radians(latitude2-latitude1)
+    delta_lambda = math.radians(longitude2-longitude1)
+    haversine = \
+        math.sin(delta_phi/2)**2 + \
+        math.cos(phi1)*math.cos(phi2)*math.sin(delta_lambda/2)**2
+    return 2*EARTH_RADIUS[unit]*math.asin(min(1.0, math.sqrt(haversine)))
+
+
+def _offset(latitude, longitude, north, east, unit):
+    """Move a place `north` and `east` (in `unit`)."""
+    degree = math.radians(1)*EARTH_RADIUS[unit]  # the length of 1 degree of latitude
+    parallel = max(math.cos(math.radians(latitude)), 1e-9)
+    latitude = max(min(latitude+north/degree, 90.0), -90.0)
+    longitude = (longitude+east/(degree*parallel)+180.0) % 360.0-180.0
+    return latitude, longitude
+
+
+def cover(latitude, longitude, radius, unit, tile_radius):
+
+    """
+    Cover a circle with smaller circles.
+
+    The centers of the smaller circles form a hexagonal lattice,
+    which covers the plane with the least overlap.
+    Only the circles that intersect the larger one are returned.
+
+    :type tile_radius: float
+    :param tile_radius: Specify the radius of the smaller circles
+                        (in the same unit as `radius`).
+
+    :rtype: list
+    :returns: (latitude, longitude, radius, unit) for each smaller circle
+    """
+
+    if tile_radius >= radius:
+        return [(latitude, longitude, radius, unit)]
+    spacing = math.sqrt(3)*tile_radius
+    rows = int(math.ceil((radius+tile_radius)/(1.5*tile_radius)))
+    columns = int(math.ceil((radius+tile_radius)/spacing))+1
+    tiles = []
+    for row in range(-rows, rows+1):
+        north = 1.5*tile_radius*row
+        for column in range(-columns, columns+1):
+            east = spacing*(column+0.5*(row % 2))
+            if math.hypot(north, east) < radius+tile_radius:
+                tiles.append(
+                    _offset(latitude, longitude, north, east, unit) +
+                    (tile_radius, unit)
+                )
+    return tiles
+
+
+def subdivide(latitude, longitude, radius, unit):
+
+    """
+    Cover a circle with 7 circles of half its radius.
+
+    One circle shares the center of the original,
+    and the other 6 surround it (which is the optimal covering).
+
+    :rtype: list
+    :returns: (latitude, longitude, radius, unit) for each smaller circle
+    """
+
+    tiles = [(latitude, longitude, radius/2.0, unit)]
+    for sextant in range(6):
+        angle = math.radians(60*sextant)
+        tiles.append(
+            _offset(
+                latitude,
+                longitude,
+                radius*math.sqrt(3)/2*math.cos(angle),
+                radius*math.sqrt(3)/2*math.sin(angle),
+                unit
+            ) + (radius/2.0, unit)
+        )
+    return tiles
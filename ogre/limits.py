@@ -0,0 +1,225 @@
+"""
+OGRe Rate Limit Tracker
+
+:class:`RateLimit` -- shareable budget of queries
+"""
+
+import io
+import json
+import os
+import threading
+import time
+
+
+class RateLimit(object):
+
+    """
+    Track how many queries may be made before a rate limit resets.
+
+    A :class:`RateLimit` may be shared by concurrent requests
+    (e.g. via the `rate_limit` modifier of :meth:`ogre.Twitter.twitter`)
+    so that together they never make more queries than remain.
+    :meth:`share` creates views of a budget that draw from it
+    while counting the queries each one makes.
+    Sources that pool several API keys keep a separate budget for each
+    (see :meth:`key`).
+
+    :attr:`remaining` -- the number of queries left (None if unknown)
+
+    :attr:`reset` -- the POSIX timestamp of the next reset (None if unknown)
+
+    :attr:`used` -- the number of queries taken through this object
+
+    :attr:`stale` -- whether the budget has reset since it was learned
+
+    :meth:`refresh` -- learn the budget (if it is unknown or stale)
+
+    :meth:`take` -- claim a query
+
+    :meth:`share` -- create a view of the budget that counts its own use
+
+    :meth:`key` -- get the budget of a particular API key
+
+    :meth:`save` -- save the budgets of the keys to a file
+
+    :meth:`load` -- load the budgets of the keys from a file
+    """
+
+    def __init__(self, remaining=None, reset=None, parent=None):
+        """
+        Instantiate a RateLimit.
+
+        :type remaining: int
+        :param remaining: Specify the number of queries left (if known).
+
+        :type reset: int
+        :param reset: Specify when the budget resets (if known).
+
+        :type parent: :class:`RateLimit`
+        :param parent: Specify a budget to draw from instead.
+        """
+        self.parent = parent
+        self.lock = threading.RLock() if parent is None else parent.lock
+        self._remaining = remaining
+        self._reset = reset
+        self._learned = time.time()
+        self._used = 0
+        self.keys = {}
+
+    @property
+    def remaining(self):
+        """Get the number of queries left."""
+        if self.parent is not None:
+            return self.parent.remaining
+        return self._remaining
+
+    @property
+    def used(self):
+        """Get the number of queries taken through this object (and its keys)."""
+        with self.lock:
+            return self._used+sum(budget.used for budget in self.keys.values())
+
+    @property
+    def reset(self):
+        """Get the POSIX timestamp of the next reset."""
+        if self.parent is not None:
+            return self.parent.reset
+        return self._reset
+
+    @property
+    def stale(self):
+        """Check whether the budget has reset since it was learned."""
+        if self.parent is not None:
+            return self.parent.stale
+        return self._reset is not None and self._learned < self._reset <= time.time()
+
+    def update(self, remaining, reset, learned=None):
+        """Record the budget reported by a source (when it was learned)."""
+        if self.parent is not None:
+            self.parent.update(remaining, reset, learned)
+            return
+        with self.lock:
+            self._remaining = remaining
+            self._reset = reset
+            self._learned = time.time() if learned is None else learned
+
+    def refresh(self, status):
+
+        """
+        Learn the budget (if it is unknown or stale).
+
+        Concurrent callers wait for the first one
+        so that the budget is only requested once.
+        A budget that is known and has not reset is not requested at all.
+
+        :type status: callable
+        :param status: Specify how to request the (remaining, reset) budget.
+        """
+
+        with self.lock:
+            if self.remaining is None or self.stale:
+                self.update(*status())
+
+    def take(self):
+
+        """
+        Claim a query.
+
+        :rtype: bool
+        :returns: whether a query may be made
+        """
+
+        with self.lock:
+            if self.remaining is not None:
+                if self.remaining < 1:
+                    return False
+                if self.parent is not None:
+                    if not self.parent.take():
+                        return False
+                else:
+                    self._remaining -= 1
+            self._used += 1
+            return True
+
+    def share(self):
+        """Create a view of the budget that counts its own use."""
+        return RateLimit(parent=self)
+
+    def key(self, identifier):
+
+        """
+        Get the budget of a particular API key.
+
+        The budgets of the keys of a view draw from the budgets of the keys
+        of the budget it views.
+
+        :type identifier: str
+        :param identifier: Specify a (non-secret) identifier of the API key.
+
+        :rtype: :class:`RateLimit`
+        :returns: the budget of the API key
+        """
+
+        with self.lock:
+            if identifier not in self.keys:
+                self.keys[identifier] = RateLimit(
+                    parent=None if self.parent is None else
+                    self.parent.key(identifier)
+                )
+            return self.keys[identifier]
+
+    def save(self, path):
+
+        """
+        Save the budgets of the keys to a file.
+
+        Only the (non-secret) identifiers of the keys are saved
+        (along with when each budget was learned, so it goes stale on time).
+
+        :type path: str
+        :param path: Specify a JSON file to save the budgets in.
+        """
+
+        with self.lock:
+            budgets = dict(
+                (identifier, {
+                    "remaining": budget.remaining,
+                    "reset": budget.reset,
+                    "learned": budget._learned  # pylint: disable=protected-access
+                })
+                for identifier, budget in self.keys.items()
+                if budget.remaining is not None
+            )
+        temporary = path+".tmp"
+        with io.open(temporary, "w", encoding="utf-8") as budget_file:
+            budget_file.write(json.dumps({"keys": budgets}, sort_keys=True)+u"\n")
+        getattr(os, "replace", os.rename)(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+
+        """
+        Load the budgets of the keys from a file.
+
+        :type path: str
+        :param path: Specify a JSON file the budgets were saved in
+                     (see :meth:`save`).
+                     If it does not exist, every budget is unknown,
+                     and budgets saved without when they were learned
+                     are stale once they reset.
+
+        :rtype: :class:`RateLimit`
+        :returns: a budget holding the budgets of the keys
+        """
+
+        rate_limit = cls()
+        if os.path.exists(path):
+            with io.open(path, encoding="utf-8") as budget_file:
+                budgets = json.loads(budget_file.read())["keys"]
+            for identifier, budget in budgets.items():
+                rate_limit.key(identifier).update(
+                    budget["remaining"],
+                    budget["reset"],
+                    budget.get("learned", 0)
+                )
+        return rate_limit
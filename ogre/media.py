@@ -0,0 +1,684 @@
+"""
+OGRe Media Retrieval
+
+:class:`ByteBudget` -- shareable budget of bytes
+
+:class:`RawImage` -- raw bytes of an image
+
+:class:`ImageEncoder` -- incremental image encoder with byte and time caps
+
+:class:`ImageStore` -- content-addressed store of images on disk
+
+:func:`retrieve_image` -- download and encode an image in chunks
+
+:func:`retrieve_images` -- download and encode images concurrently
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from ogre.exceptions import OGReLimitError
+
+from future.standard_library import hooks
+with hooks():
+    from urllib.parse import urlparse  # pylint: disable=import-error
+
+CHUNK_SIZE = 3*2**14  # A multiple of 3 keeps chunks on base64 boundaries.
+
+IMAGE_MODES = ("url", "file", "bytes", "base64")
+
+
+# Its state is only ever claimed, under its lock, so take is all it needs.
+class ByteBudget(object):  # pylint: disable=too-few-public-methods
+
+    """
+    Track how many bytes of media may still be retrieved.
+
+    A :class:`ByteBudget` is shared by every image of a request,
+    so concurrent downloads draw from it together.
+
+    :attr:`remaining` -- the number of bytes left (None if unlimited)
+    """
+
+    def __init__(self, remaining=None):
+        """
+        Instantiate a ByteBudget.
+
+        :type remaining: int
+        :param remaining: Specify the number of bytes left (if limited).
+        """
+        self.lock = threading.Lock()
+        self.remaining = remaining
+
+    def take(self, size):
+
+        """
+        Claim some bytes.
+
+        :type size: int
+        :param size: Specify the number of bytes to claim.
+
+        :rtype: bool
+        :returns: whether the bytes may be retrieved
+        """
+
+        with self.lock:
+            if self.remaining is None:
+                return True
+            if self.remaining < size:
+                self.remaining = 0
+                return False
+            self.remaining -= size
+            return True
+
+
+class RawImage(object):
+
+    """
+    Hold the raw bytes of an image (instead of its base64 encoding).
+
+    Images are retrieved as RawImages if the `image_mode` modifier is
+    "bytes" (see :meth:`ogre.Twitter.twitter`).
+    They are base64-encoded if they are written as JSON
+    (with :func:`ogre.feature.serializable` as the `default`).
+
+    :attr:`data` -- raw bytes of the image
+
+    .. note:: RawImages are not bytes (or str) themselves,
+              so `json.dumps` never mistakes them for text.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __eq__(self, other):
+        if not isinstance(other, RawImage):
+            return NotImplemented
+        return self.data == other.data
+
+    def __ne__(self, other):
+        if not isinstance(other, RawImage):
+            return NotImplemented
+        return self.data != other.data
+
+    def __hash__(self):
+        return hash(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return "RawImage("+repr(self.data)+")"
+
+
+class _Base64Sink(object):
+
+    """Base64-encode an image as it arrives (keeping only the encoding)."""
+
+    def __init__(self):
+        self.pending = b""
+        self.encoded = []
+
+    def write(self, chunk):
+        """Encode a chunk (holding back bytes past a base64 boundary)."""
+        chunk = self.pending+chunk
+        usable = len(chunk)-len(chunk) % 3
+        self.encoded.append(base64.b64encode(chunk[:usable]))
+        self.pending = chunk[usable:]
+
+    def finish(self):
+        """Get the base64 encoding of the image."""
+        self.encoded.append(base64.b64encode(self.pending))
+        self.pending = b""
+        return b"".join(self.encoded)
+
+    def discard(self):
+        """Forget the image."""
+        self.pending = b""
+        self.encoded = []
+
+
+class _BytesSink(object):
+
+    """Keep an image as it arrives."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, chunk):
+        """Keep a chunk."""
+        self.chunks.append(chunk)
+
+    def finish(self):
+        """Get the image as a :class:`RawImage`."""
+        return RawImage(b"".join(self.chunks))
+
+    def discard(self):
+        """Forget the image."""
+        self.chunks = []
+
+
+class _FileSink(object):
+
+    """Write an image to a file named by its SHA-256 hash as it arrives."""
+
+    def __init__(self, directory, url):
+        self.directory = directory
+        self.url = url
+        self.hash = hashlib.sha256()
+        self.file = None
+        self.temporary = None
+
+    def _open(self):
+        """Open a temporary file in the directory (if none is open)."""
+        if self.file is not None:
+            return
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+        descriptor, self.temporary = tempfile.mkstemp(dir=self.directory)
+        self.file = os.fdopen(descriptor, "wb")
+
+    def write(self, chunk):
+        """Write a chunk."""
+        self._open()
+        self.hash.update(chunk)
+        self.file.write(chunk)
+
+    def finish(self):
+        """Get the path of the file (keeping the extension of the URL)."""
+        self._open()
+        self.file.close()
+        extension = os.path.splitext(urlparse(self.url or "").path)[1]
+        path = os.path.join(self.directory, self.hash.hexdigest()+extension)
+        if os.path.exists(path):
+            os.remove(self.temporary)
+        else:
+            os.rename(self.temporary, path)
+        self.file = self.temporary = None
+        return path
+
+    def discard(self):
+        """Forget the image (and remove its file if one was written)."""
+        if self.file is not None:
+            self.file.close()
+            os.remove(self.temporary)
+            self.file = self.temporary = None
+
+
+class ImageEncoder(object):
+
+    """
+    Encode an image as it arrives (as its `image_mode` asks).
+
+    By default, chunks are base64-encoded as soon as they are fed,
+    so the raw image is never held in memory all at once.
+    If `image_mode` is "file", chunks are written to a file in the
+    `image_directory` instead (and its path is the encoded image),
+    and if it is "bytes", they are kept as they are (as a :class:`RawImage`).
+
+    :meth:`feed` -- encode a chunk of the image
+
+    :meth:`finish` -- get the encoded image
+
+    :meth:`discard` -- forget the image (e.g. if it is abandoned)
+    """
+
+    def __init__(self, modifiers, source="unknown", url=None):
+        """
+        Instantiate an ImageEncoder.
+
+        :type modifiers: dict
+        :param modifiers: Specify the `image_max_bytes`, `image_budget` and
+                          `image_timeout` the image must fit in
+                          (and optionally its `image_mode` and
+                          `image_directory`).
+
+        :type source: str
+        :param source: Specify where the image is from (for errors).
+
+        :type url: str
+        :param url: Specify where the image is from
+                    (its extension is kept if the image is written to a file).
+        """
+        self.limit = modifiers["image_max_bytes"]
+        self.budget = modifiers["image_budget"]
+        self.timeout = modifiers["image_timeout"]
+        self.source = source
+        self.start = time.time()
+        self.size = 0
+        mode = modifiers.get("image_mode", "base64")
+        if mode == "file":
+            self.sink = _FileSink(modifiers.get("image_directory"), url)
+        elif mode == "bytes":
+            self.sink = _BytesSink()
+        else:
+            self.sink = _Base64Sink()
+
+    def feed(self, chunk):
+
+        """
+        Encode a chunk of the image.
+
+        :type chunk: bytes
+        :param chunk: Specify the next chunk of the image
+                      (text is encoded as UTF-8 first).
+
+        :raises: OGReLimitError
+        """
+
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode("utf-8")
+        self.size += len(chunk)
+        if self.limit is not None and self.size > self.limit:
+            raise OGReLimitError(
+                source=self.source,
+                message="An image exceeds "+str(self.limit)+" bytes."
+            )
+        if self.budget is not None and not self.budget.take(len(chunk)):
+            raise OGReLimitError(
+                source=self.source,
+                message="The images exceed the byte limit of the query."
+            )
+        if self.timeout is not None and time.time()-self.start > self.timeout:
+            raise OGReLimitError(
+                source=self.source,
+                message="An image took over "+str(self.timeout)+" seconds."
+            )
+        self.sink.write(chunk)
+
+    def finish(self):
+
+        """
+        Get the encoded image.
+
+        :rtype: bytes
+        :returns: the base64 encoding of the image,
+                  the path of the file it was written to (if `image_mode`
+                  is "file") or a :class:`RawImage` (if it is "bytes")
+        """
+
+        return self.sink.finish()
+
+    def discard(self):
+        """Forget the image (and remove its file if one was written)."""
+        self.sink.discard()
+
+
+class ImageStore(object):
+
+    """
+    Keep retrieved images on disk so they are not downloaded again.
+
+    Images are stored by the SHA-256 hash of their content,
+    so the same image posted at different URLs is only stored once.
+    Once the store holds more than `max_bytes`,
+    the least recently used images are evicted.
+    An :class:`ImageStore` may be passed to requests as the `image_store`
+    modifier (see :meth:`ogre.Twitter.twitter`).
+
+    :attr:`hits` -- the number of images found in the store
+
+    :attr:`misses` -- the number of images not found in the store
+
+    :attr:`size` -- the number of bytes stored
+
+    :meth:`open` -- open a stored image
+
+    :meth:`writer` -- store an image as it is retrieved
+    """
+
+    def __init__(self, path, max_bytes=2**30):
+        """
+        Instantiate an ImageStore.
+
+        :type path: str
+        :param path: Specify a directory to store images in.
+
+        :type max_bytes: int
+        :param max_bytes: Specify the most bytes to store (defaults to 1 GiB).
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.index = sqlite3.connect(
+            os.path.join(path, "index.sqlite"),
+            check_same_thread=False
+        )
+        with self.index:
+            self.index.execute(
+                "CREATE TABLE IF NOT EXISTS urls "
+                "(url TEXT PRIMARY KEY, digest TEXT)"
+            )
+            self.index.execute(
+                "CREATE TABLE IF NOT EXISTS images "
+                "(digest TEXT PRIMARY KEY, size INTEGER, used REAL)"
+            )
+
+    @property
+    def size(self):
+        """Get the number of bytes stored."""
+        with self.lock:
+            return self.index.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM images"
+            ).fetchone()[0]
+
+    def _file(self, digest):
+        """Find where an image is stored."""
+        return os.path.join(self.path, digest[:2], digest)
+
+    def open(self, url):
+
+        """
+        Open a stored image.
+
+        :type url: str
+        :param url: Specify the URL the image was retrieved from.
+
+        :rtype: file
+        :returns: the image (opened for binary reading)
+                  or None if it is not stored
+        """
+
+        with self.lock:
+            row = self.index.execute(
+                "SELECT digest FROM urls WHERE url = ?",
+                (url,)
+            ).fetchone()
+            if row is not None:
+                try:
+                    image = open(self._file(row[0]), "rb")
+                except (IOError, OSError):
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self.index:
+                self.index.execute(
+                    "UPDATE images SET used = ? WHERE digest = ?",
+                    (time.time(), row[0])
+                )
+        return image
+
+    def writer(self, url):
+        """Store an image as it is retrieved (see :class:`_ImageWriter`)."""
+        return _ImageWriter(self, url)
+
+    def _commit(self, url, digest, size, temporary):
+        """Keep a retrieved image and evict others if the store is full."""
+        with self.lock:
+            if os.path.exists(self._file(digest)):
+                os.remove(temporary)
+            else:
+                if not os.path.isdir(os.path.dirname(self._file(digest))):
+                    os.makedirs(os.path.dirname(self._file(digest)))
+                os.rename(temporary, self._file(digest))
+            with self.index:
+                self.index.execute(
+                    "INSERT OR REPLACE INTO urls VALUES (?, ?)",
+                    (url, digest)
+                )
+                self.index.execute(
+                    "INSERT OR REPLACE INTO images VALUES (?, ?, ?)",
+                    (digest, size, time.time())
+                )
+                total = self.index.execute(
+                    "SELECT SUM(size) FROM images"
+                ).fetchone()[0]
+                evictions = self.index.execute(
+                    "SELECT digest, size FROM images WHERE digest != ? "
+                    "ORDER BY used",
+                    (digest,)
+                ).fetchall()
+                for evicted, evicted_size in evictions:
+                    if total <= self.max_bytes:
+                        break
+                    total -= evicted_size
+                    self.index.execute(
+                        "DELETE FROM images WHERE digest = ?",
+                        (evicted,)
+                    )
+                    self.index.execute(
+                        "DELETE FROM urls WHERE digest = ?",
+                        (evicted,)
+                    )
+                    try:
+                        os.remove(self._file(evicted))
+                    except OSError:
+                        pass
+
+
+class _ImageWriter(object):
+
+    """Write an image to an :class:`ImageStore` as it is retrieved."""
+
+    def __init__(self, store, url):
+        self.store = store
+        self.url = url
+        self.hash = hashlib.sha256()
+        self.size = 0
+        descriptor, self.temporary = tempfile.mkstemp(dir=store.path)
+        self.file = os.fdopen(descriptor, "wb")
+
+    def write(self, chunk):
+        """Write a chunk of the image."""
+        self.hash.update(chunk)
+        self.size += len(chunk)
+        self.file.write(chunk)
+
+    def commit(self):
+        """Keep the image."""
+        self.file.close()
+        self.store._commit(  # pylint: disable=protected-access
+            self.url,
+            self.hash.hexdigest(),
+            self.size,
+            self.temporary
+        )
+
+    def discard(self):
+        """Forget the image (e.g. if it could not be fully retrieved)."""
+        self.file.close()
+        os.remove(self.temporary)
+
+
+def _text(value):
+    """Serialize base64-encoded images as JSON text (see :func:`_restore`)."""
+    if isinstance(value, RawImage):
+        return base64.b64encode(value.data).decode("ascii")
+    if isinstance(value, bytes):
+        return value.decode("ascii")
+    raise TypeError(repr(value)+" is not JSON serializable")
+
+
+def _restore(feature):
+    """Restore the base64-encoded image of a Feature loaded from JSON."""
+    image = feature.get("properties", {}).get("image")
+    if image is not None and not isinstance(image, bytes):
+        feature["properties"]["image"] = image.encode("ascii")
+    return feature
+
+
+def _reencode(feature, image_mode):
+    """Convert the image of a Feature restored from JSON to the `image_mode`."""
+    image = feature.get("properties", {}).get("image")
+    if image is None or image_mode == "base64":
+        return feature
+    if image_mode == "bytes":
+        feature["properties"]["image"] = RawImage(base64.b64decode(image))
+    else:
+        feature["properties"]["image"] = image.decode("ascii")
+    return feature
+
+
+def _chunks(image):
+    """Read an image in chunks."""
+    chunk = image.read(CHUNK_SIZE)
+    while chunk:
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode("utf-8")
+        yield chunk
+        chunk = image.read(CHUNK_SIZE)
+
+
+def _recall(url, modifiers, source):
+    """Encode an image from the `image_store` (or None if it is not stored)."""
+    if modifiers["image_store"] is None:
+        return None
+    image = modifiers["image_store"].open(url)
+    if image is None:
+        return None
+    encoder = ImageEncoder(
+        dict(modifiers, image_budget=None, image_timeout=None),
+        source,
+        url
+    )
+    with image:
+        try:
+            for chunk in _chunks(image):
+                encoder.feed(chunk)
+        except Exception:
+            encoder.discard()
+            raise
+    return encoder.finish()
+
+
+def retrieve_image(url, modifiers, source="unknown"):
+
+    """
+    Download an image in chunks, base64-encoding it as it arrives.
+
+    The `network` is passed a `timeout` if `image_timeout` is specified.
+    If an `image_store` is specified, the image is looked up in it first
+    (and stored in it once retrieved).
+    If `image_mode` is "url", nothing is downloaded
+    and the URL itself is returned
+    (see :class:`ImageEncoder` for the other modes).
+
+    :type url: str
+    :param url: Specify the URL of the image to download.
+
+    :type modifiers: dict
+    :param modifiers: Specify the runtime modifiers of the request.
+
+    :type source: str
+    :param source: Specify where the image is from (for errors).
+
+    :raises: OGReLimitError
+
+    :rtype: bytes
+    :returns: the base64 encoding of the image
+              (or whatever its `image_mode` asks for instead)
+    """
+
+    if modifiers.get("image_mode") == "url":
+        return url
+    recalled = _recall(url, modifiers, source)
+    if recalled is not None:
+        return recalled
+    encoder = ImageEncoder(modifiers, source, url)
+    network = modifiers["network"]
+    writer = None
+    try:
+        if modifiers["image_timeout"] is None:
+            response = network(url)
+        else:
+            response = network(url, timeout=modifiers["image_timeout"])
+        with closing(response):
+            if modifiers["image_store"] is not None:
+                writer = modifiers["image_store"].writer(url)
+            for chunk in _chunks(response):
+                encoder.feed(chunk)
+                if writer is not None:
+                    writer.write(chunk)
+    except socket.timeout:
+        encoder.discard()
+        if writer is not None:
+            writer.discard()
+        raise OGReLimitError(
+            source=source,
+            message="An image took over " +
+            str(modifiers["image_timeout"])+" seconds."
+        )
+    except Exception:
+        encoder.discard()
+        if writer is not None:
+            writer.discard()
+        raise
+    if writer is not None:
+        writer.commit()
+    return encoder.finish()
+
+
+def retrieve_images(urls, modifiers, source="unknown"):
+
+    """
+    Download and encode images concurrently.
+
+    At most `image_workers` images are downloaded at once,
+    and at most `host_connections` of those may come from the same host.
+    Images that exceed `image_max_bytes`, `image_timeout` or the
+    `image_budget` of the request are abandoned
+    (unless `fail_hard` is specified).
+
+    :type urls: list
+    :param urls: Specify the URLs of images to download.
+
+    :type modifiers: dict
+    :param modifiers: Specify the runtime modifiers of the request.
+
+    :type source: str
+    :param source: Specify where the images are from (for errors).
+
+    :raises: OGReLimitError
+
+    :rtype: list
+    :returns: the base64 encoding of each image (in the order of `urls`)
+              or None for each abandoned image
+              (see :func:`retrieve_image` for other `image_mode` values)
+    """
+
+    if modifiers.get("image_mode") == "url":
+        return list(urls)
+    hosts = {}
+    for url in urls:
+        if urlparse(url).netloc not in hosts:
+            hosts[urlparse(url).netloc] = threading.BoundedSemaphore(
+                max(modifiers["host_connections"], 1)
+            )
+
+    def retrieve(url):
+        """Download an image without exceeding the connection cap of its host."""
+        try:
+            with hosts[urlparse(url).netloc]:
+                return retrieve_image(url, modifiers, source)
+        except OGReLimitError as error:
+            if modifiers["fail_hard"]:
+                raise
+            logging.getLogger(__name__).warning(str(error)+" "+url)
+            return None
+
+    workers = min(modifiers["image_workers"], len(urls))
+    if workers <= 1:
+        return [retrieve(url) for url in urls]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(retrieve, urls))
@@ -0,0 +1,167 @@
+"""
+OGRe Output Writers
+
+:func:`write_collection` -- write GeoJSON Features as a FeatureCollection
+
+:func:`write_sequence` -- write GeoJSON Features one record at a time
+"""
+
+import json
+import threading
+import time
+
+from ogre.feature import serializable
+
+RECORD_SEPARATOR = u"\x1e"
+
+
+def write_collection(features, stream, indent=4):
+
+    """
+    Write GeoJSON Features as a FeatureCollection.
+
+    The header of the FeatureCollection is written first,
+    then each Feature as soon as it is generated,
+    and finally the end of the document,
+    so memory use does not grow with the number of Features.
+    The document is the same as `json.dumps` would make
+    of the whole FeatureCollection (with `separators=(",", ": ")`).
+
+    :type features: iterable
+    :param features: Specify the GeoJSON Features to write
+                     (dicts or :class:`ogre.feature.Feature`).
+
+    :type stream: file
+    :param stream: Specify a (text) file to write to
+                   (e.g. one opened with `gzip.open` to compress it).
+
+    :type indent: int
+    :param indent: Specify how many spaces to indent each level by.
+
+    :rtype: int
+    :returns: the number of Features written
+    """
+
+    margin = u"\n"+u" "*indent
+    nested = margin+u" "*indent
+    stream.write(
+        u"{"+margin+u'"type": "FeatureCollection",'+margin+u'"features": ['
+    )
+    written = 0
+    for feature in features:
+        stream.write(
+            (u"," if written else u"")+nested +
+            json.dumps(
+                feature,
+                indent=indent,
+                separators=(",", ": "),
+                default=serializable
+            ).replace(u"\n", nested)
+        )
+        written += 1
+    stream.write((margin if written else u"")+u"]\n}")
+    return written
+
+
+class _Flusher(object):
+
+    """
+    Flush a stream at most `interval` seconds after anything is written.
+
+    Writes flush the stream once `interval` seconds have passed since the
+    last flush, and a timer flushes whatever is left in the buffer if no
+    more writes come (e.g. while :meth:`ogre.api.OGRe.follow` waits to poll).
+    """
+
+    def __init__(self, stream, interval):
+        self.stream = stream
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.flushed = None
+        self.timer = None
+
+    def _flush(self):
+        """Flush the stream (with the lock held)."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.stream is not None:
+            self.stream.flush()
+            self.flushed = time.time()
+
+    def _idle(self):
+        """Flush the stream once writes stop coming."""
+        with self.lock:
+            self.timer = None
+            self._flush()
+
+    def write(self, text):
+        """Write to the stream (flushing it within `interval` seconds)."""
+        with self.lock:
+            self.stream.write(text)
+            if self.flushed is None or time.time()-self.flushed >= self.interval:
+                self._flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(
+                    self.flushed+self.interval-time.time(),
+                    self._idle
+                )
+                self.timer.daemon = True
+                self.timer.start()
+
+    def close(self):
+        """Flush the stream (and stop flushing it)."""
+        with self.lock:
+            self._flush()
+            self.stream = None
+
+
+def write_sequence(features, stream, style="ndjson", flush_interval=1.0):
+
+    """
+    Write GeoJSON Features one record at a time.
+
+    Each Feature is written as soon as it is generated,
+    so `features` may be a generator (e.g. :meth:`ogre.api.OGRe.iter_features`)
+    and memory use does not grow with the number of Features.
+
+    :type features: iterable
+    :param features: Specify the GeoJSON Features to write
+                     (dicts or :class:`ogre.feature.Feature`).
+
+    :type stream: file
+    :param stream: Specify a (text) file to write to.
+
+    :type style: str
+    :param style: Specify "ndjson" to write newline-delimited JSON,
+                  or "seq" to write a GeoJSON Text Sequence (RFC 8142),
+                  i.e. records prefixed with an ASCII record separator.
+
+    :type flush_interval: float
+    :param flush_interval: Specify the most seconds to leave Features
+                           buffered (defaults to 1),
+                           even while no more Features are generated.
+                           The first Feature is flushed immediately.
+
+    :raises: ValueError
+
+    :rtype: int
+    :returns: the number of Features written
+    """
+
+    if style not in ("ndjson", "seq"):
+        raise ValueError('Style may be "ndjson" or "seq".')
+    prefix = RECORD_SEPARATOR if style == "seq" else u""
+    written = 0
+    flusher = _Flusher(stream, flush_interval)
+    try:
+        for feature in features:
+            flusher.write(prefix+json.dumps(
+                feature,
+                separators=(",", ":"),
+                default=serializable
+            )+u"\n")
+            written += 1
+    finally:
+        flusher.close()
+    return written
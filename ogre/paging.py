@@ -0,0 +1,808 @@
+"""
+OGRe Twitter Paging
+
+Helpers shared by every way of making a Twitter request
+(see :mod:`ogre.Twitter`, :mod:`ogre.streaming` and :mod:`ogre.aio`):
+merging runtime modifiers, tracking rate limits,
+and paging through the results of a search as GeoJSON Features.
+"""
+
+import hashlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from twython import Twython, TwythonRateLimitError
+from ogre.feature import Feature
+from ogre.limits import RateLimit
+from ogre.media import IMAGE_MODES, ByteBudget, retrieve_images
+from ogre.exceptions import OGReError, OGReLimitError
+from snowflake2time.snowflake import snowflake2utc
+
+from future.standard_library import hooks
+with hooks():
+    from urllib.request import urlopen  # pylint: disable=import-error
+
+_STATE_LOCK = threading.Lock()
+_WINDOW = 15*60  # Twitter rate limits reset every 15 minutes (in seconds).
+
+
+def _key_id(keys):
+    """Identify a set of Twitter API keys without revealing them."""
+    return hashlib.sha1(
+        (keys["consumer_key"]+":"+keys["access_token"]).encode('utf-8')
+    ).hexdigest()[:16]
+
+
+def _modifiers(kwargs):
+    """Merge runtime modifiers passed to a Twitter request with defaults."""
+    modifiers = {
+        "api": Twython,
+        "cache": None,
+        "checkpoint": None,
+        "compact": False,
+        "deadline": None,
+        "fail_hard": False,
+        "host_connections": 4,
+        "image_directory": None,
+        "image_max_bytes": None,
+        "image_mode": "base64",
+        "image_store": None,
+        "image_timeout": None,
+        "image_workers": 8,
+        "network": urlopen,
+        "prefetch": False,
+        "query_limit": 450,  # Twitter allows 450 queries every 15 minutes.
+        "query_max_bytes": None,
+        "range_cache": None,
+        "rate_limit": None,
+        "secure": True,
+        "seen": None,
+        "shards": 1,
+        "state": None,
+        "strict_media": False,
+        "tile_depth": 1,
+        "tile_radius": None,
+        "tile_workers": 8
+    }
+    for modifier in modifiers:
+        if kwargs.get(modifier) is not None:
+            modifiers[modifier] = kwargs[modifier]
+    if modifiers["image_mode"] not in IMAGE_MODES:
+        raise ValueError('Image mode may be "url", "file", "bytes" or "base64".')
+    if modifiers["image_mode"] == "file" and modifiers["image_directory"] is None:
+        raise ValueError('Image mode "file" requires an image directory.')
+    modifiers["image_budget"] = ByteBudget(modifiers["query_max_bytes"])
+    return modifiers
+
+
+def _qid(
+        keywords, quantity, geocode, since_id, max_id, kwargs
+):  # pylint: disable=too-many-arguments
+    """Identify a Twitter request in the log."""
+    return hashlib.md5(
+        (
+            str(time.time()) +
+            str(keywords) +
+            str(quantity) +
+            str(geocode) +
+            str(since_id) +
+            str(max_id) +
+            str(kwargs)
+        ).encode('utf-8')
+    ).hexdigest()
+
+
+def _limits(limits):
+
+    """
+    Find the search rate limit in a rate limit status response.
+
+    :raises: KeyError
+
+    :rtype: tuple
+    :returns: the number of queries remaining and when they reset
+    """
+
+    return (
+        int(limits["resources"]["search"]["/search/tweets"]["remaining"]),
+        int(limits["resources"]["search"]["/search/tweets"]["reset"])
+    )
+
+
+def _header_limits(api):
+
+    """
+    Find the search rate limit in the headers of the last response.
+
+    :rtype: tuple
+    :returns: the number of queries remaining and when they reset
+              (or None if the last response did not report them)
+    """
+
+    try:
+        return (
+            int(str(api.get_lastfunction_header("x-rate-limit-remaining"))),
+            int(str(api.get_lastfunction_header("x-rate-limit-reset")))
+        )
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def _reset(api, error):
+
+    """
+    Find when an API key that is being limited resets.
+
+    Twython reports the X-Rate-Limit-Reset header as a string (or None),
+    so this falls back to the headers of the last response
+    and then to a whole rate limit window from now.
+
+    :rtype: int
+    :returns: the POSIX timestamp of the reset
+    """
+
+    try:
+        return int(error.retry_after)
+    except (TypeError, ValueError):
+        limits = _header_limits(api)
+        if limits is not None:
+            return limits[1]
+        return int(time.time())+_WINDOW
+
+
+def _query_limit(budgets, modifiers, log, qid):
+
+    """
+    Reconcile rate limits with the requested query limit.
+
+    :type budgets: list
+    :param budgets: Specify the budget of each API key of the request.
+
+    :type modifiers: dict
+    :param modifiers: Specify the runtime modifiers of the request.
+
+    :raises: OGReLimitError
+
+    :rtype: int
+    :returns: the number of queries the request may make
+    """
+
+    query_limit = modifiers["query_limit"]
+    limit = sum(budget.remaining for budget in budgets)
+    if limit < 1:
+        message = "Queries are being limited."
+        log.info(qid+" Failure: "+message)
+        if modifiers["fail_hard"]:
+            raise OGReLimitError(
+                source="Twitter",
+                message=message,
+                reset=min(budget.reset for budget in budgets)
+            )
+    else:
+        log.debug(qid+" Status: "+str(limit)+" queries remain.")
+    if limit < query_limit:
+        query_limit = limit
+    return query_limit
+
+
+def _feature(tweet, kinds, modifiers):
+
+    """
+    Package a Tweet as a GeoJSON Feature (without retrieving any media).
+
+    :type tweet: dict
+    :param tweet: Specify a status returned by the Twitter Search API.
+
+    :type kinds: tuple
+    :param kinds: Specify the sanitized media of the request.
+
+    :type modifiers: dict
+    :param modifiers: Specify the runtime modifiers of the request.
+
+    :rtype: tuple
+    :returns: a Feature (or None if the Tweet is not geotagged or timestamped)
+              and the URL of an image to retrieve for it (or None)
+    """
+
+    if tweet.get("coordinates") is None or tweet.get("id") is None:
+        # Tweets must be geotagged and timestamped.
+        return None, None
+    feature = {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [
+                tweet["coordinates"]["coordinates"][0],
+                tweet["coordinates"]["coordinates"][1]
+            ]
+        },
+        "properties": {
+            "source": "Twitter",
+            "time": datetime.utcfromtimestamp(
+                snowflake2utc(tweet["id"])
+            ).isoformat()+"Z"
+        }
+    }
+    image_url = None
+    if "text" in kinds:
+        if tweet.get("text") is not None:
+            feature["properties"]["text"] = tweet["text"]
+    if "image" in kinds:
+        if not modifiers["strict_media"]:
+            if tweet.get("text") is not None:
+                feature["properties"]["text"] = tweet["text"]
+        for entity in tweet.get("entities", {}).get("media") or []:
+            if entity.get("type") is not None:
+                if entity["type"].lower() == "photo":
+                    media_url = "media_url_https"
+                    if not modifiers["secure"]:
+                        media_url = "media_url"
+                    if entity.get(media_url) is not None:
+                        # Only the last photo is kept, so only it is retrieved.
+                        image_url = entity[media_url]
+    return feature, image_url
+
+
+def _next_max_id(results):
+    """Find the max_id of the next page of a Twitter response (if any)."""
+    return int(
+        results["search_metadata"]["next_results"]
+        .split("max_id=")[1]
+        .split("&")[0]
+    )
+
+
+def _cursor(results):
+    """Find the max_id of the page after a page of results (if any)."""
+    if results.get("search_metadata", {}).get("next_results") is None:
+        return None
+    return _next_max_id(results)
+
+
+def _record(state, results=None, clients=None):
+
+    """
+    Record the progress of a request in its `state`.
+
+    :type results: dict
+    :param results: Specify a page of results whose Tweets have been seen.
+
+    :type clients: list
+    :param clients: Specify the (api, budget) of each key used.
+    """
+
+    with _STATE_LOCK:
+        if results is not None:
+            ids = [
+                tweet["id"] for tweet in results["statuses"]
+                if tweet.get("id") is not None
+            ]
+            if ids:
+                state["since_id"] = max([state.get("since_id") or 0]+ids)
+        if clients:
+            budgets = [
+                budget for _, budget in clients
+                if budget.remaining is not None
+            ]
+            if budgets:
+                state["remaining"] = sum(budget.remaining for budget in budgets)
+                state["reset"] = min(budget.reset for budget in budgets)
+
+
+class _Quota(object):
+
+    """
+    Share a limited number of queries among the parts of a request.
+
+    Each query is made with whichever API key has the most budget left,
+    and none are made once the deadline (if any) passes.
+    """
+
+    def __init__(self, queries, clients, deadline=None):
+        self.remaining = queries
+        self.clients = clients
+        self.deadline = deadline
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Claim a query and the (api, budget) to make it with (if any remain)."""
+        with self.lock:
+            if self.remaining < 1:
+                return None
+            if self.deadline is not None and time.time() >= self.deadline:
+                return None
+            for client in sorted(
+                    self.clients,
+                    key=lambda client: -float(
+                        "inf" if client[1].remaining is None
+                        else client[1].remaining
+                    )
+            ):
+                if client[1].take():
+                    self.remaining -= 1
+                    return client
+            return None
+
+    def retire(self, client, reset):
+        """
+        Stop taking an (api, budget) until its budget resets.
+
+        :rtype: bool
+        :returns: whether another (api, budget) may be taken instead
+                  (if not, the budget is left as it was)
+        """
+        if len(self.clients) < 2:
+            return False
+        client[1].update(0, reset)
+        return True
+
+
+def _cached(modifiers, params):
+    """Answer a search from the `cache` (or None if it cannot be)."""
+    if modifiers["cache"] is None:
+        return None
+    return modifiers["cache"].get(params)
+
+
+def _searched(client, modifiers, params, results):
+    """Learn from the response to a search (and cache it)."""
+    limits = _header_limits(client[0])
+    if limits is not None:
+        client[1].update(*limits)
+    if modifiers["cache"] is not None and results.get("statuses") is not None:
+        modifiers["cache"].put(params, results)
+    return results
+
+
+def _search(quota, modifiers, params, executor=None):
+
+    """
+    Prepare a search, answering it from the `cache` if possible.
+
+    :type quota: :class:`_Quota`
+    :param quota: Specify the queries the search may make.
+
+    :type params: dict
+    :param params: Specify the parameters of the search.
+
+    :type executor: concurrent.futures.Executor
+    :param executor: Specify where to start the search in the background
+                     (defaults to None, i.e. when its response is requested).
+
+    :rtype: tuple
+    :returns: the (api, budget) to make the search with
+              (None if the response is cached)
+              and a callable that returns the response
+              (None if no queries remain)
+    """
+
+    cached = _cached(modifiers, params)
+    if cached is not None:
+        return None, lambda: cached
+    client = quota.take()
+    if client is None:
+        return None, None
+
+    def search():
+        """Make the search (and cache its response)."""
+        return _searched(client, modifiers, params, client[0].search(**params))
+
+    if executor is not None:
+        return client, executor.submit(search).result
+    return client, search
+
+
+def _package(results, kinds, modifiers, accept=None):
+
+    """
+    Package the geotagged Tweets in a page of results as GeoJSON Features.
+
+    No media is retrieved yet (see :func:`_attach`),
+    and Tweets that were `seen` before are skipped.
+
+    :type accept: callable
+    :param accept: Specify a check each geotagged Tweet must pass
+                   before any of its media is retrieved.
+
+    :rtype: list
+    :returns: (feature, image_url, tweet_id) for each geotagged Tweet
+    """
+
+    packages = []
+    seen = modifiers["seen"]
+    for tweet in results["statuses"]:
+        if seen is not None and tweet.get("id") is not None and tweet["id"] in seen:
+            continue
+        feature, image_url = _feature(tweet, kinds, modifiers)
+        if feature is None or (accept is not None and not accept(tweet)):
+            continue
+        packages.append((feature, image_url, tweet["id"]))
+    return packages
+
+
+def _yield(packages):
+    """Count the Features packages will produce once their media is attached."""
+    return sum(
+        1 for feature, image_url, _ in packages
+        if image_url is not None or len(feature["properties"]) > 2
+    )
+
+
+def _image_urls(packages):
+    """List the URLs of the images of packaged Features (in order)."""
+    return [image_url for _, image_url, _ in packages if image_url is not None]
+
+
+def _attach(packages, modifiers, images=None):
+
+    """
+    Attach the media of packaged Features, and drop any without media.
+
+    The Features are compacted (keeping their Tweet IDs)
+    if the `compact` modifier is specified.
+
+    :type images: list
+    :param images: Specify the image retrieved for each URL of
+                   :func:`_image_urls` (or None if it was abandoned).
+                   They are retrieved now if this is not specified.
+
+    :rtype: list
+    :returns: GeoJSON Feature(s) (or :class:`ogre.feature.Feature` objects)
+    """
+
+    if images is None:
+        images = retrieve_images(_image_urls(packages), modifiers, source="Twitter")
+    images = iter(images)
+    for feature, image_url, _ in packages:
+        if image_url is not None:
+            image = next(images)
+            if image is not None:
+                feature["properties"]["image"] = image
+    if modifiers["compact"]:
+        return [
+            Feature.from_geojson(feature, tweet_id)
+            for feature, _, tweet_id in packages
+            if len(feature["properties"]) > 2
+        ]
+    return [
+        feature for feature, _, _ in packages
+        if len(feature["properties"]) > 2
+    ]
+
+
+def _clients(keychain, modifiers):
+    """Create an API client for each key of a request (with its budget)."""
+    rate_limit = modifiers["rate_limit"]
+    if rate_limit is None:
+        rate_limit = RateLimit()
+    return [
+        (
+            modifiers["api"](keys["consumer_key"], access_token=keys["access_token"]),
+            rate_limit.key(_key_id(keys))
+        )
+        for keys in (keychain if isinstance(keychain, list) else [keychain])
+    ]
+
+
+def _since_id(since_id, modifiers):
+    """Find the Tweet ID to search after (resuming from the `state`)."""
+    state = modifiers["state"] or {}
+    if state.get("since_id"):
+        return max(since_id or 0, state["since_id"])
+    return since_id
+
+
+class _Pager(object):
+
+    """
+    Keep track of paging through the results of a Twitter search.
+
+    A pager decides which page to request next and what to make of each
+    response, but it makes no requests itself,
+    so :func:`_pages` and :func:`ogre.aio._pages` share it.
+
+    :meth:`params` -- get the parameters of the search for a page
+
+    :meth:`count` -- count a query made with an API key
+
+    :meth:`report` -- log how the search went
+
+    :meth:`limited` -- handle an API key being limited
+
+    :meth:`receive` -- package a page of results
+
+    :meth:`produce` -- record the Features a page produced
+
+    :meth:`advance` -- move on to the next page (if it is needed)
+
+    :meth:`finish` -- record the budget left in the `state`
+    """
+
+    def __init__(self, quota, request, modifiers, log, qid):
+        """
+        Instantiate a _Pager.
+
+        :type quota: :class:`_Quota`
+        :param quota: Specify the queries the search may make
+                      (and the API access points to make them with).
+
+        :type request: tuple
+        :param request: Specify the (kinds, keywords, quantity, geocode,
+                        (since_id, max_id)) of the search.
+        """
+        self.quota = quota
+        self.request = request
+        self.modifiers = modifiers
+        self.log = log
+        self.qid = qid
+        self.max_id = request[4][1]
+        self.progress = [0, 0]  # [queries, produced]
+
+    @property
+    def produced(self):
+        """Get the number of results produced so far."""
+        return self.progress[1]
+
+    @property
+    def needed(self):
+        """Get the number of results still needed."""
+        return self.request[2]-self.produced
+
+    def params(self, max_id=None, needed=None):
+
+        """
+        Get the parameters of the search for a page.
+
+        :type max_id: int
+        :param max_id: Specify the latest Tweet ID of the page
+                       (defaults to the next page).
+
+        :type needed: int
+        :param needed: Specify how many results are needed
+                       (defaults to those still needed).
+        """
+
+        _, keywords, _, geocode, (since_id, _) = self.request
+        return {
+            "q": keywords,
+            # Twitter accepts a max count of 100.
+            "count": min(self.needed if needed is None else needed, 100),
+            "geocode": geocode,
+            "since_id": since_id,
+            "max_id": self.max_id if max_id is None else max_id
+        }
+
+    def count(self, client):
+        """Count a query made with an API key (if not answered by the cache)."""
+        if client is not None:
+            self.progress[0] += 1
+
+    def report(self, outcome, reason=None):
+        """Log how the search went."""
+        self.log.info(
+            self.qid+" "+outcome+": " +
+            str(self.progress[0])+" queries produced " +
+            str(self.produced)+" results." +
+            ("" if reason is None else " "+reason)
+        )
+
+    def limited(self, client, error):
+
+        """
+        Handle an API key being limited.
+
+        :type error: :class:`twython.TwythonRateLimitError`
+        :param error: Specify what Twitter reported.
+
+        :rtype: bool
+        :returns: whether the query may be retried with another key
+        """
+
+        if not self.quota.retire(client, _reset(client[0], error)):
+            self.report("Failure", str(error))
+            return False
+        self.log.info(self.qid+" Status: A key is being limited. "+str(error))
+        return True
+
+    def receive(self, results, accept=None):
+
+        """
+        Package a page of results.
+
+        :type accept: callable
+        :param accept: Specify a check each geotagged Tweet must pass.
+
+        :raises: OGReError
+
+        :rtype: list
+        :returns: the packages of the page (see :func:`_package`)
+                  or None if the request failed
+        """
+
+        if results.get("statuses") is None:
+            message = "The request is too complex."
+            self.report("Failure", message)
+            if self.modifiers["fail_hard"]:
+                raise OGReError(source="Twitter", message=message)
+            return None
+        return _package(results, self.request[0], self.modifiers, accept)
+
+    def produce(self, packages, features, results):
+
+        """
+        Record the Features a page produced.
+
+        :rtype: list
+        :returns: the Tweet ID of each Feature
+        """
+
+        ids = [
+            tweet_id for feature, _, tweet_id in packages
+            if len(feature["properties"]) > 2
+        ]
+        self.progress[1] += len(features)
+        if self.modifiers["seen"] is not None:
+            self.modifiers["seen"].update(ids)
+        if self.modifiers["state"] is not None:
+            _record(self.modifiers["state"], results=results)
+        self.log.debug(
+            self.qid+" Status:" +
+            " 1 query produced "+str(len(features))+" results."
+        )
+        return ids
+
+    def advance(self, results):
+
+        """
+        Move on to the next page (if it is needed).
+
+        :rtype: bool
+        :returns: whether the next page should be requested
+        """
+
+        if self.needed <= 0:
+            self.report("Success")
+            return False
+        if results.get("search_metadata", {}).get("next_results") is None:
+            self.report(
+                "Success" if self.produced else "Failure",
+                "No retrievable results remain."
+            )
+            return False
+        self.max_id = _next_max_id(results)
+        return True
+
+    def finish(self):
+        """Record the budget left in the `state` (if any)."""
+        if self.modifiers["state"] is not None:
+            _record(self.modifiers["state"], clients=self.quota.clients)
+
+
+def _pages(
+        quota,
+        kinds,
+        keywords,
+        quantity,
+        geocode,
+        period_id,
+        modifiers,
+        log,
+        qid,
+        proceed=None,
+        accept=None
+):  # pylint: disable=too-many-arguments
+
+    """
+    Page through the results of a Twitter search.
+
+    If Twitter reports that an API key is being limited,
+    the query is retried with another one (if any have budget left).
+    If the `prefetch` modifier is set, the next page is requested
+    (in the background) before the media of the current one is retrieved.
+
+    :type quota: :class:`_Quota`
+    :param quota: Specify the queries the search may make
+                  (and the API access points to make them with).
+
+    :type period_id: tuple
+    :param period_id: Specify the (since_id, max_id) to search between.
+
+    :type proceed: callable
+    :param proceed: Specify a check to make before each query
+                    (the search stops if it returns False).
+
+    :type accept: callable
+    :param accept: Specify a check each geotagged Tweet must pass.
+
+    :raises: OGReError, TwythonError
+
+    :rtype: generator
+    :returns: the GeoJSON Features of each page
+              (and the page itself and the Tweet ID of each Feature)
+    """
+
+    pager = _Pager(
+        quota,
+        (kinds, keywords, quantity, geocode, period_id),
+        modifiers,
+        log,
+        qid
+    )
+    prefetcher = ThreadPoolExecutor(max_workers=1) if modifiers["prefetch"] else None
+    try:
+        for page in _paged(pager, prefetcher, proceed, accept):
+            yield page
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown(wait=False)
+        pager.finish()
+
+
+def _prefetch(pager, prefetcher, results, expected, proceed):
+    """Request the next page in the background (if it will be needed)."""
+    if (
+            prefetcher is None or
+            expected <= 0 or
+            results.get("search_metadata", {}).get("next_results") is None or
+            (proceed is not None and not proceed())
+    ):
+        return None
+    client, search = _search(
+        pager.quota,
+        pager.modifiers,
+        pager.params(_next_max_id(results), expected),
+        prefetcher
+    )
+    if search is None:
+        return None
+    pager.count(client)
+    return client, search
+
+
+def _paged(pager, prefetcher, proceed, accept):
+    """Drive a :class:`_Pager` (see :func:`_pages`)."""
+    prefetched = None
+    while pager.needed > 0:
+        if prefetched is None:
+            if proceed is not None and not proceed():
+                break
+            prefetched = _search(pager.quota, pager.modifiers, pager.params())
+            if prefetched[1] is None:
+                pager.report(
+                    "Success" if pager.produced else "Failure",
+                    "No remaining results are retrievable."
+                )
+                break
+            pager.count(prefetched[0])
+        client, search = prefetched
+        prefetched = None
+        try:
+            results = search()
+        except TwythonRateLimitError as error:
+            if not pager.limited(client, error):
+                raise
+            continue
+        except Exception:
+            pager.report("Failure", str(sys.exc_info()[1]))
+            raise
+        packages = pager.receive(results, accept)
+        if packages is None:
+            break
+        prefetched = _prefetch(
+            pager,
+            prefetcher,
+            results,
+            pager.needed-_yield(packages),
+            proceed
+        )
+        features = _attach(packages, pager.modifiers)
+        yield features, results, pager.produce(packages, features, results)
+        if not pager.advance(results):
+            break
+
+
+def _geocode(latitude, longitude, radius, unit):
+    """Format a place as a Twitter geocode."""
+    return str(latitude)+","+str(longitude)+","+str(radius)+unit
@@ -0,0 +1,182 @@
+"""
+OGRe Prepared Queries
+
+:class:`TwitterQuery` -- Twitter request that is validated once
+"""
+
+import hashlib
+import itertools
+
+from ogre.validation import sanitize
+from ogre.paging import _key_id
+from ogre.streaming import _stream
+from ogre.Twitter import sanitize_twitter
+from snowflake2time.snowflake import utc2snowflake
+
+
+class TwitterQuery(object):
+
+    """
+    Validate and compile a Twitter request once so it may be made repeatedly.
+
+    Parameters are sanitized (and the search string and geocode are built)
+    when the query is prepared, so making it only costs the request itself.
+    A :class:`TwitterQuery` is immutable and hashable,
+    so it may be used as a dict key or shared between threads.
+    Queries with the same keys and (sanitized) parameters are equal.
+
+    .. seealso:: :meth:`ogre.Twitter.twitter` describes each parameter.
+
+    :meth:`iter_features` -- generate the GeoJSON Features of the query
+
+    :meth:`__call__` -- get the GeoJSON Features of the query
+    """
+
+    __slots__ = (
+        "keys",
+        "media",
+        "sanitized",
+        "identity",
+        "prefix",
+        "requests",
+        "defaults"
+    )
+
+    def __init__(
+            self,
+            keys,
+            media=("image", "text"),
+            keyword="",
+            quantity=15,
+            location=None,
+            interval=None,
+            defaults=None
+    ):  # pylint: disable=too-many-arguments
+        """
+        Instantiate a TwitterQuery.
+
+        :type defaults: dict
+        :param defaults: Specify runtime modifiers to use
+                         whenever the query is made without them.
+
+        :raises: ValueError
+        """
+        sanitized = sanitize_twitter(
+            keys=keys,
+            media=media,
+            keyword=keyword,
+            quantity=quantity,
+            location=location,
+            interval=interval
+        )
+        identity = (
+            tuple(
+                _key_id(keychain) for keychain in
+                (sanitized[0] if isinstance(sanitized[0], list) else [sanitized[0]])
+            ),
+            tuple(sorted(sanitized[1]))
+        ) + sanitized[2:]
+        self.keys = sanitized[0]
+        self.media = tuple(media)
+        self.sanitized = sanitized
+        self.identity = identity
+        self.prefix = hashlib.md5(repr(identity).encode("utf-8")).hexdigest()[:16]
+        self.requests = itertools.count()
+        self.defaults = tuple(sorted((defaults or {}).items()))
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):  # Each slot is assigned once (in __init__).
+            raise AttributeError("TwitterQuery objects are immutable.")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError("TwitterQuery objects are immutable.")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, TwitterQuery) and self.identity == other.identity
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.identity)
+
+    def __repr__(self):
+        return "TwitterQuery"+repr(self.identity[1:])
+
+    def iter_features(self, interval=None, since_id=None, max_id=None, **kwargs):
+
+        """
+        Generate the GeoJSON Features of the query.
+
+        .. seealso:: :meth:`ogre.Twitter.iter_twitter` describes
+                     how Features are generated.
+
+        :type interval: tuple
+        :param interval: Specify a period of time (earliest, latest)
+                         to search instead of the prepared one.
+
+        :type since_id: int
+        :param since_id: Specify the Tweet ID to search after
+                         instead of the prepared one.
+
+        :type max_id: int
+        :param max_id: Specify the latest Tweet ID to search
+                       instead of the prepared one.
+
+        :raises: ValueError
+
+        :rtype: generator
+        :returns: GeoJSON Feature(s)
+
+        .. note:: Runtime modifiers are accepted as they are by
+                  :meth:`ogre.Twitter.twitter`
+                  (and the `defaults` of the query fill in any that are not).
+        """
+
+        sanitized = self.sanitized
+        if interval is not None or since_id is not None or max_id is not None:
+            period_id = sanitized[5]
+            if interval is not None:
+                clean_interval = sanitize(media=None, interval=interval)[4]
+                period_id = (
+                    utc2snowflake(clean_interval[0]),
+                    utc2snowflake(clean_interval[1])
+                )
+            period_id = (
+                period_id[0] if since_id is None else int(since_id),
+                period_id[1] if max_id is None else int(max_id)
+            )
+            sanitized = sanitized[:5]+(period_id,)
+        return _stream(
+            sanitized,
+            self.media,
+            dict(self.defaults, **kwargs),
+            qid=self.prefix+"-"+str(next(self.requests))
+        )
+
+    def __call__(self, interval=None, since_id=None, max_id=None, **kwargs):
+
+        """
+        Get the GeoJSON Features of the query.
+
+        .. seealso:: :meth:`iter_features` describes each parameter.
+
+        :raises: OGReError, OGReLimitError, TwythonError, ValueError
+
+        :rtype: list
+        :returns: GeoJSON Feature(s)
+        """
+
+        return list(self.iter_features(
+            interval=interval,
+            since_id=since_id,
+            max_id=max_id,
+            **kwargs
+        ))
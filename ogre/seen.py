@@ -0,0 +1,271 @@
+"""
+OGRe Seen Tweet IDs
+
+:class:`SeenIds` -- persistent set of the Tweet IDs already produced
+"""
+
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from snowflake2time.snowflake import utc2snowflake
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_ID = struct.Struct("<q")
+_CHUNK = 2**13  # IDs are read and written 8192 at a time.
+
+
+class _Exclusive(object):
+
+    """Hold an exclusive lock on a file (across processes, where supported)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "ab")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *_):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+
+
+class SeenIds(object):
+
+    """
+    Remember which Tweet IDs have been produced (across runs and processes).
+
+    IDs are kept on disk as a sorted array of 64-bit integers,
+    which is memory-mapped and binary searched (instead of loaded),
+    so every process that opens the same file shares its pages.
+    New IDs are buffered in memory until :meth:`flush`
+    (or until `buffer_size` of them are pending),
+    when they are merged into a new array that atomically replaces the file.
+    Merges are serialized by a lock file next to it,
+    and other processes see merged IDs on their next lookup.
+    Since Tweet IDs are ordered by time, old IDs can be dropped
+    (see :meth:`compact`).
+
+    A :class:`SeenIds` may be passed to requests as the `seen` modifier
+    (see :meth:`ogre.Twitter.twitter`),
+    so Tweets it holds are skipped before they are packaged
+    (or their media is retrieved),
+    and the Tweets of every Feature produced are added to it.
+
+    :meth:`add` -- remember a Tweet ID
+
+    :meth:`update` -- remember several Tweet IDs
+
+    :meth:`flush` -- write pending Tweet IDs to disk
+
+    :meth:`compact` -- forget Tweet IDs older than a moment
+
+    :meth:`close` -- flush and unmap the file
+    """
+
+    def __init__(self, path, buffer_size=2**16):
+        """
+        Instantiate a SeenIds.
+
+        :type path: str
+        :param path: Specify a file to keep Tweet IDs in
+                     (it is created if it does not exist).
+
+        :type buffer_size: int
+        :param buffer_size: Specify how many Tweet IDs may be pending
+                            before they are written to disk.
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.file = None
+        self.mapping = None
+        self.identity = None
+        open(path, "ab").close()
+
+    @staticmethod
+    def _identify(stat):
+        """Tell versions of the file apart."""
+        return stat.st_ino, stat.st_size, stat.st_mtime
+
+    def _refresh(self):
+        """Map the latest version of the file (if it was replaced)."""
+        try:
+            identity = self._identify(os.stat(self.path))
+        except OSError:
+            identity = None
+        if identity is not None and identity == self.identity:
+            return
+        self._unmap()
+        if identity is None:
+            return
+        self.file = open(self.path, "rb")
+        stat = os.fstat(self.file.fileno())
+        self.identity = self._identify(stat)
+        if stat.st_size >= _ID.size:
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _unmap(self):
+        """Unmap the file."""
+        if self.mapping is not None:
+            self.mapping.close()
+        if self.file is not None:
+            self.file.close()
+        self.file = self.mapping = self.identity = None
+
+    def _count(self):
+        """Count the Tweet IDs in the mapped file."""
+        return 0 if self.mapping is None else len(self.mapping)//_ID.size
+
+    def _index(self, tweet_id):
+        """Find the first position in the mapped file not below a Tweet ID."""
+        low, high = 0, self._count()
+        while low < high:
+            middle = (low+high)//2
+            if _ID.unpack_from(self.mapping, middle*_ID.size)[0] < tweet_id:
+                low = middle+1
+            else:
+                high = middle
+        return low
+
+    def _stored(self, tweet_id):
+        """Check whether a Tweet ID is in the mapped file."""
+        index = self._index(tweet_id)
+        return (
+            index < self._count() and
+            _ID.unpack_from(self.mapping, index*_ID.size)[0] == tweet_id
+        )
+
+    def _read(self, start):
+        """Generate the Tweet IDs in the mapped file from a position on."""
+        count = self._count()
+        for offset in range(start, count, _CHUNK):
+            size = min(_CHUNK, count-offset)
+            for tweet_id in struct.unpack_from(
+                    "<"+str(size)+"q",
+                    self.mapping,
+                    offset*_ID.size
+            ):
+                yield tweet_id
+
+    def _merge(self, threshold=None):
+        """Merge pending Tweet IDs into the file (dropping any below a threshold)."""
+        if not self.pending and threshold is None:
+            return
+        with _Exclusive(self.path+".lock"):
+            self._refresh()
+            pending = sorted(
+                tweet_id for tweet_id in self.pending
+                if threshold is None or tweet_id >= threshold
+            )
+            start = 0 if threshold is None else self._index(threshold)
+            descriptor, temporary = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(self.path))
+            )
+            try:
+                with os.fdopen(descriptor, "wb") as output:
+                    chunk = []
+                    for tweet_id in heapq.merge(self._read(start), pending):
+                        if chunk and chunk[-1] == tweet_id:
+                            continue
+                        if len(chunk) == _CHUNK:
+                            output.write(struct.pack("<"+str(len(chunk))+"q", *chunk))
+                            chunk = []
+                        chunk.append(tweet_id)
+                    output.write(struct.pack("<"+str(len(chunk))+"q", *chunk))
+                    output.flush()
+                    os.fsync(output.fileno())
+                self._unmap()
+                getattr(os, "replace", os.rename)(temporary, self.path)
+            except Exception:
+                os.remove(temporary)
+                raise
+            self.pending = set()
+            self._refresh()
+
+    def __contains__(self, tweet_id):
+        with self.lock:
+            if tweet_id in self.pending:
+                return True
+            self._refresh()
+            return self._stored(tweet_id)
+
+    def __len__(self):
+        with self.lock:
+            self._refresh()
+            return self._count()+sum(
+                1 for tweet_id in self.pending
+                if not self._stored(tweet_id)
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def add(self, tweet_id):
+
+        """
+        Remember a Tweet ID.
+
+        :type tweet_id: int
+        :param tweet_id: Specify the ID of a Tweet that has been produced.
+        """
+
+        self.update([tweet_id])
+
+    def update(self, tweet_ids):
+
+        """
+        Remember several Tweet IDs.
+
+        They are written to disk once `buffer_size` are pending.
+
+        :type tweet_ids: list
+        :param tweet_ids: Specify the IDs of Tweets that have been produced.
+        """
+
+        with self.lock:
+            self.pending.update(tweet_ids)
+            if len(self.pending) >= self.buffer_size:
+                self._merge()
+
+    def flush(self):
+        """Write pending Tweet IDs to disk."""
+        with self.lock:
+            self._merge()
+
+    def compact(self, before):
+
+        """
+        Forget Tweet IDs older than a moment (and write pending ones to disk).
+
+        Tweets posted before the moment are no longer skipped,
+        so it should precede any interval that will be searched again.
+
+        :type before: float
+        :param before: Specify a POSIX timestamp.
+        """
+
+        with self.lock:
+            self._merge(utc2snowflake(before))
+
+    def close(self):
+        """Write pending Tweet IDs to disk and unmap the file."""
+        with self.lock:
+            self._merge()
+            self._unmap()
@@ -0,0 +1,579 @@
+"""
+OGRe Twitter Streaming
+
+Ways of generating the GeoJSON Features of a sanitized Twitter request:
+paging through it (resuming from a checkpoint),
+sharding its interval, tiling its location,
+or serving it from a range cache.
+:func:`ogre.Twitter.iter_twitter` picks one with :func:`_stream`.
+"""
+
+import logging
+import threading
+from types import GeneratorType
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from ogre.checkpoint import Checkpoint
+from ogre.feature import Feature
+from ogre.geography import cover, distance, subdivide
+from ogre.media import _reencode
+from ogre.paging import (
+    _Quota,
+    _clients,
+    _cursor,
+    _geocode,
+    _limits,
+    _modifiers,
+    _pages,
+    _qid,
+    _query_limit,
+    _since_id,
+)
+
+
+def _checkpoint(
+        modifiers, kinds, keywords, quantity, geocode, period_id
+):  # pylint: disable=too-many-arguments
+    """Open the `checkpoint` of a Twitter request (or None if it has none)."""
+    if modifiers["checkpoint"] is None:
+        return None
+    checkpoint = Checkpoint(modifiers["checkpoint"], [
+        "Twitter",
+        sorted(kinds),
+        keywords,
+        quantity,
+        geocode,
+        list(period_id),
+        modifiers["image_mode"]
+    ])
+    checkpoint.features = [
+        _restored(feature, tweet_id, modifiers)
+        for feature, tweet_id in zip(checkpoint.features, checkpoint.ids)
+    ]
+    return checkpoint
+
+
+def _restored(feature, tweet_id, modifiers):
+    """Prepare a Feature restored from JSON as a fresh one would be."""
+    _reencode(feature, modifiers["image_mode"])
+    if modifiers["compact"]:
+        return Feature.from_geojson(feature, tweet_id)
+    return feature
+
+
+def _shards(since_id, max_id, shards):
+    """Split (since_id, max_id] into at most `shards` ranges (newest first)."""
+    bounds = [
+        since_id + (max_id-since_id)*shard//shards
+        for shard in range(shards+1)
+    ]
+    return [
+        (lower, upper)
+        for lower, upper in zip(bounds, bounds[1:])
+        if lower < upper
+    ][::-1]
+
+
+def _unseen(features, seen):
+    """Keep the (Tweet ID, Feature) pairs whose Tweets were not `seen` before."""
+    if seen is None:
+        return features
+    return [(tweet_id, feature) for tweet_id, feature in features if tweet_id not in seen]
+
+
+def _unseen_tweet(seen):
+    """Make a check that skips Tweets `seen` before (or None if there is no `seen`)."""
+    if seen is None:
+        return None
+    return lambda tweet: tweet.get("id") is None or tweet["id"] not in seen
+
+
+def _emitted(features, seen):
+    """Add the Tweets of (Tweet ID, Feature) pairs to `seen` and get the Features."""
+    if seen is not None:
+        seen.update(tweet_id for tweet_id, _ in features)
+    return [feature for _, feature in features]
+
+
+def _sharded(
+        quota,
+        kinds,
+        keywords,
+        quantity,
+        geocode,
+        period_id,
+        modifiers,
+        log,
+        qid
+):  # pylint: disable=too-many-arguments
+
+    """
+    Page through sub-ranges of a Twitter search in parallel.
+
+    Since Twitter returns the newest Tweets first and the sub-ranges are
+    disjoint, concatenating the results of each (newest range first)
+    merges them by Tweet ID.
+    A sub-range stops paging as soon as it and the newer sub-ranges
+    have produced the requested `quantity` since older results
+    could never make the cut.
+    Sub-ranges skip `seen` Tweets, but only the Tweets that make the cut
+    are added to it.
+
+    .. seealso:: :meth:`_pages` describes each parameter.
+
+    :rtype: list
+    :returns: GeoJSON Feature(s)
+    """
+
+    ranges = _shards(period_id[0], period_id[1], modifiers["shards"])
+    if not ranges:
+        log.info(qid+" Success: No Tweets fall within the interval.")
+        return []
+    lock = threading.Lock()
+    produced = [0]*len(ranges)
+
+    def proceed(shard):
+        """Check whether a sub-range could still contribute results."""
+        with lock:
+            return sum(produced[:shard+1]) < quantity
+
+    def harvest(shard):
+        """Page through a sub-range."""
+        features = []
+        for page, _, ids in _pages(
+                quota, kinds, keywords, quantity, geocode,
+                ranges[shard], dict(modifiers, seen=None), log, qid+"."+str(shard),
+                proceed=lambda: proceed(shard),
+                accept=_unseen_tweet(modifiers["seen"])
+        ):
+            features.extend(zip(ids, page))
+            with lock:
+                produced[shard] += len(page)
+        return features
+
+    log.debug(qid+" Status: "+str(len(ranges))+" shards "+str(ranges))
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        return _emitted([
+            feature
+            for shard in executor.map(harvest, range(len(ranges)))
+            for feature in shard
+        ][:quantity], modifiers["seen"])
+
+
+def _tiled(
+        quota,
+        kinds,
+        keywords,
+        quantity,
+        geocode,
+        period_id,
+        modifiers,
+        log,
+        qid
+):  # pylint: disable=too-many-arguments,too-many-locals
+
+    """
+    Search a place by covering it with smaller places searched in parallel.
+
+    Tiles that return a full page with more results available are split
+    (up to `tile_depth` times) instead of being paged through.
+    Results outside of the original place are discarded,
+    and Tweets found by more than one tile are only returned once.
+    Since tiles finish in any order, their results are merged by Tweet ID
+    (newest first) before the requested `quantity` is cut.
+    Tiles skip `seen` Tweets, but only the Tweets that make the cut
+    are added to it.
+
+    .. seealso:: :meth:`_pages` describes each parameter.
+
+    :rtype: list
+    :returns: GeoJSON Feature(s)
+    """
+
+    latitude, longitude, radius = geocode.split(",")
+    latitude, longitude, radius, unit = \
+        float(latitude), float(longitude), float(radius[:-2]), radius[-2:]
+    lock = threading.Lock()
+    found = set()
+    produced = [0]
+    unseen = _unseen_tweet(modifiers["seen"])
+
+    def accept(tweet):
+        """Check whether a Tweet is new and within the original place."""
+        if unseen is not None and not unseen(tweet):
+            return False
+        coordinates = tweet["coordinates"]["coordinates"]
+        if distance(
+                latitude,
+                longitude,
+                coordinates[1],
+                coordinates[0],
+                unit
+        ) > radius:
+            return False
+        with lock:
+            if tweet["id"] in found:
+                return False
+            found.add(tweet["id"])
+            return True
+
+    def proceed():
+        """Check whether more results are needed."""
+        with lock:
+            return produced[0] < quantity
+
+    def survey(tile, depth):
+        """Search a tile (and find out whether it should be split)."""
+        features = []
+        pages = _pages(
+            quota, kinds, keywords, quantity, _geocode(*tile),
+            period_id, dict(modifiers, seen=None), log, qid+"."+_geocode(*tile),
+            proceed=proceed,
+            accept=accept
+        )
+        for page, results, ids in pages:
+            features.extend(zip(ids, page))
+            with lock:
+                produced[0] += len(page)
+            if depth < modifiers["tile_depth"] and \
+               results.get("search_metadata", {}).get("next_results") is not None:
+                pages.close()
+                return features, subdivide(*tile)
+        return features, []
+
+    tiles = cover(latitude, longitude, radius, unit, modifiers["tile_radius"])
+    log.debug(qid+" Status: "+str(len(tiles))+" tiles")
+    collection = []
+    with ThreadPoolExecutor(max_workers=modifiers["tile_workers"]) as executor:
+        pending = dict((executor.submit(survey, tile, 0), 0) for tile in tiles)
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for request in done:
+                depth = pending.pop(request)
+                features, tiles = request.result()
+                collection.extend(features)
+                if tiles and proceed():
+                    log.debug(qid+" Status: A tile was split.")
+                    for tile in tiles:
+                        pending[executor.submit(survey, tile, depth+1)] = depth+1
+    collection.sort(key=lambda pair: pair[0], reverse=True)
+    return _emitted(collection[:quantity], modifiers["seen"])
+
+
+def _range_params(kinds, keywords, geocode, modifiers):
+    """Get the parameters a search is cached under in the `range_cache`."""
+    return {
+        "q": keywords,
+        "geocode": geocode,
+        "kinds": sorted(kinds),
+        "strict_media": modifiers["strict_media"],
+        "image_mode": modifiers["image_mode"]
+    }
+
+
+def _ranged(
+        quota,
+        kinds,
+        keywords,
+        quantity,
+        geocode,
+        period_id,
+        modifiers,
+        log,
+        qid
+):  # pylint: disable=too-many-arguments,too-many-locals
+
+    """
+    Search a range of Tweet IDs, paging only through gaps in the `range_cache`.
+
+    Cached parts and gaps are visited newest first,
+    and each page of a gap is cached (whole) as soon as it is packaged.
+    Tweets that were `seen` before are skipped as they are produced
+    (and the rest are added to it), whether they were cached or searched.
+
+    .. seealso:: :meth:`_pages` describes each parameter.
+
+    :rtype: generator
+    :returns: GeoJSON Feature(s)
+    """
+
+    cache = modifiers["range_cache"]
+    params = _range_params(kinds, keywords, geocode, modifiers)
+    segments = cache.segments(params, *period_id)
+    log.debug(
+        qid+" Status: " +
+        str(sum(1 for segment in segments if segment[2]))+" of " +
+        str(len(segments))+" ranges are cached."
+    )
+    seen = modifiers["seen"]
+    produced = 0
+    for since_id, max_id, cached in segments:
+        if produced >= quantity:
+            break
+        if cached:
+            features = _emitted([
+                (tweet_id, _restored(feature, tweet_id, modifiers))
+                for tweet_id, feature in _unseen(
+                    cache.features(
+                        params, since_id, max_id,
+                        quantity-produced if seen is None else None
+                    ),
+                    seen
+                )[:quantity-produced]
+            ], seen)
+            produced += len(features)
+            for feature in features:
+                yield feature
+            continue
+        for features in _gap(
+                quota, (kinds, keywords, quantity-produced, geocode, (since_id, max_id)),
+                modifiers, log, qid
+        ):
+            produced += len(features)
+            for feature in features:
+                yield feature
+
+
+def _gap(quota, request, modifiers, log, qid):  # pylint: disable=too-many-locals
+
+    """
+    Page through a gap in the `range_cache` (caching each whole page).
+
+    Pages are searched (and cached) without skipping `seen` Tweets,
+    so the cache holds every Tweet of the gap,
+    and the gap is paged through until `quantity` unseen Tweets are produced
+    (or it, or the quota, is exhausted).
+
+    .. seealso:: :meth:`_ranged` describes each parameter.
+
+    :type request: tuple
+    :param request: Specify the (kinds, keywords, quantity, geocode,
+                    (since_id, max_id)) of the gap.
+
+    :rtype: generator
+    :returns: the GeoJSON Feature(s) of each page
+    """
+
+    kinds, keywords, quantity, geocode, (since_id, max_id) = request
+    cache = modifiers["range_cache"]
+    params = _range_params(kinds, keywords, geocode, modifiers)
+    seen = modifiers["seen"]
+    produced = 0
+    while produced < quantity and max_id is not None:
+        pages = _pages(
+            quota, kinds, keywords, quantity-produced, geocode,
+            (since_id, max_id), dict(modifiers, seen=None), log, qid
+        )
+        paged = False
+        try:
+            for features, results, ids in pages:
+                paged = True
+                cursor = _cursor(results)
+                cache.put(
+                    params,
+                    since_id if cursor is None else cursor,
+                    max_id,
+                    zip(ids, features)
+                )
+                max_id = cursor
+                features = _emitted(
+                    _unseen(list(zip(ids, features)), seen)[:quantity-produced],
+                    seen
+                )
+                produced += len(features)
+                yield features
+        finally:
+            pages.close()
+        if not paged:
+            return
+
+
+def _stream(sanitized, media, kwargs, qid=None):
+
+    """
+    Generate the Features of a sanitized Twitter request.
+
+    Modifiers are checked immediately (raising ValueError),
+    but nothing is requested until the first Feature is.
+
+    .. seealso:: :meth:`iter_twitter` describes each parameter.
+
+    :type qid: str
+    :param qid: Specify how to identify the request in the log
+                (defaults to a hash of its parameters).
+
+    :raises: ValueError
+
+    :rtype: generator
+    :returns: GeoJSON Feature(s)
+    """
+
+    return _streamed(sanitized, media, kwargs, _modifiers(kwargs), qid)
+
+
+def _streamed(
+        sanitized,
+        media,
+        kwargs,
+        modifiers,
+        qid
+):  # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+
+    """
+    Generate the Features of a sanitized Twitter request.
+
+    .. seealso:: :meth:`_stream` describes each parameter.
+
+    :type modifiers: dict
+    :param modifiers: Specify the checked modifiers of `kwargs`.
+    """
+
+    keychain, kinds, keywords, remaining, geocode, (since_id, max_id) = sanitized
+
+    since_id = _since_id(since_id, modifiers)
+
+    if qid is None:
+        qid = _qid(keywords, remaining, geocode, since_id, max_id, kwargs)
+
+    log = logging.getLogger(__name__)
+    log.info(qid+" Request: Twitter")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(
+            qid+" Status:" +
+            " media("+str(media)+")" +
+            " keyword("+str(keywords)+")" +
+            " quantity("+str(remaining)+")" +
+            " location("+str(geocode)+")" +
+            " interval("+str(since_id)+","+str(max_id)+")" +
+            " kwargs("+str(kwargs)+")"
+        )
+
+    if not kinds or remaining < 1 or modifiers["query_limit"] < 1:
+        log.info(qid+" Success: No results were requested.")
+        return
+
+    clients = _clients(keychain, modifiers)
+    for api, budget in clients:
+        try:
+            budget.refresh(
+                lambda api=api: _limits(api.get_application_rate_limit_status())
+            )
+        except KeyError:
+            log.warning(qid+" Unobtainable Rate Limit")
+            raise
+    modifiers["query_limit"] = _query_limit(
+        [budget for _, budget in clients],
+        modifiers,
+        log,
+        qid
+    )
+    quota = _Quota(modifiers["query_limit"], clients, modifiers["deadline"])
+    if modifiers["tile_radius"] and geocode is not None:
+        collection = _tiled(
+            quota, kinds, keywords, remaining, geocode,
+            (since_id, max_id), modifiers, log, qid
+        )
+    elif modifiers["range_cache"] is not None and since_id is not None and max_id is not None:
+        collection = _ranged(
+            quota, kinds, keywords, remaining, geocode,
+            (since_id, max_id), modifiers, log, qid
+        )
+    elif modifiers["shards"] > 1 and since_id is not None and max_id is not None:
+        collection = _sharded(
+            quota, kinds, keywords, remaining, geocode,
+            (since_id, max_id), modifiers, log, qid
+        )
+    else:
+        collection = _resumed(
+            quota, kinds, keywords, remaining, geocode,
+            (since_id, max_id), modifiers, log, qid
+        )
+    try:
+        for feature in collection:
+            yield feature
+    finally:
+        if isinstance(collection, GeneratorType):
+            collection.close()
+
+
+def _resumed(
+        quota,
+        kinds,
+        keywords,
+        quantity,
+        geocode,
+        period_id,
+        modifiers,
+        log,
+        qid
+):  # pylint: disable=too-many-arguments
+
+    """
+    Page through a Twitter search, resuming from its checkpoint (if any).
+
+    Each page is saved to the checkpoint as it is generated,
+    and the checkpoint is discarded once the search finishes
+    (but kept if paging stopped early, e.g. because queries ran out).
+
+    .. seealso:: :meth:`_pages` describes each parameter.
+
+    :rtype: generator
+    :returns: GeoJSON Feature(s)
+    """
+
+    checkpoint = _checkpoint(
+        modifiers, kinds, keywords, quantity, geocode, period_id
+    )
+    if checkpoint is None:
+        for feature in _saved(
+                _pages(
+                    quota, kinds, keywords, quantity, geocode,
+                    period_id, modifiers, log, qid
+                )
+        ):
+            yield feature
+        return
+    if checkpoint.pages:
+        log.info(
+            qid+" Status: Resuming after " +
+            str(checkpoint.pages)+" saved pages of " +
+            str(len(checkpoint.features))+" results."
+        )
+        quantity -= len(checkpoint.features)
+        period_id = (period_id[0], checkpoint.cursor)
+    produced = 0
+    try:
+        for feature in checkpoint.features:
+            yield feature
+        if quantity > 0 and not checkpoint.finished:
+            for feature in _saved(
+                    _pages(
+                        quota, kinds, keywords, quantity, geocode,
+                        period_id, modifiers, log, qid
+                    ),
+                    checkpoint
+            ):
+                produced += 1
+                yield feature
+    finally:
+        checkpoint.close()
+    _settle(checkpoint, produced >= quantity, log, qid)
+
+
+def _settle(checkpoint, satisfied, log, qid):
+    """Discard a checkpoint if its search ended (or keep it to resume from)."""
+    if satisfied or checkpoint.finished:
+        checkpoint.discard()
+    else:
+        log.info(qid+" Status: The checkpoint is kept to resume from.")
+
+
+def _saved(pages, checkpoint=None):
+    """Generate the Features of each page (saving the page to a checkpoint)."""
+    try:
+        for features, results, ids in pages:
+            if checkpoint is not None:
+                checkpoint.save(features, _cursor(results), ids)
+            for feature in features:
+                yield feature
+    finally:
+        pages.close()
@@ -1,8 +1,40 @@
 """
 OpenFusion GeoJSON Retriever Tests
 
+:mod:`fixtures` -- Twitter test fixtures
+
+:mod:`test_aio` -- asyncio interface tests
+
 :mod:`test_api` -- query handling tests
 
+:mod:`test_cache` -- search cache tests
+
+:mod:`test_checkpoint` -- checkpoint tests
+
+:mod:`test_columnar` -- columnar collection tests
+
+:mod:`test_connections` -- connection pooling tests
+
+:mod:`test_feature` -- compact Feature tests
+
+:mod:`test_flight` -- request coalescing tests
+
+:mod:`test_geography` -- geography helper tests
+
+:mod:`test_limits` -- rate limit tracker tests
+
+:mod:`test_media` -- media retrieval tests
+
+:mod:`test_output` -- output writer tests
+
+:mod:`test_paging` -- Twitter paging tests
+
+:mod:`test_query` -- prepared query tests
+
+:mod:`test_seen` -- seen Tweet ID tests
+
+:mod:`test_streaming` -- Twitter streaming tests
+
 :mod:`test_Twitter` -- Twitter interface tests
 
 :mod:`test_validation` -- parameter validation and sanitation tests
@@ -0,0 +1,8 @@
+"""pytest configuration for the OGRe tests"""
+
+import sys
+
+collect_ignore = []  # pylint: disable=invalid-name
+if sys.version_info < (3, 5):
+    # asyncio syntax requires Python 3.5+.
+    collect_ignore.append("test_aio.py")
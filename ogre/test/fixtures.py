@@ -0,0 +1,34 @@
+"""
+OGRe Twitter Test Fixtures
+
+:func:`twitter_timeline` -- Twitter Search API imitation
+"""
+
+import copy
+
+
+def twitter_timeline(template, ids):
+    """Imitate the Twitter Search API over Tweets with the given IDs."""
+    ids = sorted(ids, reverse=True)
+
+    def search(
+            q, count, geocode, since_id, max_id
+    ):  # pylint: disable=invalid-name,unused-argument,too-many-arguments
+        """Return a page of Tweets (newest first)."""
+        matches = [
+            tweet_id for tweet_id in ids
+            if (since_id is None or tweet_id > since_id) and
+            (max_id is None or tweet_id <= max_id)
+        ]
+        statuses = []
+        for tweet_id in matches[:count]:
+            tweet = copy.deepcopy(template)
+            tweet["id"] = tweet_id
+            statuses.append(tweet)
+        results = {"statuses": statuses, "search_metadata": {}}
+        if len(matches) > count:
+            results["search_metadata"]["next_results"] = \
+                "?max_id="+str(matches[count]) + "&q=test"
+        return results
+
+    return search
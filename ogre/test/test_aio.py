@@ -0,0 +1,396 @@
+"""
+OGRe asyncio Interface Tests
+
+:class:`AsyncTest` -- asyncio interface test template
+
+:meth:`AsyncTest.setUp` -- test initialization
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from mock import MagicMock
+from ogre import OGRe
+from ogre.aio import coalesce, twitter_async
+from ogre.feature import Feature
+from ogre.seen import SeenIds
+from ogre.test.fixtures import twitter_timeline
+from ogre.test.test_twitter import twitter_limits
+from ogre.Twitter import twitter
+
+
+class AsyncTwython(object):
+
+    """Imitate a Twython client with coroutine methods."""
+
+    def __init__(self, limits, tweets, delay=0):
+        self.limits = limits
+        self.tweets = tweets
+        self.delay = delay
+        self.searches = 0
+        self.active = 0
+        self.peak = 0
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    async def get_application_rate_limit_status(self):
+        """Return the rate limit this client was created with."""
+        return self.limits
+
+    async def search(self, **kwargs):
+        """Return the Tweets this client was created with (eventually)."""
+        self.searches += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.delay is None:
+                await asyncio.Event().wait()
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return copy.deepcopy(self.tweets)
+
+
+class AsyncTest(unittest.TestCase):
+
+    """
+    Create objects that test the asyncio interface.
+
+    These tests should make sure asyncio requests produce the same results
+    as their blocking counterparts and that they can be cancelled.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on the asyncio interface."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing an AsyncTest...")
+
+        self.retriever = OGRe(
+            keys={
+                "Twitter": {
+                    "consumer_key": os.environ.get("TWITTER_CONSUMER_KEY"),
+                    "access_token": os.environ.get("TWITTER_ACCESS_TOKEN")
+                }
+            }
+        )
+        self.limits = {
+            "resources": {
+                "search": {
+                    "/search/tweets": {
+                        "remaining": 2,
+                        "reset": 1234567890
+                    }
+                }
+            }
+        }
+        with open("ogre/test/data/Twitter-response-example.json") as tweets:
+            self.tweets = json.load(tweets)
+        self.api = MagicMock()
+        self.api().get_application_rate_limit_status.return_value = self.limits
+        self.api().search.side_effect = lambda **_: copy.deepcopy(self.tweets)
+        self.api.reset_mock()
+        self.network = MagicMock()
+        self.network.side_effect = lambda _: StringIO(u"test_image")
+        self.network.reset_mock()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_twitter_async(self):
+        """Coroutines return the same Features as blocking requests."""
+        self.log.debug("Testing asyncio Twitter requests...")
+        query = {
+            "keys": self.retriever.keychain[self.retriever.keyring["twitter"]],
+            "media": ("image", "text"),
+            "keyword": "test",
+            "quantity": 2,
+            "location": (0, 1, 2, "km"),
+            "interval": (3, 4),
+            "api": self.api,
+            "network": self.network
+        }
+        control = twitter(**query)
+        self.api.reset_mock()
+        self.network.reset_mock()
+        self.assertEqual(
+            control,
+            self.loop.run_until_complete(twitter_async(**query))
+        )
+        self.assertEqual(1, self.api().search.call_count)
+        self.assertEqual(1, self.network.call_count)
+
+    def test_checkpoint(self):
+        """Coroutines finish with their checkpoint deleted."""
+        self.log.debug("Testing asyncio checkpoints...")
+        directory = tempfile.mkdtemp()
+        try:
+            query = {
+                "keys": self.retriever.keychain[self.retriever.keyring["twitter"]],
+                "media": ("text",),
+                "keyword": "test",
+                "quantity": 2,
+                "api": self.api,
+                "network": self.network
+            }
+            control = twitter(**query)
+            query["checkpoint"] = os.path.join(directory, "query.checkpoint")
+            self.assertEqual(
+                control,
+                self.loop.run_until_complete(twitter_async(**query))
+            )
+            self.assertFalse(os.path.exists(query["checkpoint"]))
+
+            api = MagicMock()
+            api().get_application_rate_limit_status.return_value = \
+                twitter_limits(450, 1234567890)
+            api().search.side_effect = twitter_timeline(
+                self.tweets["statuses"][1],
+                range(1, 251)
+            )
+            query.update(api=api, quantity=250)
+            self.assertEqual(
+                100,
+                len(self.loop.run_until_complete(twitter_async(query_limit=1, **query)))
+            )
+            self.assertTrue(os.path.exists(query["checkpoint"]))
+            api().search.reset_mock()
+            self.assertEqual(
+                250,
+                len(self.loop.run_until_complete(twitter_async(**query)))
+            )
+            self.assertEqual(150, api().search.call_args_list[0][1]["max_id"])
+            self.assertFalse(os.path.exists(query["checkpoint"]))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_compact(self):
+        """Coroutines return compact Features if asked to."""
+        self.log.debug("Testing asyncio compact Features...")
+        query = {
+            "keys": self.retriever.keychain[self.retriever.keyring["twitter"]],
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 2,
+            "api": self.api,
+            "network": self.network
+        }
+        features = self.loop.run_until_complete(twitter_async(compact=True, **query))
+        self.assertEqual(twitter(**query), features)
+        self.assertTrue(all(isinstance(feature, Feature) for feature in features))
+
+    def test_seen(self):
+        """Coroutines skip (and remember) the Tweets seen before."""
+        self.log.debug("Testing asyncio seen Tweet IDs...")
+        directory = tempfile.mkdtemp()
+        try:
+            query = {
+                "keys": self.retriever.keychain[self.retriever.keyring["twitter"]],
+                "media": ("text",),
+                "keyword": "test",
+                "quantity": 2,
+                "api": self.api,
+                "network": self.network
+            }
+            control = twitter(**query)
+            with SeenIds(os.path.join(directory, "seen")) as seen:
+                self.assertEqual(
+                    control,
+                    self.loop.run_until_complete(twitter_async(seen=seen, **query))
+                )
+                self.assertEqual(
+                    [],
+                    self.loop.run_until_complete(twitter_async(seen=seen, **query))
+                )
+                self.assertEqual(len(control), len(seen))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_state(self):
+        """Coroutines resume from and record their state like blocking requests."""
+        self.log.debug("Testing asyncio request state...")
+        query = {
+            "keys": self.retriever.keychain[self.retriever.keyring["twitter"]],
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 2,
+            "api": self.api,
+            "network": self.network
+        }
+        control = {}
+        twitter(state=control, **query)
+        self.api.reset_mock()
+        state = {}
+        self.loop.run_until_complete(twitter_async(state=state, **query))
+        self.assertEqual(control, state)
+        self.loop.run_until_complete(twitter_async(state=state, **query))
+        self.assertEqual(
+            control["since_id"],
+            self.api().search.call_args[1]["since_id"]
+        )
+
+    def test_unsupported(self):
+        """Coroutines refuse the modifiers they do not support."""
+        self.log.debug("Testing unsupported asyncio modifiers...")
+        for modifier, value in (
+                ("prefetch", True),
+                ("range_cache", "ranges"),
+                ("tile_radius", 1),
+                ("shards", 2)
+        ):
+            with self.assertRaises(ValueError):
+                self.loop.run_until_complete(twitter_async(
+                    keys=self.retriever.keychain[self.retriever.keyring["twitter"]],
+                    keyword="test",
+                    api=self.api,
+                    **{modifier: value}
+                ))
+        self.assertEqual(0, self.api().search.call_count)
+        self.loop.run_until_complete(twitter_async(
+            keys=self.retriever.keychain[self.retriever.keyring["twitter"]],
+            media=("text",),
+            keyword="test",
+            quantity=2,
+            api=self.api,
+            shards=1
+        ))
+        self.assertEqual(1, self.api().search.call_count)
+
+    def test_fetch_async(self):
+        """Awaiting fetch_async returns the same FeatureCollection as fetch."""
+        self.log.debug("Testing asyncio fetching...")
+        query = {
+            "sources": ("Twitter",),
+            "keyword": "test",
+            "quantity": 2,
+            "api": self.api,
+            "network": self.network
+        }
+        self.assertEqual(
+            self.retriever.fetch(**query),
+            self.loop.run_until_complete(self.retriever.fetch_async(**query))
+        )
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(
+                self.retriever.fetch_async(sources=("Twitter", "invalid"))
+            )
+        self.api.reset_mock()
+        self.network.reset_mock()
+        retriever = OGRe(keys=self.retriever.keychain)
+        retriever.pool.api = self.api
+        retriever.pool.network = self.network
+        self.loop.run_until_complete(retriever.fetch_async(
+            sources=("Twitter",),
+            keyword="test",
+            quantity=2
+        ))
+        self.assertEqual(1, self.api().search.call_count)
+        self.assertEqual(1, self.network.call_count)
+
+    def test_concurrency(self):
+        """A single event loop drives many requests at once."""
+        self.log.debug("Testing asyncio concurrency...")
+        api = AsyncTwython(self.limits, self.tweets, delay=0.1)
+
+        async def requests():
+            """Make many requests at once."""
+            return await asyncio.gather(*[
+                twitter_async(
+                    keys=self.retriever.keychain[self.retriever.keyring["twitter"]],
+                    media=("text",),
+                    keyword="test",
+                    quantity=2,
+                    api=api
+                )
+                for _ in range(200)
+            ])
+
+        results = self.loop.run_until_complete(requests())
+        self.assertEqual(200, api.searches)
+        self.assertEqual(200, api.peak)
+        self.assertEqual(200, len(results))
+        self.assertEqual(2, len(results[0]))
+
+    def test_cancellation(self):
+        """Cancelling a request stops it."""
+        self.log.debug("Testing asyncio cancellation...")
+        api = AsyncTwython(self.limits, self.tweets, delay=None)
+        task = self.loop.create_task(
+            twitter_async(
+                keys=self.retriever.keychain[self.retriever.keyring["twitter"]],
+                keyword="test",
+                api=api,
+                network=self.network
+            )
+        )
+        self.loop.call_later(0.01, task.cancel)
+        with self.assertRaises(asyncio.CancelledError):
+            self.loop.run_until_complete(task)
+        self.assertEqual(1, api.searches)
+        self.assertEqual(0, self.network.call_count)
+
+    def test_coalesce(self):
+        """Identical concurrent coroutines are awaited once."""
+        self.log.debug("Testing asyncio request coalescing...")
+        api = AsyncTwython(self.limits, self.tweets, delay=0.1)
+        query = {
+            "sources": ("Twitter",),
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 2,
+            "api": api
+        }
+
+        async def requests():
+            """Make identical requests at once."""
+            return await asyncio.gather(*[
+                self.retriever.fetch_async(**query)
+                for _ in range(5)
+            ])
+
+        results = self.loop.run_until_complete(requests())
+        self.assertEqual(1, api.searches)
+        self.assertEqual([results[0]]*5, results)
+        self.assertEqual(2, len(results[0]["features"]))
+        results[0]["features"][0]["properties"]["text"] = "changed"
+        self.assertFalse(any(
+            result["features"][0]["properties"]["text"] == "changed"
+            for result in results[1:]
+        ))
+        self.assertEqual(4, self.retriever.flights.coalesced)
+
+        api = AsyncTwython(self.limits, self.tweets, delay=None)
+        flights = self.retriever.flights
+        first = self.loop.create_task(
+            coalesce(
+                flights, "test", twitter_async,
+                self.retriever.keychain["Twitter"],
+                keyword="test",
+                api=api
+            )
+        )
+        second = self.loop.create_task(
+            coalesce(
+                flights, "test", twitter_async,
+                self.retriever.keychain["Twitter"],
+                keyword="test",
+                api=api
+            )
+        )
+        self.loop.call_later(0.01, first.cancel)
+        with self.assertRaises(asyncio.CancelledError):
+            self.loop.run_until_complete(first)
+        self.assertFalse(second.done())
+        self.loop.call_later(0.01, second.cancel)
+        with self.assertRaises(asyncio.CancelledError):
+            self.loop.run_until_complete(second)
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(1, api.searches)
+        self.assertEqual({}, flights.tasks)
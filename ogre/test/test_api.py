@@ -10,15 +10,33 @@ OGRe Query Handler Tests
 :meth:`OGReTest.setUp` -- query handler test preparation
 
 :meth:`OGReTest.test_fetch` -- query handler tests
+
+:meth:`OGReTest.test_fetch_concurrency` -- concurrent source tests
+
+:meth:`OGReTest.test_fetch_timeout` -- source timeout tests
+
+:meth:`OGReTest.test_fetch_many` -- batch query tests
+
+:meth:`OGReTest.test_iter_features` -- streaming query tests
+
+:meth:`OGReTest.test_follow` -- polling query tests
+
+:meth:`OGReTest.test_rate_limit` -- rate limit reuse tests
 """
 
 import json
 import logging
 import os
+import threading
+import time
 import unittest
 from io import StringIO
-from mock import MagicMock
+from mock import MagicMock, patch
 from ogre import OGRe
+from ogre.api import _pace
+from ogre.columnar import ColumnarCollection, numpy
+from ogre.connections import ConnectionPool
+from ogre.exceptions import OGReError
 from ogre.Twitter import twitter
 
 
@@ -90,6 +108,18 @@ class OGReTest(unittest.TestCase):
     :meth:`setUp` -- query handler test preparation (always runs first)
 
     :meth:`test_fetch` -- query handling and packaging tests
+
+    :meth:`test_fetch_concurrency` -- concurrent source tests
+
+    :meth:`test_fetch_timeout` -- source timeout tests
+
+    :meth:`test_fetch_many` -- batch query tests
+
+    :meth:`test_iter_features` -- streaming query tests
+
+    :meth:`test_follow` -- polling query tests
+
+    :meth:`test_rate_limit` -- rate limit reuse tests
     """
 
     def setUp(self):
@@ -134,7 +164,8 @@ class OGReTest(unittest.TestCase):
             }
         }
         with open("ogre/test/data/Twitter-response-example.json") as tweets:
-            self.api().search.return_value = json.load(tweets)
+            self.tweets = json.load(tweets)
+        self.api().search.return_value = self.tweets
         self.api.reset_mock()
         self.network = MagicMock()
         self.network.side_effect = lambda _: StringIO(u"test_image")
@@ -216,3 +247,280 @@ class OGReTest(unittest.TestCase):
                 network=self.network
             )
         )
+
+    def blocked_api(self, release):
+        """Imitate a Twitter API that only responds once released."""
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            self.api().get_application_rate_limit_status.return_value
+        lock = threading.Lock()
+        active = [0]
+
+        def search(**_):
+            """Respond once released (noting how many searches overlap)."""
+            with lock:
+                api.workers.append(threading.current_thread())
+                active[0] += 1
+                api.peak = max(api.peak, active[0])
+            release.wait(5)
+            with lock:
+                active[0] -= 1
+            return self.tweets
+
+        api().search.side_effect = search
+        api.reset_mock()
+        api.workers = []
+        api.peak = 0
+        return api
+
+    def test_fetch_concurrency(self):
+        """Sources are queried concurrently and all of their results merged."""
+        self.log.debug("Testing concurrent sources...")
+        release = threading.Event()
+        api = self.blocked_api(release)
+        retriever = OGRe(keys=self.retriever.keychain, coalesce=False)
+        collections = []
+        thread = threading.Thread(target=lambda: collections.append(retriever.fetch(
+            sources=("Twitter", "twitter"),
+            media=("text",),
+            keyword="test",
+            quantity=2,
+            api=api,
+            network=self.network
+        )))
+        thread.start()
+        while api().search.call_count < 2:
+            threading.Event().wait(0.001)
+        release.set()
+        thread.join()
+        self.assertEqual(2, api.peak)
+        self.assertEqual(4, len(collections[0]["features"]))
+
+    def test_fetch_timeout(self):
+        """
+        Sources that take too long are abandoned (or fail hard).
+        Abandoned sources stop querying.
+        """
+        self.log.debug("Testing source timeouts...")
+        release = threading.Event()
+        api = self.blocked_api(release)
+        self.assertEqual(
+            self.retriever.fetch(
+                sources=("Twitter",),
+                keyword="test",
+                source_timeout=0.1,
+                api=api,
+                network=self.network
+            ),
+            {
+                "type": "FeatureCollection",
+                "features": []
+            }
+        )
+        release.set()
+        api.workers[0].join(5)
+        self.assertFalse(api.workers[0].is_alive())
+        self.assertEqual(1, api().search.call_count)
+        release.clear()
+        with self.assertRaises(OGReError):
+            self.retriever.fetch(
+                sources=("Twitter",),
+                keyword="test",
+                source_timeout=0.1,
+                fail_hard=True,
+                api=self.blocked_api(release),
+                network=self.network
+            )
+        release.set()
+
+    def test_fetch_many(self):
+        """Batches of queries share one rate limit and report their use."""
+        self.log.debug("Testing batch queries...")
+        queries = [
+            {"sources": ("Twitter",), "keyword": "test"+str(i), "quantity": 2}
+            for i in range(5)
+        ]
+        results = self.retriever.fetch_many(
+            queries,
+            concurrency=2,
+            media=("text",),
+            api=self.api,
+            network=self.network
+        )
+        self.assertEqual(5, len(results))
+        self.assertEqual(1, self.api().get_application_rate_limit_status.call_count)
+        self.assertEqual(2, self.api().search.call_count)
+        self.assertEqual(2, sum(used for _, used in results))
+        for feature_collection, used in results:
+            self.assertEqual("FeatureCollection", feature_collection["type"])
+            self.assertEqual(2*used, len(feature_collection["features"]))
+
+    def test_iter_features(self):
+        """Features are generated as they arrive, and closing stops the fetch."""
+        self.log.debug("Testing streaming queries...")
+        limits = self.api().get_application_rate_limit_status.return_value
+        limits["resources"]["search"]["/search/tweets"]["remaining"] = 450
+        query = {
+            "sources": ("Twitter",),
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 4,
+            "api": self.api,
+            "network": self.network
+        }
+        control = self.retriever.fetch(**query)
+        self.api.reset_mock()
+        self.assertEqual(
+            control["features"],
+            list(self.retriever.iter_features(**query))
+        )
+        self.api.reset_mock()
+        features = self.retriever.iter_features(**query)
+        self.assertEqual(control["features"][0], next(features))
+        features.close()
+        self.assertEqual(1, self.api().search.call_count)
+        self.assertEqual([], list(self.retriever.iter_features(**dict(query, media=()))))
+        with self.assertRaises(ValueError):
+            self.retriever.iter_features(sources=("Twitter", "invalid"))
+
+    def test_follow(self):
+        """Each poll only asks for results newer than any seen."""
+        self.log.debug("Testing polling queries...")
+        limits = self.api().get_application_rate_limit_status.return_value
+        limits["resources"]["search"]["/search/tweets"]["remaining"] = 450
+        features = list(self.retriever.follow(
+            sources=("Twitter",),
+            media=("text",),
+            keyword="test",
+            quantity=2,
+            poll_interval=0,
+            polls=3,
+            api=self.api,
+            network=self.network
+        ))
+        self.assertEqual(6, len(features))
+        self.assertEqual(3, self.api().search.call_count)
+        since_ids = [call[1]["since_id"] for call in self.api().search.call_args_list]
+        self.assertEqual(None, since_ids[0])
+        self.assertEqual(
+            [max(
+                tweet["id"] for tweet in self.tweets["statuses"]
+                if tweet.get("id") is not None
+            )]*2,
+            since_ids[1:]
+        )
+        self.assertEqual(0, _pace({}))
+        self.assertEqual(0, _pace({"remaining": 0, "reset": time.time()-10}))
+        self.assertAlmostEqual(
+            10,
+            _pace({"remaining": 9, "reset": time.time()+100}),
+            places=1
+        )
+        with self.assertRaises(ValueError):
+            self.retriever.follow(sources=("invalid",))
+
+    def test_rate_limit(self):
+        """Retrievers only ask for rate limits that are unknown or reset."""
+        self.log.debug("Testing rate limit reuse...")
+        limits = self.api().get_application_rate_limit_status.return_value
+        limits["resources"]["search"]["/search/tweets"]["reset"] = time.time()+900
+        for _ in range(2):
+            self.retriever.fetch(
+                sources=("Twitter",),
+                media=("text",),
+                keyword="test",
+                quantity=2,
+                api=self.api,
+                network=self.network
+            )
+        self.assertEqual(1, self.api().get_application_rate_limit_status.call_count)
+        self.assertEqual(2, self.api().search.call_count)
+        self.assertEqual(2, self.retriever.rate_limit.used)
+
+    def test_coalesce(self):
+        """Identical concurrent fetches are made once."""
+        self.log.debug("Testing request coalescing...")
+        limits = self.api().get_application_rate_limit_status.return_value
+        limits["resources"]["search"]["/search/tweets"]["remaining"] = 450
+        query = {
+            "sources": ("Twitter",),
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 2,
+            "network": self.network
+        }
+        for retriever, searches in (
+                (self.retriever, 1),
+                (OGRe(keys=self.retriever.keychain, coalesce=False), 4)
+        ):
+            release = threading.Event()
+            api = self.blocked_api(release)
+            results = []
+            threads = [
+                threading.Thread(
+                    target=lambda results=results, retriever=retriever, api=api:
+                    results.append(retriever.fetch(api=api, **query))
+                )
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            while api().search.call_count + (
+                    0 if retriever.flights is None else retriever.flights.coalesced
+            ) < 4:  # Each caller is searching or waiting for a search.
+                threading.Event().wait(0.001)
+            release.set()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(searches, api().search.call_count)
+            self.assertEqual(4, len(results))
+            self.assertTrue(all(result == results[0] for result in results))
+            self.assertEqual(2, len(results[0]["features"]))
+            results[0]["features"][0]["properties"]["text"] = "changed"
+            self.assertFalse(any(
+                result["features"][0]["properties"]["text"] == "changed"
+                for result in results[1:]
+            ))
+        self.assertEqual(3, self.retriever.flights.coalesced)
+
+    def test_columnar(self):
+        """Columnar requests hold the same Features in NumPy arrays."""
+        self.log.debug("Testing columnar fetching...")
+        query = {
+            "sources": ("Twitter",),
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 2,
+            "api": self.api,
+            "network": self.network
+        }
+        with patch("ogre.columnar.numpy", None):
+            with self.assertRaises(ImportError):
+                self.retriever.fetch(columnar=True, **query)
+        if numpy is None:
+            return
+        limits = self.api().get_application_rate_limit_status.return_value
+        limits["resources"]["search"]["/search/tweets"]["remaining"] = 450
+        collection = self.retriever.fetch(columnar=True, **query)
+        self.assertIsInstance(collection, ColumnarCollection)
+        self.assertEqual(2, len(collection))
+        self.assertEqual(self.retriever.fetch(**query), collection.to_geojson())
+        self.assertEqual(
+            [status["id"] for status in self.tweets["statuses"][:2]],
+            collection.ids.tolist()
+        )
+
+    def test_pool(self):
+        """Retrievers make requests through (and close) their pool."""
+        self.log.debug("Testing connection pooling...")
+        pool = ConnectionPool(api=self.api)
+        with OGRe(keys=self.retriever.keychain, pool=pool) as retriever:
+            retriever.fetch(
+                sources=("Twitter",),
+                media=("text",),
+                keyword="test",
+                quantity=2
+            )
+            self.assertEqual(1, self.api().search.call_count)
+            self.assertEqual(1, len(pool.sessions))
+        self.assertEqual({}, pool.sessions)
@@ -0,0 +1,151 @@
+"""
+OGRe Search Cache Tests
+
+:class:`SearchCacheTest` -- search cache test template
+
+:class:`RangeCacheTest` -- range cache test template
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from ogre.cache import RangeCache, SearchCache
+
+
+class SearchCacheTest(unittest.TestCase):
+
+    """
+    Create objects that test the OGRe search cache.
+
+    These tests should make sure fresh responses are found in either tier
+    and that stale or evicted ones are not.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on the OGRe search cache."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a SearchCacheTest...")
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "searches.sqlite")
+        self.params = [
+            {"q": "test", "count": 15, "geocode": None, "since_id": None, "max_id": i}
+            for i in range(4)
+        ]
+        self.responses = [{"statuses": [{"id": i}]} for i in range(4)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_memory(self):
+        """Responses are found until they are stale or evicted."""
+        self.log.debug("Testing the memory tier...")
+        cache = SearchCache(capacity=2)
+        self.assertEqual(None, cache.get(self.params[0]))
+        cache.put(self.params[0], self.responses[0])
+        cache.put(self.params[1], self.responses[1])
+        self.assertEqual(self.responses[0], cache.get(dict(self.params[0])))
+        cache.put(self.params[2], self.responses[2])
+        self.assertEqual(None, cache.get(self.params[1]))
+        self.assertEqual(self.responses[0], cache.get(self.params[0]))
+        self.assertEqual(self.responses[2], cache.get(self.params[2]))
+        self.assertEqual((3, 2), (cache.hits, cache.misses))
+        cache.clear()
+        self.assertEqual(None, cache.get(self.params[0]))
+
+        cache = SearchCache(ttl=0)
+        cache.put(self.params[0], self.responses[0])
+        self.assertEqual(None, cache.get(self.params[0]))
+
+    def test_disk(self):
+        """Responses outlive the cache that put them on disk."""
+        self.log.debug("Testing the disk tier...")
+        cache = SearchCache(path=self.path, capacity=1, disk_capacity=2)
+        for params, response in zip(self.params, self.responses):
+            cache.put(params, response)
+        cache = SearchCache(path=self.path)
+        self.assertEqual(None, cache.get(self.params[0]))
+        self.assertEqual(None, cache.get(self.params[1]))
+        self.assertEqual(self.responses[2], cache.get(self.params[2]))
+        self.assertEqual(self.responses[3], cache.get(self.params[3]))
+        self.assertEqual((2, 2), (cache.hits, cache.misses))
+        cache = SearchCache(path=self.path, ttl=0)
+        cache.put(self.params[0], self.responses[0])
+        self.assertEqual(None, SearchCache(path=self.path).get(self.params[0]))
+
+
+class RangeCacheTest(unittest.TestCase):
+
+    """
+    Create objects that test the OGRe range cache.
+
+    These tests should make sure only the gaps between cached ranges
+    are left to fetch and that cached Features are found by their ID.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on the OGRe range cache."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a RangeCacheTest...")
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "ranges.sqlite")
+        self.params = {"q": "test", "geocode": None, "kinds": ["text"]}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def feature(self, tweet_id):
+        """Imitate the Feature of a Tweet."""
+        return tweet_id, {"properties": {"text": str(tweet_id), "image": b"dGVzdA=="}}
+
+    def test_segments(self):
+        """Ranges are split into cached ranges and gaps (newest first)."""
+        self.log.debug("Testing range segments...")
+        cache = RangeCache()
+        self.assertEqual([(0, 100, False)], cache.segments(self.params, 0, 100))
+        cache.put(self.params, 20, 30, [])
+        cache.put(self.params, 50, 60, [])
+        self.assertEqual(
+            [
+                (60, 100, False),
+                (50, 60, True),
+                (30, 50, False),
+                (20, 30, True),
+                (0, 20, False)
+            ],
+            cache.segments(self.params, 0, 100)
+        )
+        self.assertEqual(
+            [(50, 55, True), (30, 50, False), (25, 30, True)],
+            cache.segments(self.params, 25, 55)
+        )
+        self.assertEqual(
+            [(40, 45, False)],
+            cache.segments(dict(self.params, q="other"), 40, 45)
+        )
+        cache.put(self.params, 30, 50, [])
+        self.assertEqual(
+            [(60, 100, False), (20, 60, True), (0, 20, False)],
+            cache.segments(self.params, 0, 100)
+        )
+        self.assertEqual((5, 8), (cache.hits, cache.misses))
+        cache.clear()
+        self.assertEqual([(0, 100, False)], cache.segments(self.params, 0, 100))
+
+    def test_features(self):
+        """Cached Features are found by ID (and outlive a cache on disk)."""
+        self.log.debug("Testing range features...")
+        cache = RangeCache(path=self.path)
+        cache.put(self.params, 0, 10, [self.feature(i) for i in (3, 7, 9)])
+        cache = RangeCache(path=self.path)
+        self.assertEqual([(0, 10, True)], cache.segments(self.params, 0, 10))
+        self.assertEqual(
+            [self.feature(i) for i in (9, 7, 3)],
+            cache.features(self.params, 0, 10)
+        )
+        self.assertEqual(
+            [self.feature(i) for i in (7,)],
+            cache.features(self.params, 3, 8, limit=1)
+        )
+        self.assertEqual([], cache.features(dict(self.params, q="other"), 0, 10))
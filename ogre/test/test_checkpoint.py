@@ -0,0 +1,88 @@
+"""
+OGRe Checkpoint Tests
+
+:class:`CheckpointTest` -- checkpoint test template
+"""
+
+import io
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from ogre.checkpoint import Checkpoint
+
+
+class CheckpointTest(unittest.TestCase):
+
+    """
+    Create objects that test OGRe checkpoints.
+
+    These tests should make sure saved pages are resumed from
+    unless they belong to another query or were cut off.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on OGRe checkpoints."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a CheckpointTest...")
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "query.checkpoint")
+        self.query = ["Twitter", ["text"], "test", 3, None, [None, None]]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_resume(self):
+        """Saved pages are resumed from by the same query only."""
+        self.log.debug("Testing checkpoint resumption...")
+        checkpoint = Checkpoint(self.path, self.query)
+        self.assertEqual(([], None, 0, False), (
+            checkpoint.features,
+            checkpoint.cursor,
+            checkpoint.pages,
+            checkpoint.finished
+        ))
+        checkpoint.save([{"id": 3}], 2, [3])
+        checkpoint.save([{"id": 2}], 1)
+        checkpoint.close()
+
+        checkpoint = Checkpoint(self.path, tuple(self.query))
+        self.assertEqual(([{"id": 3}, {"id": 2}], [3, None], 1, 2, False), (
+            checkpoint.features,
+            checkpoint.ids,
+            checkpoint.cursor,
+            checkpoint.pages,
+            checkpoint.finished
+        ))
+        image = {"properties": {"image": b"dGVzdA=="}}
+        checkpoint.save([image], None)
+        checkpoint.close()
+        checkpoint = Checkpoint(self.path, self.query)
+        self.assertTrue(checkpoint.finished)
+        self.assertEqual(image, checkpoint.features[-1])
+        checkpoint.close()
+
+        checkpoint = Checkpoint(self.path, self.query[:3]+[4]+self.query[4:])
+        self.assertEqual(([], 0), (checkpoint.features, checkpoint.pages))
+        checkpoint.discard()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_cut_off(self):
+        """Pages cut off while they were saved are forgotten."""
+        self.log.debug("Testing cut off checkpoints...")
+        checkpoint = Checkpoint(self.path, self.query)
+        checkpoint.save([{"id": 3}], 2)
+        checkpoint.close()
+        with io.open(self.path, "ab") as checkpoint_file:
+            checkpoint_file.write(b'{"max_id": 1, "featu')
+        checkpoint = Checkpoint(self.path, self.query)
+        self.assertEqual(([{"id": 3}], 2), (checkpoint.features, checkpoint.cursor))
+        checkpoint.save([{"id": 2}], None)
+        checkpoint.close()
+        checkpoint = Checkpoint(self.path, self.query)
+        self.assertEqual(
+            ([{"id": 3}, {"id": 2}], True),
+            (checkpoint.features, checkpoint.finished)
+        )
+        checkpoint.close()
@@ -4,11 +4,16 @@
 
 from __future__ import absolute_import
 
+import gzip
+import io
+import json
 import random
 
 import pytest
 
 import ogre.cli
+from ogre.limits import RateLimit
+from ogre.seen import SeenIds
 
 
 @pytest.fixture
@@ -73,3 +78,137 @@ def test_invalid_log(source):
     with pytest.raises(AttributeError) as excinfo:
         ogre.cli.main(['-s', source, '--log', 'invalid'])
     assert excinfo.value != 0
+
+
+FEATURES = [{"type": "Feature", "properties": {"id": i}} for i in range(2)]
+
+
+class Retriever(object):  # pylint: disable=too-few-public-methods
+    """Imitate OGRe."""
+
+    def __init__(self, keys, rate_limit=None, pool=None):
+        self.keys = keys
+        self.rate_limit = RateLimit() if rate_limit is None else rate_limit
+        self.pool = pool
+        self.closed = False
+
+    def iter_features(self, **_):  # pylint: disable=no-self-use
+        """Generate some Features."""
+        return iter(FEATURES)
+
+    def close(self):
+        """Close the connections of the retriever."""
+        self.closed = True
+
+
+@pytest.mark.parametrize("style, prefix", [("ndjson", ""), ("seq", "\x1e")])
+def test_format(monkeypatch, capsys, source, style, prefix):
+    """Test streaming output formats."""
+    monkeypatch.setattr(ogre.cli, "OGRe", Retriever)
+    ogre.cli.main(['-s', source, '--format', style])
+    assert capsys.readouterr()[0] == "".join(
+        prefix+json.dumps(feature, separators=(",", ":"))+"\n"
+        for feature in FEATURES
+    )
+
+
+def test_json(monkeypatch, capsys, source):
+    """Test FeatureCollection output."""
+    monkeypatch.setattr(ogre.cli, "OGRe", Retriever)
+    ogre.cli.main(['-s', source])
+    assert capsys.readouterr()[0] == json.dumps(
+        {"type": "FeatureCollection", "features": FEATURES},
+        indent=4,
+        separators=(",", ": "),
+    )+"\n"
+
+
+@pytest.mark.parametrize("name, opener", [("out.json", io.open), ("out.json.gz", gzip.open)])
+def test_output(monkeypatch, tmpdir, source, name, opener):
+    """Test writing to (compressed) files."""
+    monkeypatch.setattr(ogre.cli, "OGRe", Retriever)
+    path = str(tmpdir.join(name))
+    ogre.cli.main(['-s', source, '-o', path, '-f', 'ndjson'])
+    with opener(path, "rb") as output:
+        assert [json.loads(line.decode("utf-8")) for line in output] == FEATURES
+
+
+def test_follow_json(source):
+    """Test following without a streaming format."""
+    with pytest.raises(SystemExit) as excinfo:
+        ogre.cli.main(['-s', source, '--follow'])
+    assert excinfo.value != 0
+
+
+def test_rate_limits(monkeypatch, tmpdir, source):
+    """Test keeping rate limits between runs."""
+    monkeypatch.setattr(ogre.cli, "OGRe", Retriever)
+    path = str(tmpdir.join("limits.json"))
+    limits = RateLimit()
+    limits.key("key").update(5, 1234567890)
+    limits.save(path)
+    ogre.cli.main(['-s', source, '--rate-limits', path])
+    assert RateLimit.load(path).key("key").remaining == 5
+
+
+def test_timeout(monkeypatch, source):
+    """Test pooling connections with a timeout (and closing them)."""
+    retrievers = []
+
+    def retriever(*args, **kwargs):
+        """Keep track of the retriever."""
+        retrievers.append(Retriever(*args, **kwargs))
+        return retrievers[-1]
+
+    monkeypatch.setattr(ogre.cli, "OGRe", retriever)
+    ogre.cli.main(['-s', source, '--timeout', '2.5'])
+    assert retrievers[0].pool.timeout == 2.5
+    assert retrievers[0].closed
+
+
+def test_image_mode(monkeypatch, tmpdir, source):
+    """Test relaying image modes (and requiring a directory for files)."""
+    queries = []
+
+    class Recorder(Retriever):  # pylint: disable=too-few-public-methods
+        """Record the query made."""
+
+        def iter_features(self, **kwargs):
+            queries.append(kwargs)
+            return iter(FEATURES)
+
+    monkeypatch.setattr(ogre.cli, "OGRe", Recorder)
+    ogre.cli.main(['-s', source, '--image-mode', 'url'])
+    ogre.cli.main(['-s', source, '--image-mode', 'file', '--image-directory', str(tmpdir)])
+    assert [(query["image_mode"], query["image_directory"]) for query in queries] == [
+        ("url", None),
+        ("file", str(tmpdir)),
+    ]
+    for argv in (
+            ['--image-mode', 'file'],
+            ['--image-directory', str(tmpdir)],
+            ['--image-mode', 'invalid'],
+    ):
+        with pytest.raises(SystemExit) as excinfo:
+            ogre.cli.main(['-s', source]+argv)
+        assert excinfo.value != 0
+
+
+def test_seen(monkeypatch, tmpdir, source):
+    """Test keeping the IDs of results between runs."""
+    queries = []
+
+    class Recorder(Retriever):  # pylint: disable=too-few-public-methods
+        """Record the query made (and see a Tweet)."""
+
+        def iter_features(self, **kwargs):
+            queries.append(kwargs)
+            kwargs["seen"].add(len(queries))
+            return iter(FEATURES)
+
+    monkeypatch.setattr(ogre.cli, "OGRe", Recorder)
+    path = str(tmpdir.join("seen"))
+    ogre.cli.main(['-s', source, '--seen', path])
+    ogre.cli.main(['-s', source, '--seen', path])
+    assert 1 in queries[1]["seen"]
+    assert len(SeenIds(path)) == 2
@@ -0,0 +1,102 @@
+# coding: utf-8
+
+"""
+OGRe Columnar Collection Tests
+
+:class:`ColumnarCollectionTest` -- columnar collection test template
+"""
+
+import logging
+import unittest
+from mock import patch
+from ogre.columnar import ColumnarCollection, numpy
+from ogre.feature import Feature
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed.")
+class ColumnarCollectionTest(unittest.TestCase):
+
+    """
+    Create objects that test OGRe columnar collections.
+
+    These tests should make sure columns hold the same Features
+    as the GeoJSON FeatureCollections they are made from.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on OGRe columnar collections."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a ColumnarCollectionTest...")
+        self.features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [-122.4+i, 37.8-i]},
+                "properties": {
+                    "source": "Twitter",
+                    "time": "2014-01-01T00:00:0"+str(i)+(".123000Z" if i else "Z")
+                }
+            }
+            for i in range(4)
+        ]
+        self.features[1]["properties"]["text"] = u"café"
+        self.features[2]["properties"]["image"] = b"dGVzdA=="
+
+    def test_geojson(self):
+        """Columns round-trip to the same GeoJSON Features."""
+        self.log.debug("Testing columnar conversion...")
+        collection = ColumnarCollection.from_features(self.features)
+        self.assertEqual(4, len(collection))
+        self.assertEqual(
+            {"type": "FeatureCollection", "features": self.features},
+            collection.to_geojson()
+        )
+        self.assertEqual(self.features, list(collection))
+        self.assertEqual(self.features[2], collection[2])
+        self.assertEqual(numpy.float64, collection.longitudes.dtype)
+        self.assertEqual(numpy.int64, collection.ids.dtype)
+        self.assertEqual(
+            [1388534400000, 1388534401123, 1388534402123, 1388534403123],
+            collection.times.tolist()
+        )
+        self.assertEqual([0, 0, 0, 0], collection.ids.tolist())
+        compact = ColumnarCollection.from_features([
+            Feature.from_geojson(feature, tweet_id=10+i)
+            for i, feature in enumerate(self.features)
+        ])
+        self.assertEqual(collection.to_geojson(), compact.to_geojson())
+        self.assertEqual([10, 11, 12, 13], compact.ids.tolist())
+        self.assertEqual([11, 12], compact[1:3].ids.tolist())  # pylint: disable=no-member
+        self.assertEqual([10, 0], (compact[:1]+collection[:1]).ids.tolist())
+        self.assertEqual(0, len(ColumnarCollection.from_features([])))
+        with self.assertRaises(ValueError):
+            ColumnarCollection([0], [0], [], [], [], [])
+
+    def test_selection(self):
+        """Masks, slices and concatenation select the same Features."""
+        self.log.debug("Testing columnar selection...")
+        collection = ColumnarCollection.from_features(self.features)
+        self.assertEqual(
+            self.features[2:],
+            collection[collection.latitudes < 36.5].to_geojson()["features"]
+        )
+        self.assertEqual(
+            [self.features[1]],
+            collection[collection.texts != numpy.array(None)].to_geojson()["features"]
+        )
+        self.assertEqual(self.features[1:3], list(collection[1:3]))
+        self.assertEqual(
+            self.features[:1]+self.features,
+            list(collection[:1]+collection)
+        )
+        self.assertEqual(
+            self.features,
+            list(ColumnarCollection.concatenate([collection[:2], collection[2:]]))
+        )
+        self.assertEqual(0, len(ColumnarCollection.concatenate([])))
+
+    def test_numpy_missing(self):
+        """Columnar collections say how to install NumPy if it is missing."""
+        self.log.debug("Testing columnar collections without NumPy...")
+        with patch("ogre.columnar.numpy", None):
+            with self.assertRaises(ImportError):
+                ColumnarCollection.from_features(self.features)
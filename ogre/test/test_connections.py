@@ -0,0 +1,131 @@
+"""
+OGRe Connection Pooling Tests
+
+:class:`ConnectionPoolTest` -- connection pool test template
+"""
+
+import logging
+import socket
+import threading
+import time
+import unittest
+
+import requests
+from ogre.connections import ConnectionPool
+from ogre.media import _chunks
+
+from future.standard_library import hooks
+with hooks():
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # pylint: disable=import-error
+    from socketserver import ThreadingMixIn  # pylint: disable=import-error
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    """Serve images over keep-alive connections."""
+
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    """Serve an image (or an error, or nothing for a while)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Respond according to the path requested."""
+        self.server.connections.add(self.client_address)
+        if self.path == "/slow":
+            time.sleep(0.5)
+        status = 404 if self.path == "/missing" else 200
+        body = b"test_image"*1000
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+
+class _Client(object):  # pylint: disable=too-few-public-methods
+
+    """Imitate a Twython client."""
+
+    def __init__(self, app_key, access_token=None, client_args=None):
+        self.app_key = app_key
+        self.access_token = access_token
+        self.client_args = client_args
+        self.client = requests.Session()
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    """
+    Create objects that test OGRe connection pools.
+
+    These tests should make sure connections are reused between requests
+    and that each thread gets its own API client.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on OGRe connection pools."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a ConnectionPoolTest...")
+        self.server = _Server(("127.0.0.1", 0), _Handler)
+        self.server.connections = set()
+        threading.Thread(target=self.server.serve_forever).start()
+        self.url = "http://127.0.0.1:"+str(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_api(self):
+        """Threads get their own API clients on shared sessions."""
+        self.log.debug("Testing pooled API clients...")
+        pool = ConnectionPool(api=_Client, connections=3, timeout=5)
+        client = pool.api("key", access_token="token")
+        self.assertIs(client, pool.api("key", access_token="token"))
+        self.assertEqual({"timeout": 5}, client.client_args)
+        self.assertEqual(
+            3,
+            client.client.get_adapter("https://")
+            .poolmanager.connection_pool_kw["maxsize"]
+        )
+        other = []
+        thread = threading.Thread(
+            target=lambda: other.append(pool.api("key", access_token="token"))
+        )
+        thread.start()
+        thread.join()
+        self.assertIsNot(client, other[0])
+        self.assertIs(client.client, other[0].client)
+        self.assertIsNot(client.client, pool.api("other", access_token="token").client)
+        pool.close()
+        self.assertEqual({}, pool.sessions)
+        self.assertIsNot(client, pool.api("key", access_token="token"))
+
+    def test_network(self):
+        """Images are downloaded in chunks over kept-alive connections."""
+        self.log.debug("Testing pooled image downloads...")
+        pool = ConnectionPool(image_connections=1, timeout=0.2)
+        for _ in range(3):
+            self.assertEqual(
+                b"test_image"*1000,
+                b"".join(_chunks(pool.network(self.url+"/image")))
+            )
+        self.assertEqual(1, len(self.server.connections))
+        with self.assertRaises(requests.exceptions.HTTPError):
+            pool.network(self.url+"/missing")
+        with self.assertRaises(socket.timeout):
+            pool.network(self.url+"/slow")
+        self.assertEqual(
+            b"test_image"*1000,
+            b"".join(_chunks(pool.network(self.url+"/slow", timeout=5)))
+        )
+        self.assertEqual({}, pool.sessions)
+        self.assertIsNotNone(pool.image_session)
+        pool.close()
+        self.assertIsNone(pool.image_session)
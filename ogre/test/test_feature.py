@@ -0,0 +1,108 @@
+# coding: utf-8
+
+"""
+OGRe Compact Feature Tests
+
+:class:`FeatureTest` -- compact Feature test template
+"""
+
+import json
+import logging
+import sys
+import unittest
+from io import StringIO
+from ogre.feature import Feature, serializable
+from ogre.output import write_sequence
+
+
+def footprint(value):
+    """Measure the memory held by a Feature (apart from its strings)."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value)+sum(footprint(item) for item in value.values())
+    if isinstance(value, list):
+        return sys.getsizeof(value)+sum(footprint(item) for item in value)
+    if isinstance(value, Feature):
+        return sys.getsizeof(value)+footprint(value.longitude)+footprint(value.latitude)
+    if isinstance(value, float):
+        return sys.getsizeof(value)
+    return 0
+
+
+class FeatureTest(unittest.TestCase):
+
+    """
+    Create objects that test compact Features.
+
+    These tests should make sure compact Features are equivalent to
+    the GeoJSON Features they hold and that they take less memory.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on compact Features."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a FeatureTest...")
+        self.geojson = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [-122.4, 37.8]},
+            "properties": {
+                "source": "Twitter",
+                "time": "2014-01-01T00:00:00.123000Z",
+                "text": u"café",
+                "image": b"dGVzdA=="
+            }
+        }
+
+    def test_geojson(self):
+        """Compact Features round-trip and compare equal to their GeoJSON."""
+        self.log.debug("Testing compact Feature conversion...")
+        feature = Feature.from_geojson(self.geojson)
+        self.assertEqual(self.geojson, feature.to_geojson())
+        self.assertTrue(feature == self.geojson)
+        self.assertTrue(self.geojson == feature)
+        self.assertFalse(feature != self.geojson)
+        self.assertEqual(feature, Feature.from_geojson(self.geojson))
+        del self.geojson["properties"]["image"]
+        self.assertNotEqual(feature, self.geojson)
+        self.assertEqual(self.geojson, Feature.from_geojson(self.geojson))
+        self.assertEqual([self.geojson], [Feature.from_geojson(self.geojson)])
+        with self.assertRaises(AttributeError):
+            setattr(feature, "id", 1)
+        self.assertEqual(None, feature.tweet_id)
+        identified = Feature.from_geojson(self.geojson, tweet_id=1)
+        self.assertEqual(1, identified.tweet_id)
+        self.assertEqual(self.geojson, identified.to_geojson())
+        self.assertEqual(identified, Feature.from_geojson(self.geojson))
+        with self.assertRaises(TypeError):
+            hash(feature)
+        self.geojson["properties"]["id"] = 1
+        with self.assertRaises(ValueError):
+            Feature.from_geojson(self.geojson)
+
+    def test_memory(self):
+        """Compact Features take several times less memory."""
+        self.log.debug("Testing compact Feature memory use...")
+        self.assertLess(
+            3*footprint(Feature.from_geojson(self.geojson)),
+            footprint(self.geojson)
+        )
+
+    def test_serializable(self):
+        """Compact Features are serialized as their GeoJSON."""
+        self.log.debug("Testing compact Feature serialization...")
+        feature = Feature.from_geojson(self.geojson)
+        self.assertEqual(
+            json.dumps(self.geojson, default=serializable),
+            json.dumps(feature, default=serializable)
+        )
+        self.assertEqual(
+            u"dGVzdA==",
+            json.loads(json.dumps(feature, default=serializable))["properties"]["image"]
+        )
+        stream = StringIO()
+        write_sequence([feature], stream)
+        self.assertEqual(
+            json.loads(json.dumps(self.geojson, default=serializable)),
+            json.loads(stream.getvalue())
+        )
+        with self.assertRaises(TypeError):
+            json.dumps(object(), default=serializable)
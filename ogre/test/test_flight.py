@@ -0,0 +1,105 @@
+"""
+OGRe Request Coalescing Tests
+
+:class:`SingleFlightTest` -- request coalescing test template
+"""
+
+import logging
+import threading
+import unittest
+from ogre.flight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    """
+    Create objects that test OGRe request coalescing.
+
+    These tests should make sure identical concurrent calls are made once
+    and that their outcome is shared by every caller.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on OGRe request coalescing."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a SingleFlightTest...")
+        self.flights = SingleFlight()
+        self.release = threading.Event()
+        self.calls = []
+
+    def call(self, value):
+        """Wait to be released, then return (or raise) a value."""
+        self.calls.append(value)
+        self.release.wait()
+        if isinstance(value, Exception):
+            raise value
+        return [value]
+
+    def gather(self, key, value, callers):
+        """Make identical calls concurrently and collect their outcomes."""
+        outcomes = [None]*callers
+
+        def caller(index):
+            """Make a call and record its outcome."""
+            try:
+                outcomes[index] = self.flights.call(key, self.call, value)
+            except Exception as error:  # pylint: disable=broad-except
+                outcomes[index] = error
+
+        threads = [
+            threading.Thread(target=caller, args=(index,))
+            for index in range(callers)
+        ]
+        for thread in threads:
+            thread.start()
+        while self.flights.coalesced < callers-1:
+            threading.Event().wait(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.release.clear()
+        return outcomes
+
+    def test_key(self):
+        """Calls are identified by their parameters."""
+        self.log.debug("Testing call keys...")
+        state = {}
+        self.assertEqual(
+            SingleFlight.key("twitter", (1, 2), b=2, a=1),
+            SingleFlight.key("twitter", (1, 2), a=1, b=2)
+        )
+        self.assertNotEqual(
+            SingleFlight.key("twitter", (1, 2), a=1),
+            SingleFlight.key("twitter", (1, 3), a=1)
+        )
+        self.assertEqual(
+            SingleFlight.key("twitter", state=state),
+            SingleFlight.key("twitter", state=state)
+        )
+        self.assertNotEqual(
+            SingleFlight.key("twitter", state=state),
+            SingleFlight.key("twitter", state={})
+        )
+
+    def test_call(self):
+        """Identical concurrent calls are made once and share the result."""
+        self.log.debug("Testing call coalescing...")
+        outcomes = self.gather("test", 1, 5)
+        self.assertEqual([1], self.calls)
+        self.assertEqual([[1]]*5, outcomes)
+        self.assertEqual(5, len(set(id(outcome) for outcome in outcomes)))
+        outcomes[0].append(2)
+        self.assertEqual([[1]]*4, outcomes[1:])
+        self.assertEqual({}, self.flights.calls)
+
+        self.release.set()
+        self.assertEqual([2], self.flights.call("test", self.call, 2))
+        self.assertEqual([1, 2], self.calls)
+
+    def test_error(self):
+        """Every identical caller gets the exception of the call."""
+        self.log.debug("Testing shared exceptions...")
+        error = ValueError("test")
+        self.assertEqual([error]*3, self.gather("test", error, 3))
+        self.assertEqual([error], self.calls)
+        self.assertEqual({}, self.flights.calls)
@@ -0,0 +1,77 @@
+"""
+OGRe Geography Helper Tests
+
+:class:`GeographyTest` -- geography helper test template
+"""
+
+import logging
+import random
+import unittest
+from ogre.geography import cover, distance, subdivide
+
+
+class GeographyTest(unittest.TestCase):
+
+    """
+    Create objects that test the OGRe geography module.
+
+    These tests should make sure distances are accurate
+    and that coverings leave no gaps.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on the OGRe geography module."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a GeographyTest...")
+        self.random = random.Random(0)
+
+    def assert_covered(self, latitude, longitude, radius, unit, tiles):
+        """Check that random places in a circle are within some tile."""
+        for _ in range(500):
+            place = (
+                latitude+self.random.uniform(-1, 1)*radius/111.2,
+                longitude+self.random.uniform(-1, 1)*radius/111.2
+            )
+            if distance(latitude, longitude, place[0], place[1], unit) > radius:
+                continue
+            self.assertTrue(
+                any(
+                    distance(tile[0], tile[1], place[0], place[1], unit) <=
+                    tile[2]*1.001
+                    for tile in tiles
+                )
+            )
+
+    def test_distance(self):
+        """Great-circle distances are accurate."""
+        self.log.debug("Testing distance...")
+        self.assertEqual(0, distance(37.78, -122.40, 37.78, -122.40))
+        self.assertAlmostEqual(
+            111.2,
+            distance(0, 0, 1, 0),
+            places=1
+        )
+        self.assertAlmostEqual(
+            distance(0, 0, 1, 0, "km")/1.609344,
+            distance(0, 0, 1, 0, "mi"),
+            places=3
+        )
+
+    def test_cover(self):
+        """Tiles cover the whole circle."""
+        self.log.debug("Testing cover...")
+        self.assertEqual(
+            [(37.78, -122.4, 5, "km")],
+            cover(37.78, -122.4, 5, "km", 10)
+        )
+        tiles = cover(37.78, -122.4, 10, "km", 2)
+        self.assertTrue(all(tile[2] == 2 for tile in tiles))
+        self.assert_covered(37.78, -122.4, 10, "km", tiles)
+
+    def test_subdivide(self):
+        """7 tiles of half the radius cover the whole circle."""
+        self.log.debug("Testing subdivide...")
+        tiles = subdivide(37.78, -122.4, 4, "mi")
+        self.assertEqual(7, len(tiles))
+        self.assertTrue(all(tile[2] == 2 for tile in tiles))
+        self.assert_covered(37.78, -122.4, 4, "mi", tiles)
@@ -0,0 +1,129 @@
+"""
+OGRe Rate Limit Tracker Tests
+
+:class:`RateLimitTest` -- rate limit tracker test template
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from ogre.limits import RateLimit
+
+
+class RateLimitTest(unittest.TestCase):
+
+    """
+    Create objects that test the OGRe rate limit tracker.
+
+    These tests should make sure budgets are never overdrawn
+    and that shared budgets count the use of each sharer.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on the OGRe rate limit tracker."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a RateLimitTest...")
+
+    def test_take(self):
+        """Queries are only granted while the budget lasts."""
+        self.log.debug("Testing rate limit consumption...")
+        rate_limit = RateLimit()
+        self.assertTrue(rate_limit.take())
+        rate_limit.update(2, 1234567890)
+        self.assertTrue(rate_limit.take())
+        self.assertTrue(rate_limit.take())
+        self.assertFalse(rate_limit.take())
+        self.assertEqual(0, rate_limit.remaining)
+        self.assertEqual(1234567890, rate_limit.reset)
+        self.assertEqual(3, rate_limit.used)
+
+    def test_share(self):
+        """Shared budgets are drawn from concurrently without overdrafts."""
+        self.log.debug("Testing shared rate limits...")
+        rate_limit = RateLimit()
+        calls = []
+        meters = [rate_limit.share() for _ in range(8)]
+
+        def draw(meter):
+            """Draw from the budget until it runs out."""
+            meter.refresh(lambda: calls.append(None) or (100, 1234567890))
+            while meter.take():
+                pass
+
+        threads = [threading.Thread(target=draw, args=(meter,)) for meter in meters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(calls))
+        self.assertEqual(0, rate_limit.remaining)
+        self.assertEqual(100, sum(meter.used for meter in meters))
+
+    def test_stale(self):
+        """Budgets are only requested again once they reset."""
+        self.log.debug("Testing stale rate limits...")
+        rate_limit = RateLimit()
+        calls = []
+
+        def status():
+            """Report a budget that resets soon."""
+            calls.append(None)
+            return 10, time.time()+0.05
+
+        rate_limit.refresh(status)
+        rate_limit.refresh(status)
+        self.assertFalse(rate_limit.stale)
+        self.assertEqual(1, len(calls))
+        time.sleep(0.1)
+        self.assertTrue(rate_limit.share().stale)
+        rate_limit.refresh(status)
+        self.assertEqual(2, len(calls))
+        rate_limit.update(10, 1234567890)
+        self.assertFalse(rate_limit.stale)
+
+    def test_persistence(self):
+        """The budgets of keys are saved and loaded without secrets."""
+        self.log.debug("Testing rate limit persistence...")
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "limits.json")
+            self.assertEqual({}, RateLimit.load(path).keys)
+            rate_limit = RateLimit()
+            rate_limit.key("a").update(5, 1234567890)
+            rate_limit.key("b")
+            rate_limit.save(path)
+            rate_limit.save(path)
+            loaded = RateLimit.load(path)
+            self.assertEqual(["a"], list(loaded.keys))
+            self.assertEqual(5, loaded.key("a").remaining)
+            self.assertEqual(1234567890, loaded.key("a").reset)
+            self.assertEqual(["limits.json"], os.listdir(directory))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_persisted_reset(self):
+        """Budgets saved before they reset are stale once loaded after it."""
+        self.log.debug("Testing persisted rate limit resets...")
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "limits.json")
+            rate_limit = RateLimit()
+            rate_limit.key("a").update(0, time.time()+0.05)
+            rate_limit.save(path)
+            self.assertFalse(RateLimit.load(path).key("a").stale)
+            time.sleep(0.1)
+            loaded = RateLimit.load(path).key("a")
+            self.assertTrue(loaded.stale)
+            self.assertFalse(loaded.take())
+            loaded.refresh(lambda: (10, time.time()+900))
+            self.assertTrue(loaded.take())
+
+            with open(path, "w") as budget_file:
+                budget_file.write('{"keys": {"a": {"remaining": 0, "reset": 1234567890}}}')
+            self.assertTrue(RateLimit.load(path).key("a").stale)
+        finally:
+            shutil.rmtree(directory)
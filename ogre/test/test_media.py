@@ -0,0 +1,211 @@
+"""
+OGRe Media Retrieval Tests
+
+:class:`MediaTest` -- media retrieval test template
+"""
+
+import base64
+import io
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from mock import MagicMock
+from ogre.exceptions import OGReLimitError
+from ogre.media import (
+    ByteBudget,
+    ImageEncoder,
+    ImageStore,
+    RawImage,
+    _reencode,
+    _restore,
+    _text,
+    retrieve_image,
+    retrieve_images,
+)
+
+
+class MediaTest(unittest.TestCase):
+
+    """
+    Create objects that test the OGRe media module.
+
+    These tests should make sure images are encoded correctly in chunks
+    and that no image exceeds its limits.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on the OGRe media module."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a MediaTest...")
+        self.image = os.urandom(200000)
+        self.modifiers = {
+            "fail_hard": False,
+            "host_connections": 4,
+            "image_budget": ByteBudget(),
+            "image_max_bytes": None,
+            "image_store": None,
+            "image_timeout": None,
+            "image_workers": 8,
+            "network": MagicMock(side_effect=lambda *_, **__: io.BytesIO(self.image))
+        }
+
+    def test_image_encoder(self):
+        """Chunks of any size encode to the same base64 as the whole image."""
+        self.log.debug("Testing incremental encoding...")
+        for size in (1, 2, 1000, 65537):
+            encoder = ImageEncoder(self.modifiers)
+            for start in range(0, len(self.image), size):
+                encoder.feed(self.image[start:start+size])
+            self.assertEqual(base64.b64encode(self.image), encoder.finish())
+        encoder = ImageEncoder(self.modifiers)
+        encoder.feed(u"test_")
+        encoder.feed(u"image")
+        self.assertEqual(base64.b64encode(b"test_image"), encoder.finish())
+
+    def test_retrieve_image(self):
+        """Images are retrieved in chunks within their limits."""
+        self.log.debug("Testing image retrieval...")
+        self.assertEqual(
+            base64.b64encode(self.image),
+            retrieve_image("https://example.com/0", self.modifiers)
+        )
+        self.modifiers["network"].assert_called_once_with("https://example.com/0")
+
+        self.modifiers["image_timeout"] = 5
+        self.modifiers["network"].reset_mock()
+        retrieve_image("https://example.com/0", self.modifiers)
+        self.modifiers["network"].assert_called_once_with(
+            "https://example.com/0",
+            timeout=5
+        )
+
+        self.modifiers["network"].side_effect = socket.timeout
+        with self.assertRaises(OGReLimitError):
+            retrieve_image("https://example.com/0", self.modifiers)
+
+        self.modifiers["image_timeout"] = None
+        self.modifiers["image_max_bytes"] = len(self.image)-1
+        response = MagicMock()
+        response.read.side_effect = lambda size: self.image[:size]
+        self.modifiers["network"].side_effect = lambda _: response
+        with self.assertRaises(OGReLimitError):
+            retrieve_image("https://example.com/0", self.modifiers)
+        self.assertLess(response.read.call_count, 10)
+        response.close.assert_called_once_with()
+
+    def test_retrieve_images(self):
+        """Images beyond the limits of a request are abandoned."""
+        self.log.debug("Testing limited image retrieval...")
+        urls = ["https://example.com/"+str(i) for i in range(4)]
+        self.modifiers["image_budget"] = ByteBudget(2*len(self.image))
+        self.modifiers["image_workers"] = 1
+        self.assertEqual(
+            [base64.b64encode(self.image)]*2+[None]*2,
+            retrieve_images(urls, self.modifiers)
+        )
+        self.modifiers["image_budget"] = ByteBudget()
+        self.modifiers["image_max_bytes"] = len(self.image)-1
+        self.assertEqual([None]*4, retrieve_images(urls, self.modifiers))
+        self.modifiers["fail_hard"] = True
+        with self.assertRaises(OGReLimitError):
+            retrieve_images(urls, self.modifiers)
+
+    def test_image_store(self):
+        """Stored images are not downloaded again, and duplicates share storage."""
+        self.log.debug("Testing image storage...")
+        directory = tempfile.mkdtemp()
+        try:
+            store = ImageStore(directory, max_bytes=2*len(self.image))
+            self.modifiers["image_store"] = store
+            for url in ("https://example.com/0", "https://example.net/0"):
+                self.assertEqual(
+                    base64.b64encode(self.image),
+                    retrieve_image(url, self.modifiers)
+                )
+            self.assertEqual(2, self.modifiers["network"].call_count)
+            self.assertEqual(len(self.image), store.size)
+
+            self.modifiers["image_store"] = ImageStore(directory)
+            self.assertEqual(
+                base64.b64encode(self.image),
+                retrieve_image("https://example.com/0", self.modifiers)
+            )
+            self.assertEqual(2, self.modifiers["network"].call_count)
+            self.assertEqual(1, self.modifiers["image_store"].hits)
+
+            self.modifiers["image_store"] = store
+            images = [os.urandom(len(self.image)) for _ in range(3)]
+            for i, image in enumerate(images):
+                self.modifiers["network"].side_effect = \
+                    lambda _, image=image: io.BytesIO(image)
+                retrieve_image("https://example.org/"+str(i), self.modifiers)
+            self.assertLessEqual(store.size, 2*len(self.image))
+            self.assertEqual(None, store.open("https://example.com/0"))
+            with store.open("https://example.org/2") as image:
+                self.assertEqual(images[2], image.read())
+
+            self.modifiers["image_max_bytes"] = 1
+            self.modifiers["network"].reset_mock()
+            with self.assertRaises(OGReLimitError):
+                retrieve_image("https://example.org/3", self.modifiers)
+            self.assertEqual(None, store.open("https://example.org/3"))
+            self.assertEqual(
+                ["index.sqlite"],
+                [name for name in os.listdir(directory) if len(name) != 2]
+            )
+        finally:
+            shutil.rmtree(directory)
+
+    def test_image_mode(self):
+        """Images are referenced, written to files or kept raw as asked."""
+        self.log.debug("Testing image modes...")
+        self.modifiers["image_mode"] = "url"
+        self.assertEqual(
+            ["https://example.com/0.jpg"]*2,
+            retrieve_images(["https://example.com/0.jpg"]*2, self.modifiers)
+        )
+        self.assertEqual(0, self.modifiers["network"].call_count)
+
+        self.modifiers["image_mode"] = "bytes"
+        image = retrieve_image("https://example.com/0.jpg", self.modifiers)
+        self.assertIsInstance(image, RawImage)
+        self.assertEqual(self.image, image.data)
+        self.assertEqual(RawImage(self.image), image)
+        self.assertNotIsInstance(image, bytes)
+        self.assertEqual(base64.b64encode(self.image).decode("ascii"), _text(image))
+
+        directory = tempfile.mkdtemp()
+        try:
+            self.modifiers["image_mode"] = "file"
+            self.modifiers["image_directory"] = os.path.join(directory, "images")
+            paths = retrieve_images(
+                ["https://example.com/0.jpg", "https://example.net/1.jpg"],
+                self.modifiers
+            )
+            self.assertEqual(1, len(set(paths)))
+            self.assertTrue(paths[0].endswith(".jpg"))
+            with open(paths[0], "rb") as image:
+                self.assertEqual(self.image, image.read())
+            self.modifiers["image_max_bytes"] = 1
+            with self.assertRaises(OGReLimitError):
+                retrieve_image("https://example.org/2.jpg", self.modifiers)
+            self.assertEqual(
+                [os.path.basename(paths[0])],
+                os.listdir(self.modifiers["image_directory"])
+            )
+        finally:
+            shutil.rmtree(directory)
+
+        for image_mode, image in (
+                ("base64", base64.b64encode(self.image)),
+                ("bytes", RawImage(self.image)),
+                ("url", u"https://example.com/0.jpg")
+        ):
+            feature = _restore({
+                "properties": {"image": json.loads(json.dumps(image, default=_text))}
+            })
+            self.assertEqual(image, _reencode(feature, image_mode)["properties"]["image"])
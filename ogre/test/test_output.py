@@ -0,0 +1,117 @@
+# coding: utf-8
+
+"""
+OGRe Output Writer Tests
+
+:class:`OutputTest` -- output writer test template
+"""
+
+import json
+import logging
+import threading
+import unittest
+from io import StringIO
+from ogre.output import write_collection, write_sequence
+
+
+class OutputTest(unittest.TestCase):
+
+    """
+    Create objects that test the OGRe output module.
+
+    These tests should make sure every format round-trips
+    and that Features are written as they are generated.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on the OGRe output module."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing an OutputTest...")
+        self.features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [i, -i]},
+                "properties": {"source": "Twitter", "text": u"café "+str(i)}
+            }
+            for i in range(3)
+        ]
+
+    def test_write_collection(self):
+        """FeatureCollections are written as json.dumps would write them."""
+        self.log.debug("Testing FeatureCollection writing...")
+        for features in ([], self.features[:1], self.features):
+            for indent in (2, 4):
+                stream = StringIO()
+                self.assertEqual(
+                    len(features),
+                    write_collection(iter(features), stream, indent=indent)
+                )
+                self.assertEqual(
+                    json.dumps(
+                        {"type": "FeatureCollection", "features": features},
+                        indent=indent,
+                        separators=(",", ": ")
+                    ),
+                    stream.getvalue()
+                )
+
+    def test_write_sequence(self):
+        """Sequences hold one compact Feature per record."""
+        self.log.debug("Testing sequence writing...")
+        stream = StringIO()
+        self.assertEqual(3, write_sequence(iter(self.features), stream))
+        lines = stream.getvalue().split(u"\n")
+        self.assertEqual(u"", lines.pop())
+        self.assertEqual(self.features, [json.loads(line) for line in lines])
+        self.assertNotIn(u" ", lines[0].split(u'"text"')[0])
+
+        stream = StringIO()
+        self.assertEqual(3, write_sequence(self.features, stream, style="seq"))
+        records = stream.getvalue().split(u"\x1e")
+        self.assertEqual(u"", records.pop(0))
+        self.assertTrue(all(record.endswith(u"\n") for record in records))
+        self.assertEqual(self.features, [json.loads(record) for record in records])
+
+        with self.assertRaises(ValueError):
+            write_sequence(self.features, StringIO(), style="invalid")
+
+    def test_streaming(self):
+        """Features are written (and the first one flushed) as they arrive."""
+        self.log.debug("Testing streamed writing...")
+        stream = StringIO()
+        flushes = []
+        stream.flush = lambda: flushes.append(stream.getvalue().count(u"\n"))
+
+        def features():
+            """Generate Features, checking what was written before each."""
+            for i, feature in enumerate(self.features):
+                self.assertEqual(i, stream.getvalue().count(u"\n"))
+                yield feature
+
+        write_sequence(features(), stream, flush_interval=3600)
+        self.assertEqual([1, 3], flushes)
+
+    def test_idle_flushing(self):
+        """Buffered Features are flushed while no more Features arrive."""
+        self.log.debug("Testing idle flushing...")
+        stream = StringIO()
+        flushes = []
+        flushed = threading.Event()
+
+        def flush():
+            """Record how many Features were flushed."""
+            flushes.append(stream.getvalue().count(u"\n"))
+            if flushes[-1] == len(self.features):
+                flushed.set()
+
+        stream.flush = flush
+
+        def features():
+            """Generate Features in a burst, then wait like a poll would."""
+            for feature in self.features:
+                yield feature
+            self.assertTrue(flushed.wait(10))
+
+        write_sequence(features(), stream, flush_interval=0.05)
+        self.assertEqual(1, flushes[0])
+        self.assertEqual(3, flushes[-1])
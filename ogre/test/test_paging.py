@@ -0,0 +1,467 @@
+"""
+OGRe Twitter Paging Tests
+
+:class:`PagingTest` -- Twitter paging test template
+"""
+
+import base64
+import copy
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from io import StringIO
+from mock import MagicMock
+from twython import TwythonRateLimitError
+from ogre.cache import SearchCache
+from ogre.exceptions import OGReLimitError
+from ogre.feature import Feature
+from ogre.limits import RateLimit
+from ogre.paging import _key_id
+from ogre.seen import SeenIds
+from ogre.Twitter import iter_twitter, twitter, sanitize_twitter
+from ogre.test.fixtures import twitter_timeline
+from ogre.test.test_twitter import twitter_limits
+
+
+class PagingTest(unittest.TestCase):
+
+    """
+    Create objects that test paging through Twitter searches.
+
+    These tests should make sure pages are requested, packaged and
+    recorded correctly (with any API keys, caches, and runtime modifiers).
+    """
+
+    def setUp(self):
+        """Prepare to run tests on Twitter paging."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a PagingTest...")
+        self.keys = {
+            "consumer_key": os.environ.get("TWITTER_CONSUMER_KEY"),
+            "access_token": os.environ.get("TWITTER_ACCESS_TOKEN")
+        }
+        with open("ogre/test/data/Twitter-response-example.json") as tweets:
+            self.tweets = json.load(tweets)
+        self.network = MagicMock(side_effect=lambda _: StringIO(u"test_image"))
+
+    def test_concurrent_image_retrieval(self):
+        """
+        Images on a page are downloaded concurrently.
+        Each host is limited to "host_connections" downloads at once.
+        Images are attached to the right Features.
+        """
+        self.log.debug("Testing concurrent image retrieval...")
+        tweets = copy.deepcopy(self.tweets)
+        tweets["search_metadata"].pop("next_results", None)
+        statuses = []
+        for i in range(6):
+            tweet = copy.deepcopy(self.tweets["statuses"][0])
+            tweet["entities"]["media"][0]["media_url_https"] = \
+                "https://host"+str(i % 2)+"/"+str(i)
+            statuses.append(tweet)
+        tweets["statuses"] = statuses
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(2, 1234567890)
+        api().search.return_value = tweets
+        lock = threading.Lock()
+        active = {"host0": 0, "host1": 0}
+        peak = {"host0": 0, "host1": 0}
+        paired = {"host0": threading.Event(), "host1": threading.Event()}
+
+        def network(url):
+            """Download an image once another from its host is downloading."""
+            host = url.split("/")[2]
+            with lock:
+                active[host] += 1
+                peak[host] = max(peak[host], active[host])
+                if active[host] > 1:
+                    paired[host].set()
+            paired[host].wait(5)
+            with lock:
+                active[host] -= 1
+            return StringIO(u"image"+url.split("/")[3])
+
+        features = twitter(
+            keys=self.keys,
+            media=("image",),
+            keyword="test",
+            quantity=6,
+            image_workers=6,
+            host_connections=2,
+            api=api,
+            network=network
+        )
+        self.assertEqual({"host0": 2, "host1": 2}, peak)
+        self.assertEqual(
+            [
+                base64.b64encode(("image"+str(i)).encode('utf-8'))
+                for i in range(6)
+            ],
+            [feature["properties"]["image"] for feature in features]
+        )
+
+    def test_key_pooling(self):
+        """
+        Pooled keys add up their budgets.
+        Queries move to another key when one is being limited.
+        """
+        self.log.debug("Testing key pooling...")
+        keys = [
+            {"consumer_key": "key"+str(i), "access_token": "token"+str(i)}
+            for i in range(3)
+        ]
+        clients = {}
+        for i in range(3):
+            client = MagicMock()
+            client.get_application_rate_limit_status.return_value = \
+                twitter_limits(2 if i else 0, 1234567890)
+            client.search.side_effect = lambda **_: copy.deepcopy(self.tweets)
+            clients["key"+str(i)] = client
+        clients["key2"].search.side_effect = TwythonRateLimitError(
+            "Rate limit exceeded", 429, retry_after="1234567890"
+        )
+        api = MagicMock(
+            side_effect=lambda consumer_key, access_token: clients[consumer_key]
+        )
+        rate_limit = RateLimit()
+        features = twitter(
+            keys=keys,
+            media=("text",),
+            keyword="test",
+            quantity=10,
+            fail_hard=True,
+            rate_limit=rate_limit,
+            api=api,
+            network=self.network
+        )
+        self.assertEqual(4, len(features))
+        self.assertEqual(0, clients["key0"].search.call_count)
+        self.assertEqual(2, clients["key1"].search.call_count)
+        self.assertEqual(1, clients["key2"].search.call_count)
+        self.assertEqual(
+            (0, 1234567890),
+            (rate_limit.key(_key_id(keys[2])).remaining, rate_limit.key(_key_id(keys[2])).reset)
+        )
+        self.assertFalse(rate_limit.key(_key_id(keys[2])).stale)
+        clients["key2"].search.side_effect = TwythonRateLimitError(
+            "Rate limit exceeded", 429
+        )
+        clients["key2"].get_lastfunction_header.return_value = None
+        rate_limit = RateLimit()
+        twitter(
+            keys=keys,
+            media=("text",),
+            keyword="test",
+            quantity=10,
+            rate_limit=rate_limit,
+            api=api,
+            network=self.network
+        )
+        self.assertEqual(2, clients["key2"].search.call_count)
+        self.assertLess(time.time(), rate_limit.key(_key_id(keys[2])).reset)
+        with self.assertRaises(ValueError):
+            sanitize_twitter(keys=[], keyword="test")
+        with self.assertRaises(ValueError):
+            sanitize_twitter(keys=[keys[0], {"consumer_key": "key"}], keyword="test")
+
+    def test_prefetch(self):
+        """
+        Prefetching returns the same results with the same queries.
+        The next page is requested while images are retrieved.
+        """
+        self.log.debug("Testing prefetching...")
+        timeline = twitter_timeline(self.tweets["statuses"][0], range(1, 13))
+        results = {}
+        for prefetch in (False, True):
+            searched = threading.Event()
+            overlaps = []
+
+            def search(searched=searched, **kwargs):
+                """Return a page (noting once a later page is requested)."""
+                if kwargs["max_id"] is not None:
+                    searched.set()
+                return timeline(**dict(kwargs, count=min(kwargs["count"], 4)))
+
+            def network(_, prefetch=prefetch, searched=searched, overlaps=overlaps):
+                """Retrieve an image (noting whether the next page was requested)."""
+                overlaps.append(searched.wait(5) if prefetch else searched.is_set())
+                return StringIO(u"test_image")
+
+            api = MagicMock()
+            api().get_application_rate_limit_status.return_value = \
+                twitter_limits(450, 1234567890)
+            api().search.side_effect = search
+            features = twitter(
+                keys=self.keys,
+                keyword="test",
+                quantity=12,
+                prefetch=prefetch,
+                api=api,
+                network=network
+            )
+            results[prefetch] = (features, api().search.call_count, overlaps[0])
+        self.assertEqual(12, len(results[False][0]))
+        self.assertEqual(results[False][0], results[True][0])
+        self.assertEqual(3, results[False][1])
+        self.assertEqual(3, results[True][1])
+        self.assertFalse(results[False][2])
+        self.assertTrue(results[True][2])
+
+    def test_iter_twitter(self):
+        """
+        Generated Features are the same as the ones returned.
+        Parameters are checked immediately.
+        Closing the generator stops paging.
+        """
+        self.log.debug("Testing Twitter generators...")
+        timeline = twitter_timeline(self.tweets["statuses"][1], range(1, 13))
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = \
+            lambda **kwargs: timeline(**dict(kwargs, count=min(kwargs["count"], 4)))
+        query = {
+            "keys": self.keys,
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 12,
+            "api": api,
+            "network": self.network
+        }
+        control = twitter(**query)
+        api.reset_mock()
+        self.assertEqual(control, list(iter_twitter(**query)))
+        self.assertEqual(3, api().search.call_count)
+        with self.assertRaises(ValueError):
+            iter_twitter(**dict(query, quantity=-1))
+        with self.assertRaises(ValueError):
+            iter_twitter(image_mode="bogus", **query)
+        api.reset_mock()
+        features = iter_twitter(**query)
+        self.assertEqual(0, api().search.call_count)
+        self.assertEqual(control[0], next(features))
+        features.close()
+        self.assertEqual(1, api().search.call_count)
+
+    def test_image_limits(self):
+        """Images beyond their limits are left out (or raise if fail_hard)."""
+        self.log.debug("Testing image limits...")
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(2, 1234567890)
+        api().search.return_value = copy.deepcopy(self.tweets)
+        query = {
+            "keys": self.keys,
+            "media": ("image", "text"),
+            "keyword": "test",
+            "quantity": 2,
+            "api": api,
+            "network": self.network
+        }
+        features = twitter(**dict(query, image_max_bytes=4))
+        self.assertEqual(2, len(features))
+        self.assertFalse(any("image" in feature["properties"] for feature in features))
+        features = twitter(**dict(
+            query,
+            media=("image",),
+            image_workers=1,
+            query_max_bytes=len("test_image")
+        ))
+        self.assertEqual(
+            1,
+            len([feature for feature in features if "image" in feature["properties"]])
+        )
+        self.assertEqual(
+            [],
+            twitter(**dict(
+                query,
+                media=("image",),
+                strict_media=True,
+                image_max_bytes=4
+            ))
+        )
+        with self.assertRaises(OGReLimitError):
+            twitter(**dict(query, image_max_bytes=4, fail_hard=True))
+
+    def test_state(self):
+        """Requests resume from and record their state."""
+        self.log.debug("Testing request state...")
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = \
+            twitter_timeline(self.tweets["statuses"][1], range(1, 13))
+        query = {
+            "keys": self.keys,
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 4,
+            "api": api,
+            "network": self.network
+        }
+        state = {}
+        self.assertEqual(4, len(twitter(state=state, **query)))
+        self.assertEqual(
+            {"since_id": 12, "remaining": 449, "reset": 1234567890},
+            state
+        )
+        api().search.side_effect = \
+            twitter_timeline(self.tweets["statuses"][1], range(1, 16))
+        self.assertEqual(3, len(twitter(state=state, **query)))
+        self.assertEqual(12, api().search.call_args[1]["since_id"])
+        self.assertEqual(15, state["since_id"])
+        self.assertEqual([], twitter(state=state, **query))
+        self.assertEqual(15, state["since_id"])
+
+    def test_cache(self):
+        """Cached searches make no queries."""
+        self.log.debug("Testing search caching...")
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = \
+            twitter_timeline(self.tweets["statuses"][1], range(1, 13))
+        query = {
+            "keys": self.keys,
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 12,
+            "cache": SearchCache(),
+            "api": api,
+            "network": self.network
+        }
+        control = twitter(**query)
+        self.assertEqual(1, api().search.call_count)
+        self.assertEqual(control, twitter(**query))
+        self.assertEqual(1, api().search.call_count)
+        self.assertEqual((1, 1), (query["cache"].hits, query["cache"].misses))
+        twitter(**dict(query, keyword="other"))
+        self.assertEqual(2, api().search.call_count)
+
+    def test_compact(self):
+        """Compact requests return Features equal to the GeoJSON ones."""
+        self.log.debug("Testing compact Features...")
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = lambda **_: copy.deepcopy(self.tweets)
+        query = {
+            "keys": self.keys,
+            "media": ("image", "text"),
+            "keyword": "test",
+            "quantity": 2,
+            "api": api,
+            "network": self.network
+        }
+        control = twitter(**query)
+        features = twitter(compact=True, **query)
+        self.assertEqual(control, features)
+        self.assertTrue(all(isinstance(feature, Feature) for feature in features))
+        self.assertTrue(any(feature.image for feature in features))
+        self.assertEqual(
+            control,
+            list(iter_twitter(compact=True, **query))
+        )
+
+    def test_image_mode(self):
+        """Images are referenced, kept raw or base64-encoded as asked."""
+        self.log.debug("Testing image modes...")
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = lambda **_: copy.deepcopy(self.tweets)
+        network = self.network
+        query = {
+            "keys": self.keys,
+            "media": ("image", "text"),
+            "keyword": "test",
+            "quantity": 2,
+            "api": api,
+            "network": network
+        }
+        control = twitter(**query)
+        images = [
+            feature["properties"].get("image") for feature in twitter(image_mode="bytes", **query)
+        ]
+        self.assertEqual(
+            [feature["properties"].get("image") for feature in control],
+            [None if image is None else base64.b64encode(image.data) for image in images]
+        )
+        network.reset_mock()
+        features = twitter(image_mode="url", **query)
+        self.assertEqual(0, network.call_count)
+        self.assertEqual(len(control), len(features))
+        self.assertTrue(any(
+            feature["properties"].get("image", u"").startswith("https://")
+            for feature in features
+        ))
+        with self.assertRaises(ValueError):
+            twitter(image_mode="invalid", **query)
+        with self.assertRaises(ValueError):
+            twitter(image_mode="file", **query)
+
+    def test_seen(self):
+        """Tweets seen before are skipped (before their media is retrieved)."""
+        self.log.debug("Testing seen Tweet IDs...")
+        directory = tempfile.mkdtemp()
+        try:
+            api = MagicMock()
+            api().get_application_rate_limit_status.return_value = \
+                twitter_limits(450, 1234567890)
+            api().search.side_effect = twitter_timeline(
+                self.tweets["statuses"][0],
+                range(1, 101)
+            )
+            network = self.network
+            query = {
+                "keys": self.keys,
+                "media": ("image", "text"),
+                "keyword": "test",
+                "quantity": 10,
+                "api": api,
+                "network": network
+            }
+            control = twitter(**dict(query, quantity=20))
+            with SeenIds(os.path.join(directory, "seen")) as seen:
+                self.assertEqual(control[:10], twitter(seen=seen, **query))
+                self.assertEqual(10, len(seen))
+            network.reset_mock()
+            with SeenIds(os.path.join(directory, "seen")) as seen:
+                self.assertEqual(control[10:], twitter(seen=seen, **query))
+                self.assertEqual(20, len(seen))
+            self.assertEqual(10, network.call_count)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_rate_limit_headers(self):
+        """Known budgets are kept up to date by response headers."""
+        self.log.debug("Testing rate limit headers...")
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, int(time.time())+900)
+        api().search.side_effect = lambda **_: copy.deepcopy(self.tweets)
+        api().get_lastfunction_header.side_effect = lambda header: {
+            "x-rate-limit-remaining": "7",
+            "x-rate-limit-reset": str(int(time.time())+900)
+        }[header]
+        rate_limit = RateLimit()
+        query = {
+            "keys": self.keys,
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 2,
+            "rate_limit": rate_limit,
+            "api": api,
+            "network": self.network
+        }
+        for _ in range(3):
+            self.assertEqual(2, len(twitter(**query)))
+        self.assertEqual(1, api().get_application_rate_limit_status.call_count)
+        self.assertEqual(3, api().search.call_count)
+        self.assertEqual(7, list(rate_limit.keys.values())[0].remaining)
@@ -0,0 +1,155 @@
+"""
+OGRe Prepared Query Tests
+
+:class:`TwitterQueryTest` -- prepared Twitter query test template
+"""
+
+import copy
+import json
+import logging
+import os
+import unittest
+from io import StringIO
+from mock import MagicMock
+from ogre import OGRe
+from ogre.query import TwitterQuery
+from ogre.Twitter import twitter
+from snowflake2time.snowflake import utc2snowflake
+
+
+class TwitterQueryTest(unittest.TestCase):
+
+    """
+    Create objects that test prepared Twitter queries.
+
+    These tests should make sure prepared queries return the same results
+    as unprepared ones and that they cannot be changed.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on prepared Twitter queries."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a TwitterQueryTest...")
+        self.retriever = OGRe(
+            keys={
+                "Twitter": {
+                    "consumer_key": os.environ.get("TWITTER_CONSUMER_KEY"),
+                    "access_token": os.environ.get("TWITTER_ACCESS_TOKEN")
+                }
+            }
+        )
+        with open("ogre/test/data/Twitter-response-example.json") as tweets:
+            self.tweets = json.load(tweets)
+        self.api = MagicMock()
+        self.api().get_application_rate_limit_status.return_value = {
+            "resources": {
+                "search": {
+                    "/search/tweets": {
+                        "remaining": 450,
+                        "reset": 1234567890
+                    }
+                }
+            }
+        }
+        self.api().search.side_effect = lambda **_: copy.deepcopy(self.tweets)
+        self.api.reset_mock()
+        self.network = MagicMock(side_effect=lambda _: StringIO(u"test_image"))
+
+    def test_prepare(self):
+        """Prepared queries are validated once and are equal by parameters."""
+        self.log.debug("Testing query preparation...")
+        query = self.retriever.prepare(
+            "Twitter",
+            media=("image", "text"),
+            keyword="test",
+            quantity=2,
+            location=(0, 1, 2, "KM")
+        )
+        self.assertIsInstance(query, TwitterQuery)
+        self.assertEqual(
+            query,
+            self.retriever.prepare(
+                "twitter",
+                media=("Text", "image"),
+                keyword="test",
+                quantity="2",
+                location=(0.0, 1.0, 2.0, "km")
+            )
+        )
+        self.assertNotEqual(
+            query,
+            self.retriever.prepare("Twitter", keyword="test", quantity=3)
+        )
+        self.assertEqual(1, len(set([query, copy.copy(query)])))
+        with self.assertRaises(AttributeError):
+            query.keys = None
+        with self.assertRaises(AttributeError):
+            del query.sanitized
+        with self.assertRaises(ValueError):
+            self.retriever.prepare("Twitter", keyword="test", quantity=-1)
+        with self.assertRaises(ValueError):
+            self.retriever.prepare("invalid", keyword="test")
+
+    def test_defaults(self):
+        """Prepared queries share the rate limit of their retriever."""
+        self.log.debug("Testing prepared query defaults...")
+        query = self.retriever.prepare(
+            "Twitter",
+            media=("text",),
+            keyword="test",
+            quantity=2
+        )
+        for _ in range(3):
+            self.assertEqual(2, len(query(api=self.api, network=self.network)))
+        self.assertEqual(1, self.api().get_application_rate_limit_status.call_count)
+        self.assertEqual(3, self.api().search.call_count)
+        self.assertEqual(
+            450-3,
+            sum(
+                budget.remaining
+                for budget in self.retriever.rate_limit.keys.values()
+            )
+        )
+
+    def test_call(self):
+        """Prepared queries return the same Features as twitter."""
+        self.log.debug("Testing prepared query execution...")
+        parameters = {
+            "keys": self.retriever.keychain[self.retriever.keyring["twitter"]],
+            "media": ("image", "text"),
+            "keyword": "test",
+            "quantity": 2,
+            "interval": (3, 4)
+        }
+        query = TwitterQuery(**parameters)
+        control = twitter(api=self.api, network=self.network, **parameters)
+        self.api.reset_mock()
+        for _ in range(2):
+            self.assertEqual(control, query(api=self.api, network=self.network))
+        self.assertEqual(
+            control,
+            list(query.iter_features(api=self.api, network=self.network))
+        )
+        for call in self.api().search.call_args_list:
+            self.assertEqual(
+                (utc2snowflake(3), utc2snowflake(4)),
+                (call[1]["since_id"], call[1]["max_id"])
+            )
+
+        self.api.reset_mock()
+        query(interval=(10, 5), api=self.api, network=self.network)
+        query(since_id=7, api=self.api, network=self.network)
+        query(max_id=8, api=self.api, network=self.network)
+        self.assertEqual(
+            [
+                (utc2snowflake(5), utc2snowflake(10)),
+                (7, utc2snowflake(4)),
+                (utc2snowflake(3), 8)
+            ],
+            [
+                (call[1]["since_id"], call[1]["max_id"])
+                for call in self.api().search.call_args_list
+            ]
+        )
+        with self.assertRaises(ValueError):
+            query(interval=(-1, "invalid"), api=self.api)
@@ -0,0 +1,89 @@
+"""
+OGRe Seen Tweet ID Tests
+
+:class:`SeenIdsTest` -- seen Tweet ID test template
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from snowflake2time.snowflake import utc2snowflake
+from ogre.seen import SeenIds
+
+
+class SeenIdsTest(unittest.TestCase):
+
+    """
+    Create objects that test OGRe seen Tweet IDs.
+
+    These tests should make sure Tweet IDs are remembered between runs,
+    shared between instances and forgotten once they are old enough.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on OGRe seen Tweet IDs."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a SeenIdsTest...")
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "seen")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_persistence(self):
+        """Tweet IDs are remembered once they are flushed."""
+        self.log.debug("Testing seen Tweet ID persistence...")
+        with SeenIds(self.path) as seen:
+            self.assertEqual(0, len(seen))
+            self.assertFalse(5 in seen)
+            seen.update([5, 3, 9, 3])
+            seen.add(7)
+            self.assertTrue(3 in seen)
+            self.assertEqual(4, len(seen))
+            self.assertEqual(0, os.path.getsize(self.path))
+        self.assertEqual(32, os.path.getsize(self.path))
+        with SeenIds(self.path) as seen:
+            self.assertEqual(
+                [True, False, True, False, True, False, True],
+                [tweet_id in seen for tweet_id in range(3, 10)]
+            )
+            seen.update([4, 5])
+            self.assertEqual(5, len(seen))
+
+    def test_sharing(self):
+        """Instances see the Tweet IDs others merge (and keep their own)."""
+        self.log.debug("Testing shared seen Tweet IDs...")
+        first = SeenIds(self.path, buffer_size=3)
+        second = SeenIds(self.path)
+        first.update(range(0, 10, 2))
+        self.assertTrue(4 in second)
+        second.update(range(1, 10, 2))
+        first.update([10])
+        first.flush()
+        second.close()
+        self.assertEqual(list(range(11)), [i for i in range(12) if i in first])
+        self.assertEqual(11, len(first))
+        first.update(range(3*2**13))
+        first.flush()
+        self.assertEqual(3*2**13, len(first))
+        self.assertTrue(3*2**13-1 in first)
+        first.close()
+
+    def test_compact(self):
+        """Tweet IDs older than a moment are forgotten."""
+        self.log.debug("Testing seen Tweet ID compaction...")
+        tweet_ids = [utc2snowflake(moment)+1 for moment in (1000, 1100, 1200)]
+        with SeenIds(self.path) as seen:
+            seen.update(tweet_ids[:2])
+            seen.flush()
+            seen.add(tweet_ids[2])
+            seen.compact(1100)
+            self.assertEqual(
+                [False, True, True],
+                [tweet_id in seen for tweet_id in tweet_ids]
+            )
+            self.assertEqual(16, os.path.getsize(self.path))
+            seen.compact(2000)
+            self.assertEqual(0, len(seen))
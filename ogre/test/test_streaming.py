@@ -0,0 +1,388 @@
+"""
+OGRe Twitter Streaming Tests
+
+:class:`StreamingTest` -- Twitter streaming test template
+"""
+
+import copy
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from io import StringIO
+from mock import MagicMock
+from twython import TwythonError
+from snowflake2time import snowflake
+from ogre.cache import RangeCache
+from ogre.geography import distance
+from ogre.seen import SeenIds
+from ogre.Twitter import twitter
+from ogre.test.fixtures import twitter_timeline
+from ogre.test.test_twitter import twitter_limits
+
+
+class StreamingTest(unittest.TestCase):
+
+    """
+    Create objects that test sharding, tiling and resuming Twitter requests.
+
+    These tests should make sure requests split (or served from a range cache
+    or checkpoint) produce the same results as requests paged through whole.
+    """
+
+    def setUp(self):
+        """Prepare to run tests on Twitter streaming."""
+        self.log = logging.getLogger(__name__)
+        self.log.debug("Initializing a StreamingTest...")
+        self.keys = {
+            "consumer_key": os.environ.get("TWITTER_CONSUMER_KEY"),
+            "access_token": os.environ.get("TWITTER_ACCESS_TOKEN")
+        }
+        with open("ogre/test/data/Twitter-response-example.json") as tweets:
+            self.tweets = json.load(tweets)
+        self.network = MagicMock(side_effect=lambda _: StringIO(u"test_image"))
+
+    def test_sharding(self):
+        """
+        Sharded requests return the same (newest) results as serial requests.
+        Shards are paged through in parallel.
+        Shards stop once newer shards satisfy the quantity.
+        """
+        self.log.debug("Testing sharding...")
+        interval = (1400000000, 1400086400)
+        ids = [
+            snowflake.utc2snowflake(interval[0]+60*i)
+            for i in range(1, 1440)
+        ]
+        timeline = twitter_timeline(self.tweets["statuses"][1], ids)
+        results = {}
+        searches = {}
+        for shards in (1, 4):
+            lock = threading.Lock()
+            active = [0, 0]  # searches in flight (and the most at once)
+            paired = threading.Event()
+
+            def search(shards=shards, lock=lock, active=active, paired=paired, **kwargs):
+                """Return a page (once another shard is searching too)."""
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active)
+                    if active[0] > 1:
+                        paired.set()
+                if shards > 1:
+                    paired.wait(5)
+                with lock:
+                    active[0] -= 1
+                return timeline(**kwargs)
+
+            api = MagicMock()
+            api().get_application_rate_limit_status.return_value = \
+                twitter_limits(450, 1234567890)
+            api().search.side_effect = search
+            results[shards] = twitter(
+                keys=self.keys,
+                media=("text",),
+                keyword="test",
+                quantity=1000,
+                interval=interval,
+                shards=shards,
+                api=api,
+                network=self.network
+            )
+            searches[shards] = (active[1], api().search.call_count)
+        self.assertEqual(1000, len(results[1]))
+        self.assertEqual(results[1], results[4])
+        self.assertEqual(1, searches[1][0])
+        self.assertLess(1, searches[4][0])
+
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = twitter_timeline(
+            self.tweets["statuses"][1], ids
+        )
+        self.assertEqual(
+            results[1][:300],
+            twitter(
+                keys=self.keys,
+                media=("text",),
+                keyword="test",
+                quantity=300,
+                interval=interval,
+                shards=4,
+                api=api,
+                network=self.network
+            )
+        )
+        self.assertLess(api().search.call_count, 16)
+
+        api.reset_mock()
+        self.assertEqual(
+            [],
+            twitter(
+                keys=self.keys,
+                media=("text",),
+                keyword="test",
+                interval=(interval[0], interval[0]),
+                shards=4,
+                api=api,
+                network=self.network
+            )
+        )
+        self.assertEqual(0, api().search.call_count)
+
+    def test_tiling(self):
+        """
+        Tiles are searched in parallel, and their results are deduplicated.
+        Only results within the original location are returned.
+        Tiles with more results than fit in a page are split.
+        """
+        self.log.debug("Testing tiling...")
+        generator = random.Random(0)
+        places = [
+            (37.5+generator.uniform(-0.1, 0.1), -122.5+generator.uniform(-0.1, 0.1))
+            for _ in range(300)
+        ]
+        places += [(37.5, -122.5)]*150  # a dense neighborhood
+        template = self.tweets["statuses"][1]
+
+        def search(
+                q, count, geocode, since_id, max_id
+        ):  # pylint: disable=invalid-name,unused-argument,too-many-arguments
+            """Return Tweets within the geocode (newest first)."""
+            latitude, longitude, radius = geocode.split(",")
+            statuses = []
+            for i, place in reversed(list(enumerate(places))):
+                if max_id is not None and 500000000000000000+i > max_id:
+                    continue
+                if distance(
+                        float(latitude), float(longitude),
+                        place[0], place[1], "km"
+                ) <= float(radius[:-2]):
+                    tweet = copy.deepcopy(template)
+                    tweet["id"] = 500000000000000000+i
+                    tweet["coordinates"]["coordinates"] = [place[1], place[0]]
+                    statuses.append(tweet)
+            results = {"statuses": statuses[:count], "search_metadata": {}}
+            if len(statuses) > count:
+                results["search_metadata"]["next_results"] = \
+                    "?max_id="+str(statuses[count]["id"])+"&q=test"
+            return results
+
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = search
+        features = twitter(
+            keys=self.keys,
+            media=("text",),
+            keyword="test",
+            quantity=1000,
+            location=(37.5, -122.5, 5, "km"),
+            tile_radius=2,
+            api=api,
+            network=self.network
+        )
+        coordinates = [
+            tuple(feature["geometry"]["coordinates"])
+            for feature in features
+        ]
+        inside = set(
+            i for i, place in enumerate(places)
+            if distance(37.5, -122.5, place[0], place[1], "km") <= 5
+        )
+        self.assertEqual(len(inside), len(features))
+        for longitude, latitude in coordinates:
+            self.assertLessEqual(distance(37.5, -122.5, latitude, longitude), 5)
+        self.assertTrue(
+            any(
+                call[1]["geocode"].endswith(",1.0km")
+                for call in api().search.call_args_list
+            )
+        )
+        features = twitter(
+            keys=self.keys,
+            media=("text",),
+            keyword="test",
+            quantity=20,
+            location=(37.5, -122.5, 5, "km"),
+            tile_radius=2,
+            compact=True,
+            api=api,
+            network=self.network
+        )
+        ids = [feature.tweet_id for feature in features]
+        self.assertEqual(20, len(ids))
+        self.assertEqual(sorted(ids, reverse=True), ids)
+
+    def test_seen(self):
+        """Sharded and tiled requests only add the Tweets they return to `seen`."""
+        self.log.debug("Testing seen Tweet IDs of split requests...")
+        interval = (1400000000, 1400086400)
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = twitter_timeline(
+            self.tweets["statuses"][1],
+            [snowflake.utc2snowflake(interval[0]+600*i) for i in range(1, 144)]
+        )
+        query = {
+            "keys": self.keys,
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 5,
+            "api": api,
+            "network": self.network
+        }
+        control = twitter(interval=interval, **dict(query, quantity=10))
+        directory = tempfile.mkdtemp()
+        try:
+            with SeenIds(os.path.join(directory, "sharded")) as seen:
+                for start in (0, 5):
+                    self.assertEqual(
+                        control[start:start+5],
+                        twitter(interval=interval, shards=4, seen=seen, **query)
+                    )
+                    self.assertEqual(start+5, len(seen))
+            location = (36.99865769, -122.06567535, 5, "km")
+            with SeenIds(os.path.join(directory, "tiled")) as seen:
+                for start in (0, 5):
+                    self.assertEqual(
+                        control[start:start+5],
+                        twitter(location=location, tile_radius=2, seen=seen, **query)
+                    )
+                    self.assertEqual(start+5, len(seen))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_checkpoint(self):
+        """Interrupted requests resume from their checkpoint."""
+        self.log.debug("Testing request checkpoints...")
+        directory = tempfile.mkdtemp()
+        try:
+            api = MagicMock()
+            api().get_application_rate_limit_status.return_value = \
+                twitter_limits(450, 1234567890)
+            search = twitter_timeline(self.tweets["statuses"][1], range(1, 251))
+            query = {
+                "keys": self.keys,
+                "media": ("text",),
+                "keyword": "test",
+                "quantity": 250,
+                "api": api,
+                "network": self.network
+            }
+            api().search.side_effect = search
+            control = twitter(**query)
+            self.assertEqual(3, api().search.call_count)
+
+            query["checkpoint"] = os.path.join(directory, "query.checkpoint")
+            api().search.reset_mock()
+            api().search.side_effect = [
+                search(q="test", count=100, geocode=None, since_id=None, max_id=None),
+                TwythonError("test")
+            ]
+            with self.assertRaises(TwythonError):
+                twitter(**query)
+            self.assertTrue(os.path.exists(query["checkpoint"]))
+
+            api().search.reset_mock()
+            api().search.side_effect = search
+            self.assertEqual(control, twitter(**query))
+            self.assertEqual(2, api().search.call_count)
+            self.assertEqual(150, api().search.call_args_list[0][1]["max_id"])
+            self.assertFalse(os.path.exists(query["checkpoint"]))
+
+            api().search.reset_mock()
+            self.assertEqual(control[:100], twitter(query_limit=1, **query))
+            self.assertTrue(os.path.exists(query["checkpoint"]))
+            self.assertEqual(control, twitter(**query))
+            self.assertEqual(3, api().search.call_count)
+            self.assertEqual(150, api().search.call_args_list[1][1]["max_id"])
+            self.assertFalse(os.path.exists(query["checkpoint"]))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_range_cache(self):
+        """Overlapping intervals only search the Tweet IDs not yet fetched."""
+        self.log.debug("Testing range caching...")
+        api = MagicMock()
+        api().get_application_rate_limit_status.return_value = \
+            twitter_limits(450, 1234567890)
+        api().search.side_effect = twitter_timeline(
+            self.tweets["statuses"][1],
+            [snowflake.utc2snowflake(moment) for moment in range(1000, 1100)]
+        )
+        query = {
+            "keys": self.keys,
+            "media": ("text",),
+            "keyword": "test",
+            "quantity": 100,
+            "api": api,
+            "network": self.network
+        }
+        controls = [
+            twitter(interval=interval, **query)
+            for interval in ((1000, 1050), (1000, 1080), (1060, 1070))
+        ]
+        self.assertEqual([50, 80, 10], [len(control) for control in controls])
+
+        api().search.reset_mock()
+        query["range_cache"] = RangeCache()
+        self.assertEqual(controls[0], twitter(interval=(1000, 1050), **query))
+        self.assertEqual(controls[1], twitter(interval=(1000, 1080), **query))
+        self.assertEqual(
+            [
+                (snowflake.utc2snowflake(1000), snowflake.utc2snowflake(1050)),
+                (snowflake.utc2snowflake(1050), snowflake.utc2snowflake(1080))
+            ],
+            [
+                (call[1]["since_id"], call[1]["max_id"])
+                for call in api().search.call_args_list
+            ]
+        )
+        self.assertEqual(controls[2], twitter(interval=(1060, 1070), **query))
+        self.assertEqual(
+            controls[1][:10],
+            twitter(interval=(1000, 1080), **dict(query, quantity=10))
+        )
+        self.assertEqual(2, api().search.call_count)
+
+        directory = tempfile.mkdtemp()
+        try:
+            with SeenIds(os.path.join(directory, "seen")) as seen:
+                self.assertEqual(
+                    controls[1][:10],
+                    twitter(interval=(1000, 1080), seen=seen, **dict(query, quantity=10))
+                )
+                self.assertEqual(10, len(seen))
+                self.assertEqual(
+                    controls[1][10:20],
+                    twitter(interval=(1000, 1080), seen=seen, **dict(query, quantity=10))
+                )
+                self.assertEqual(
+                    controls[1][20:],
+                    twitter(interval=(1000, 1080), seen=seen, **query)
+                )
+                self.assertEqual(
+                    [],
+                    twitter(interval=(1000, 1080), seen=seen, **query)
+                )
+                self.assertEqual(80, len(seen))
+            self.assertEqual(2, api().search.call_count)
+
+            query["range_cache"] = RangeCache()
+            with SeenIds(os.path.join(directory, "other")) as seen:
+                seen.update(snowflake.utc2snowflake(moment) for moment in range(1041, 1051))
+                self.assertEqual(
+                    controls[0][10:20],
+                    twitter(interval=(1000, 1050), seen=seen, **dict(query, quantity=10))
+                )
+                self.assertEqual(20, len(seen))
+            self.assertEqual(controls[0], twitter(interval=(1000, 1050), **query))
+        finally:
+            shutil.rmtree(directory)
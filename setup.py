@@ -28,9 +28,12 @@ setup(
     python_requires='>=2.7,!=3.0.*,!=3.1.*,!=3.2.*,!=3.3.*,<4',
     install_requires=[
         'future ~= 0.16.0',
+        'futures ~= 3.1; python_version < "3"',
         'mock ~= 1.0.1',
+        'requests ~= 2.1',
         'twython ~= 3.4',
     ],
+    extras_require={'columnar': ['numpy']},
     entry_points={'console_scripts': ['ogre = ogre.cli:main']},
     keywords='OpenFusion Twitter GeoJSON geotag',
     classifiers=[